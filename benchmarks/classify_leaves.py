@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+# @file:    classify_leaves.py
+# @purpose: compare the branch-name classification against the original regex-based one
+#
+# @example:
+# @code
+# python benchmarks/classify_leaves.py
+# python benchmarks/classify_leaves.py --leaves 500000 --repeat 5
+# @endcode
+#
+from __future__ import print_function
+
+import os, sys
+import argparse
+import random
+import re
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import dumpSG
+
+def classify_leaves_regex(leaves):
+  '''
+  the original classification, with four name regexes and up to four type regexes per leaf
+  '''
+  xAOD_Objects = defaultdict(lambda: {'prop': [], 'attr': [], 'type': '', 'has_interface': False, 'has_aux': False, 'rootname': '', 'totbytes': 0, 'filebytes': 0})
+
+  xAOD_Container_Name = re.compile('^([^:]*)(?<!\.)$')
+  xAOD_AuxContainer_Name = re.compile('(.*)Aux\.$')
+  xAOD_Container_Prop = re.compile('(.*)Aux\.([^:]+)$')
+  xAOD_Container_Attr = re.compile('(.*)AuxDyn\.([^:]+)$')
+  xAOD_Type_Name = re.compile('^(vector<)?(.+?)(?(1)(?: ?>))$')
+  xAOD_remove_version = re.compile('_v\d+')
+  xAOD_Grab_Inner_Type = re.compile('<([^<>]*)>')
+  xAOD_DataVector_Type = re.compile('^DataVector<(.*?)>$')
+
+  for elName, elType, totbytes, filebytes in leaves:
+    elType = xAOD_remove_version.sub('', xAOD_Type_Name.search(elType).groups()[1].replace('Aux','') )
+
+    m_cont_name = xAOD_Container_Name.search(elName)
+    m_aux_name = xAOD_AuxContainer_Name.search(elName)
+    m_cont_prop = xAOD_Container_Prop.search(elName)
+    m_cont_attr = xAOD_Container_Attr.search(elName)
+
+    m_container_type_name = xAOD_DataVector_Type.search(elType)
+    if m_container_type_name:
+      elType, = m_container_type_name.groups()
+      elType += "Container"
+
+    if m_aux_name:
+      container, = m_aux_name.groups()
+      xAOD_Objects[container]['has_aux'] = True
+      xAOD_Objects[container]['rootname'] = elName
+      xAOD_Objects[container]['totbytes'] += totbytes
+      xAOD_Objects[container]['filebytes'] += filebytes
+    elif m_cont_prop:
+      container, property = m_cont_prop.groups()
+      xAOD_Objects[container]['prop'].append({'name': property, 'type': elType, 'rootname': elName, 'totbytes': totbytes, 'filebytes': filebytes})
+    elif m_cont_attr:
+      container, attribute = m_cont_attr.groups()
+      if 'btagging' in attribute.lower():
+        btaggingType = xAOD_Grab_Inner_Type.search(elType)
+        if btaggingType:
+          elType = btaggingType.groups()[0] + ' *'
+        attribute = attribute.replace('Link','')
+        xAOD_Objects[container]['prop'].append({'name': attribute, 'type': elType, 'rootname': elName, 'totbytes': totbytes, 'filebytes': filebytes})
+      else:
+        xAOD_Objects[container]['attr'].append({'name': attribute, 'type': elType, 'rootname': elName, 'totbytes': totbytes, 'filebytes': filebytes})
+    elif m_cont_name:
+      container, = m_cont_name.groups()
+      xAOD_Objects[container]['type'] = xAOD_Objects[container]['type'] or elType
+      xAOD_Objects[container]['has_interface'] = True
+      xAOD_Objects[container]['rootname'] = xAOD_Objects[container]['rootname'] or elName
+      xAOD_Objects[container]['totbytes'] += totbytes
+      xAOD_Objects[container]['filebytes'] += filebytes
+
+  return xAOD_Objects
+
+# types that show up in trigger-heavy derivations
+container_types = ['DataVector<xAOD::Jet_v1>', 'DataVector<xAOD::TrigComposite_v1>', 'DataVector<xAOD::TrackParticle_v1>',
+                   'DataVector<xAOD::Electron_v1>', 'DataVector<xAOD::CaloCluster_v1>', 'xAOD::EventInfo_v1']
+leaf_types = ['vector<float>', 'vector<int>', 'vector<unsigned int>', 'vector<vector<float> >', 'vector<char>',
+              'vector<ElementLink<DataVector<xAOD::TrackParticle_v1> > >', 'vector<vector<ElementLink<DataVector<xAOD::BTagging_v1> > > >',
+              'Float_t', 'Int_t', 'vector<unsigned long long>', 'vector<vector<unsigned int> >', 'xAOD::JetAuxContainer_v1']
+
+def synthetic_leaves(nleaves, seed=42):
+  '''
+  roughly what a merged trigger-heavy DAOD looks like: many containers, few static properties and lots of AuxDyn
+  '''
+  rng = random.Random(seed)
+  leaves = []
+  while len(leaves) < nleaves:
+    container = 'HLT_xAOD__{0}_Container{1}'.format(rng.choice(['Jet', 'TrigComposite', 'TrackParticle', 'Electron']), len(leaves))
+    leaves.append((container, rng.choice(container_types), rng.randint(1, 1000), rng.randint(1, 500)))
+    leaves.append((container + 'Aux.', 'xAOD::AuxContainerBase', rng.randint(1, 1000), rng.randint(1, 500)))
+    for i in range(rng.randint(2, 8)):
+      leaves.append(('{0}Aux.prop{1}'.format(container, i), rng.choice(leaf_types), rng.randint(1, 10000), rng.randint(1, 5000)))
+    for i in range(rng.randint(5, 40)):
+      name = rng.choice(['Tau{0}', 'btaggingLink{0}', 'decor{0}', 'ConstituentScale{0}', 'sv:{0}'])
+      leaves.append(('{0}AuxDyn.{1}'.format(container, name.format(i)), rng.choice(leaf_types), rng.randint(1, 10000), rng.randint(1, 5000)))
+  return leaves[:nleaves]
+
+def best_time(fn, leaves, repeat):
+  times = []
+  for i in range(repeat):
+    # start from an empty memo each time, so we also pay for filling it
+    dumpSG._normalized_types.clear()
+    dumpSG._btagging_types.clear()
+    start = time.time()
+    result = fn(leaves)
+    times.append(time.time() - start)
+  return min(times), result
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Benchmark the classification of branch names into xAOD objects.')
+  parser.add_argument('--leaves', type=int, default=200000, help='Number of synthetic leaves. Default: 200000')
+  parser.add_argument('--repeat', type=int, default=3, help='Number of times to repeat each timing, the best is kept. Default: 3')
+  args = parser.parse_args()
+
+  leaves = synthetic_leaves(args.leaves)
+  # a few odd names to make sure the tokenizer agrees with the regexes on the edge cases
+  leaves += [('Odd', 'Int_t', 1, 1), ('OddAuxDyn.', 'Int_t', 1, 1), ('OddAuxDyn.xAuxDyn.', 'Int_t', 1, 1), ('OddAux.a:b', 'Int_t', 1, 1),
+             ('OddAux.aAuxDyn.b', 'Int_t', 1, 1), ('Odd.', 'Int_t', 1, 1), ('Odd:Name', 'Int_t', 1, 1), ('OddAux.xAux.', 'Int_t', 1, 1)]
+
+  regexTime, expected = best_time(classify_leaves_regex, leaves, args.repeat)
+  fastTime, result = best_time(dumpSG.classify_leaves, leaves, args.repeat)
+
+  if dumpSG.sgschema.as_dict(result) != dumpSG.sgschema.as_dict(dict(expected)):
+    print('The classifications differ!')
+    sys.exit(1)
+
+  print('{0} leaves, {1} containers'.format(len(leaves), len(result)))
+  print('  regex:     {0:.3f}s'.format(regexTime))
+  print('  tokenizer: {0:.3f}s'.format(fastTime))
+  print('  speedup:   {0:.1f}x'.format(regexTime/fastTime))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+# @file:    run.py
+# @purpose: time each phase of dumpSG.py on synthetic StoreGate trees and store the results as JSON
+#
+# @example:
+# @code
+# python benchmarks/run.py -o before.json
+# python benchmarks/run.py --containers 1000 --attrs 100 -o after.json --compare before.json
+# python benchmarks/run.py --report --containers 50 -o report.json
+# python benchmarks/run.py --root --entries 5000 -o report.json
+# @endcode
+#
+from __future__ import print_function
+
+import os, sys
+import argparse
+import json
+import platform
+import resource
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import dumpSG
+import synthetic
+from tracing import current_rss, cpu_time
+
+def peak_rss():
+  # ru_maxrss is in kB on Linux
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+class Phases(object):
+  '''
+  time phases, keeping the best wall time of each over the repetitions
+  '''
+  def __init__(self):
+    self.results = OrderedDict()
+
+  def run(self, name, fn, *args, **kwargs):
+    rssBefore = current_rss()
+    start, cpuStart = time.time(), cpu_time()
+    result = fn(*args, **kwargs)
+    wall, cpu = time.time() - start, cpu_time() - cpuStart
+    phase = {'wall': wall, 'cpu': cpu, 'rss_delta': current_rss() - rssBefore, 'peak_rss': peak_rss()}
+    if name not in self.results or wall < self.results[name]['wall']:
+      self.results[name] = phase
+    return result
+
+def benchmark(config, repeat=3):
+  schema = synthetic.synthetic_schema(containers=config['containers'], props=config['props'], attrs=config['attrs'])
+
+  workdir = tempfile.mkdtemp(prefix='xAODDumper_bench')
+  try:
+    if config['root']:
+      import ROOT
+      ROOT.gROOT.SetBatch(True)
+      path = synthetic.write_root_file(os.path.join(workdir, 'synthetic.root'), schema, entries=config['entries'])
+      tree = dumpSG.PyROOTBackend('CollectionTree', [path])
+    else:
+      tree = synthetic.memory_backend(schema, entries=config['entries'], data=config['report'])
+
+    # the functions in dumpSG.py read their options from the module-level args
+    dumpSG.args = dumpSG.make_parser().parse_args(['synthetic.root', '--prop', '--attr'])
+
+    phases = Phases()
+    for i in range(repeat):
+      dumpSG._normalized_types.clear()
+      dumpSG._btagging_types.clear()
+      xAOD_Objects = phases.run('inspect_tree', dumpSG.inspect_tree, tree)
+      filtered = phases.run('filter_xAOD_objects', dumpSG.filter_xAOD_objects, xAOD_Objects, dumpSG.args)
+      phases.run('update_sizes', dumpSG.update_sizes, filtered)
+      with open(os.path.join(workdir, 'info.dump'), 'w') as f:
+        phases.run('dump_pretty', dumpSG.dump_pretty, filtered, f)
+      if config['root'] or config['report']:
+        reportDirectory = os.path.join(workdir, 'report')
+        phases.run('make_report', dumpSG.make_report, tree, filtered, directory=reportDirectory)
+        shutil.rmtree(reportDirectory)
+  finally:
+    shutil.rmtree(workdir)
+
+  return phases.results
+
+def compare(results, baseline, tolerance):
+  '''
+  print the ratio of each phase to the baseline, returns the phases slower than the tolerance allows
+  '''
+  regressions = []
+  print('{0:<24}{1:>12}{2:>12}{3:>10}'.format('phase', 'baseline', 'current', 'ratio'))
+  for name, phase in results['phases'].items():
+    if name not in baseline['phases']: continue
+    old = baseline['phases'][name]['wall']
+    ratio = phase['wall']/old if old else float('inf')
+    flag = ''
+    if ratio > 1 + tolerance:
+      regressions.append(name)
+      flag = '  <-- regression'
+    print('{0:<24}{1:>11.4f}s{2:>11.4f}s{3:>10.2f}{4}'.format(name, old, phase['wall'], ratio, flag))
+  return regressions
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Benchmark the phases of dumpSG.py on synthetic StoreGate trees.')
+  parser.add_argument('--containers', type=int, default=1000, help='Number of containers. Default: 1000')
+  parser.add_argument('--props', type=int, default=10, help='Number of Aux. properties per container. Default: 10')
+  parser.add_argument('--attrs', type=int, default=30, help='Number of AuxDyn. attributes per container. Default: 30')
+  parser.add_argument('--entries', type=int, default=1000, help='Number of entries in the tree. Default: 1000')
+  parser.add_argument('--root', action='store_true', help='Write a real ROOT file and also time make_report. By default, the in-memory reader backend is used instead of a file, and ROOT is not needed. Default: disabled')
+  parser.add_argument('--report', action='store_true', help='Also time make_report on the in-memory reader backend, filling it with values first. Without ROOT, only the statistics are computed. Default: disabled')
+  parser.add_argument('--repeat', type=int, default=3, help='Number of repetitions, the best wall time of each phase is kept. Default: 3')
+  parser.add_argument('-o', '--output', type=str, default='benchmark.json', help='Output JSON file. Default: benchmark.json')
+  parser.add_argument('--compare', type=str, default=None, help='A previous output JSON file to compare against. Exits with an error if any phase regressed.')
+  parser.add_argument('--tolerance', type=float, default=0.2, help='Fractional slow-down of a phase allowed by --compare. Default: 0.2')
+  args = parser.parse_args()
+
+  config = OrderedDict([('containers', args.containers), ('props', args.props), ('attrs', args.attrs), ('entries', args.entries), ('root', args.root), ('report', args.report)])
+  results = OrderedDict([('timestamp', time.strftime('%Y-%m-%dT%H:%M:%S')),
+                         ('python', platform.python_version()),
+                         ('platform', platform.platform()),
+                         ('config', config),
+                         ('phases', benchmark(config, repeat=args.repeat))])
+
+  for name, phase in results['phases'].items():
+    print('{0:<24}{1:>10.4f}s wall{2:>10.4f}s cpu{3:>12} peak RSS'.format(name, phase['wall'], phase['cpu'], dumpSG.sizeof_fmt(phase['peak_rss'])))
+
+  with open(args.output, 'w') as f:
+    json.dump(results, f, indent=4)
+
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    if baseline['config'] != results['config']:
+      print('The configuration differs from the baseline, the comparison may not mean much.')
+    if compare(results, baseline, args.tolerance):
+      sys.exit(1)
@@ -0,0 +1,87 @@
+'''
+  Synthetic StoreGate-like trees for benchmarking dumpSG.py without a real ATLAS file.
+
+  A schema is a list of (container, type, properties, attributes). It can be turned
+  into an in-memory reader backend (see scripts/backends.py), or written out to a real
+  CollectionTree-like ROOT file.
+'''
+import random
+
+import backends
+
+container_types = ['DataVector<xAOD::Jet_v1>', 'DataVector<xAOD::Electron_v1>', 'DataVector<xAOD::Muon_v1>',
+                   'DataVector<xAOD::TrackParticle_v1>', 'DataVector<xAOD::CaloCluster_v1>', 'DataVector<xAOD::TrigComposite_v1>']
+leaf_types = ['vector<float>', 'vector<int>', 'vector<unsigned int>', 'vector<char>']
+
+def synthetic_schema(containers=100, props=10, attrs=30, seed=42):
+  '''
+  a list of (container, type, properties, attributes) with the given number of each
+  '''
+  rng = random.Random(seed)
+  schema = []
+  for i in range(containers):
+    containerType = rng.choice(container_types)
+    container = '{0}{1}'.format(containerType.split('::')[1].split('_')[0], i)
+    schema.append((container, containerType,
+                   [('prop{0}'.format(j), rng.choice(leaf_types)) for j in range(props)],
+                   [('attr{0}'.format(j), rng.choice(leaf_types)) for j in range(attrs)]))
+  return schema
+
+def schema_leaves(schema, seed=42):
+  '''
+  the (name, type, totbytes, filebytes) of every leaf, in the form of dumpSG.list_leaves()
+  '''
+  rng = random.Random(seed)
+  leaves = []
+  for container, containerType, props, attrs in schema:
+    leaves.append((container, containerType, rng.randint(100, 1000), rng.randint(50, 500)))
+    leaves.append((container + 'Aux.', 'xAOD::AuxContainerBase', rng.randint(100, 1000), rng.randint(50, 500)))
+    for name, leafType in props:
+      leaves.append(('{0}Aux.{1}'.format(container, name), leafType, rng.randint(1000, 100000), rng.randint(500, 50000)))
+    for name, leafType in attrs:
+      leaves.append(('{0}AuxDyn.{1}'.format(container, name), leafType, rng.randint(1000, 100000), rng.randint(500, 50000)))
+  return leaves
+
+def schema_data(schema, entries=1000, seed=42):
+  '''
+  rootname -> one list of values per event for every property and attribute, like write_root_file() fills
+  '''
+  rng = random.Random(seed)
+  data = {}
+  for container, containerType, props, attrs in schema:
+    for suffix, items in [('Aux.', props), ('AuxDyn.', attrs)]:
+      for name, leafType in items:
+        data['{0}{1}{2}'.format(container, suffix, name)] = [[int(rng.gauss(10, 5)) for j in range(rng.randint(0, 5))] for i in range(entries)]
+  return data
+
+def memory_backend(schema, entries=1000, data=False):
+  '''
+  a MemoryBackend with the leaves of the schema, and with values to report on if data is set
+  '''
+  return backends.MemoryBackend(schema_leaves(schema), data=schema_data(schema, entries) if data else None, entries=entries)
+
+def write_root_file(path, schema, entries=1000, tree_name='CollectionTree', seed=42):
+  '''
+  write a CollectionTree-like file with a std::vector branch for every property and attribute
+    - the interface and Aux. branches need the xAOD dictionaries, so they are left out
+  '''
+  import ROOT
+  rng = random.Random(seed)
+  f = ROOT.TFile(path, 'RECREATE')
+  tree = ROOT.TTree(tree_name, tree_name)
+  vectors = []
+  for container, containerType, props, attrs in schema:
+    for suffix, items in [('Aux.', props), ('AuxDyn.', attrs)]:
+      for name, leafType in items:
+        vec = ROOT.std.vector(leafType[7:-1])()
+        tree.Branch('{0}{1}{2}'.format(container, suffix, name), vec)
+        vectors.append(vec)
+  for i in range(entries):
+    for vec in vectors:
+      vec.clear()
+      for j in range(rng.randint(0, 5)):
+        vec.push_back(int(rng.gauss(10, 5)))
+    tree.Fill()
+  f.Write()
+  f.Close()
+  return path
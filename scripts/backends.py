@@ -0,0 +1,451 @@
+'''
+  Reader backends: everything dumpSG.py needs to read from the input files.
+
+  A backend lists the leaves of the tree (name, type name, in-memory and on-disk bytes),
+  counts the entries, and gives access to the values of branches in chunks. Filling the
+  report histograms is built on top of that, but a backend can do it its own way (the
+  PyROOT backend in dumpSG.py books everything on an RDataFrame).
+
+  Backends shipped here:
+    - UprootBackend: pure Python, reads with uproot 3 into NumPy arrays, no ROOT needed
+    - MemoryBackend: an in-memory stand-in, for tests and benchmarks
+'''
+import abc
+import time
+import random
+import logging
+
+import sghist
+
+logger = logging.getLogger("dumpSG.backends")
+
+class ReaderBackend(object):
+  '''
+  the base of every backend: leaves(), entries() and arrays() have to be implemented, the rest
+  is built on top of them and can be done better by a backend that knows how
+  '''
+  __metaclass__ = abc.ABCMeta
+  name = None
+  # the size of the clusters if a backend does not know its own
+  cluster_size = 1000
+
+  @abc.abstractmethod
+  def leaves(self, selector=None):
+    '''
+    iterable of (name, type, totbytes, filebytes) for every leaf, see dumpSG.list_leaves()
+      - selector is called with the (name, type) of every leaf and returns the names of the leaves
+        to keep, only those have their sizes read, see dumpSG.LeafSelector
+    '''
+    raise NotImplementedError
+
+  @abc.abstractmethod
+  def entries(self):
+    raise NotImplementedError
+
+  def clusters(self):
+    '''
+    list of the (start, stop) entries of the clusters, the ranges that can be read on their own
+    '''
+    entries = self.entries()
+    return [(start, min(start+self.cluster_size, entries)) for start in range(0, entries, self.cluster_size)]
+
+  def file_ranges(self):
+    '''
+    list of the (filename, start, stop) entries of each input file, empty if the backend cannot
+    open its files one at a time
+    '''
+    return []
+
+  def split_events(self, pieces, ranges=None):
+    '''
+    split the entries into (at least) pieces units, each read from a single input file on its own
+      - every file is a unit, unless there are fewer files than pieces: then the files are split
+        further along their clusters, into units of about entries/pieces entries
+      - ranges only keeps the given (start, stop) entries (see sample_ranges()), the units left
+        without any are dropped
+      - returns a list of (filename, start, stop, fileRanges) in the order of the entries, with
+        the fileRanges counted from the start of the file, None for all of it. It is empty if the
+        backend cannot open its files one at a time
+    '''
+    files = self.file_ranges()
+    share = float(sum(stop - start for fname, start, stop in files))/pieces
+    clusters = self.clusters() if files and len(files) < pieces else []
+    units = []
+    for fname, start, stop in files:
+      bounds = [(start, stop)]
+      if clusters and stop - start > share:
+        # clusters never span two files
+        bounds, unitStart = [], start
+        for clusterStart, clusterStop in clusters:
+          if clusterStart < start or clusterStop > stop: continue
+          if clusterStop - unitStart >= share:
+            bounds.append((unitStart, clusterStop))
+            unitStart = clusterStop
+        if unitStart < stop:
+          bounds.append((unitStart, stop))
+      for unitStart, unitStop in bounds:
+        if ranges is None:
+          fileRanges = None if (unitStart, unitStop) == (start, stop) else [(unitStart - start, unitStop - start)]
+        else:
+          fileRanges = [(max(rangeStart, unitStart) - start, min(rangeStop, unitStop) - start) for rangeStart, rangeStop in ranges if rangeStart < unitStop and rangeStop > unitStart]
+          if not fileRanges: continue
+        units.append((fname, unitStart, unitStop, fileRanges))
+    return units
+
+  @abc.abstractmethod
+  def arrays(self, rootnames, chunk_size=100000, ranges=None):
+    '''
+    yield {rootname: values} for chunks of (about) chunk_size entries, with the values of
+    vector<> branches flattened over the events of the chunk
+      - ranges is a list of (start, stop) entries to read, everything is read if it is None
+    '''
+    raise NotImplementedError
+
+  def fill_histograms(self, items, nbins=100, ranges=None, binning=None):
+    '''
+    fill the histograms of all the items in a single pass over the chunks of arrays()
+      - ranges only fills them from the given (start, stop) entries, see sample_ranges()
+      - binning is a dictionary of rootname -> (xmin, xmax) for histograms with a fixed range,
+        the others take theirs from the data, see sghist.Histogram
+      - returns a dictionary of rootname -> histogram dictionary (see sghist.py)
+      - items that could not be read are left out
+    '''
+    binning = binning or {}
+    histograms = {}
+    rootnames = []
+    for item in items:
+      if item['rootname'] not in histograms:
+        histograms[item['rootname']] = sghist.Histogram(nbins, limits=binning.get(item['rootname']))
+        rootnames.append(item['rootname'])
+    if not rootnames:
+      return {}
+
+    seen = set()
+    for chunk in self.arrays(rootnames, ranges=ranges):
+      for rootname, values in chunk.items():
+        try:
+          histograms[rootname].fill(values)
+          seen.add(rootname)
+        except (TypeError, ValueError) as e:
+          logger.info("Could not fill {0}, it will not be drawn.".format(rootname))
+          logger.debug(e)
+          histograms.pop(rootname, None)
+    return {rootname: histograms[rootname].to_dict() for rootname in seen if rootname in histograms}
+
+  def extrema(self, items, ranges=None):
+    '''
+    the smallest and largest value of each of the items in a single pass over the chunks of arrays()
+      - ranges only looks at the given (start, stop) entries, see sample_ranges()
+      - returns a dictionary of rootname -> (min, max), items without any values are left out
+    '''
+    rootnames = sorted(set(item['rootname'] for item in items))
+    if not rootnames:
+      return {}
+    extrema = {}
+    failed = set()
+    for chunk in self.arrays(rootnames, ranges=ranges):
+      for rootname, values in chunk.items():
+        if rootname in failed: continue
+        try:
+          limits = sghist.value_range(values)
+        except (TypeError, ValueError) as e:
+          logger.debug(e)
+          failed.add(rootname)
+          extrema.pop(rootname, None)
+          continue
+        if limits is None: continue
+        low, high = limits
+        if rootname in extrema:
+          low, high = min(low, extrema[rootname][0]), max(high, extrema[rootname][1])
+        extrema[rootname] = (low, high)
+    return extrema
+
+  def profile_branch(self, rootname, max_baskets=0):
+    '''
+    read a single branch on its own and time it
+      - returns a dictionary with the wall time, the decompression time, the bytes read (compressed)
+        and unzipped, and the number of baskets read, None if the branch cannot be read
+      - max_baskets only reads that many baskets, spread over the branch (0 reads all of them)
+      - anything the backend cannot tell is None, this default only knows the wall time
+    '''
+    start = time.time()
+    found = False
+    for chunk in self.arrays([rootname]):
+      found = found or rootname in chunk
+    if not found:
+      return None
+    return {'wall': time.time() - start, 'decompress': None, 'bytes_read': None, 'bytes_unzipped': None, 'baskets': None}
+
+  def set_cache(self, rootnames, cache_size):
+    '''
+    read through a cache of cache_size bytes (0 turns it off) with the given branches registered up front,
+    and start counting the reads over from here, see read_stats()
+      - a backend without such a cache does nothing
+    '''
+    pass
+
+  def read_stats(self):
+    '''
+    the reads since set_cache(), None if the backend cannot tell
+      - read_calls and bytes_read: the reads from the input files
+      - cache_size and branches: the size of the cache and the number of branches registered in it
+      - efficiency: the fraction of the baskets the cache prefetched that were used,
+        efficiency_rel: the fraction of the baskets that were read from the cache,
+        None without a cache
+    '''
+    return None
+
+  def recycle(self):
+    '''
+    let go of everything read so far (open files, baskets, caches) to give the memory back, see sgmemory.py
+      - the backend opens what it needs again on the next read
+    '''
+    pass
+
+  def draw_histogram(self, item, ranges=None):
+    '''
+    a last resort for items that fill_histograms() could not do, None if there is nothing else to try
+    '''
+    return None
+
+  def has_missing_values(self, item):
+    '''
+    whether an item that could not be drawn is simply missing its values
+    '''
+    return False
+
+class MemoryBackend(ReaderBackend):
+  '''
+  an in-memory stand-in for a tree
+    - leaves: the (name, type, totbytes, filebytes) of every leaf
+    - data: rootname -> list with one value (or list of values) per event
+  '''
+  name = 'memory'
+
+  def __init__(self, leaves, data=None, entries=None, cluster_size=100):
+    self._leaves = list(leaves)
+    self.data = data or {}
+    self._entries = entries
+    self.cluster_size = cluster_size
+
+  def leaves(self, selector=None):
+    if selector is None:
+      return iter(self._leaves)
+    selected = selector([(name, elType) for name, elType, totbytes, filebytes in self._leaves])
+    return (leaf for leaf in self._leaves if leaf[0] in selected)
+
+  def entries(self):
+    if self._entries is not None:
+      return self._entries
+    return max([len(values) for values in self.data.values()] or [0])
+
+  def arrays(self, rootnames, chunk_size=100000, ranges=None):
+    rootnames = [rootname for rootname in rootnames if rootname in self.data]
+    for start, stop in ranges or [(0, self.entries())]:
+      for chunkStart in range(start, stop, chunk_size):
+        chunkStop = min(chunkStart+chunk_size, stop)
+        yield dict((rootname, sghist.flatten(self.data[rootname][chunkStart:chunkStop])) for rootname in rootnames)
+
+# TLeaf classes of the basic types, and what TLeaf::GetTypeName() calls them
+leaf_types = {'TLeafO': 'Bool_t', 'TLeafB': 'Char_t', 'TLeafS': 'Short_t', 'TLeafI': 'Int_t', 'TLeafL': 'Long64_t',
+              'TLeafF': 'Float_t', 'TLeafD': 'Double_t', 'TLeafC': 'Char_t'}
+
+class UprootBackend(ReaderBackend):
+  '''
+  read the files with uproot, without ROOT
+    - this is the uproot 3 API (the uproot3 package, or uproot before 4), the last one running on Python 2
+    - like a TChain, the leaves and their sizes come from the first file
+    - the values are read in chunks into NumPy arrays
+  '''
+  name = 'uproot'
+
+  def __init__(self, tree_name, input_filenames):
+    try:
+      import uproot3 as uproot
+    except ImportError:
+      import uproot
+    self.uproot = uproot
+    self.tree_name = tree_name
+    self.input_filenames = list(input_filenames)
+    self._trees = {}
+    self._names = {}
+
+  def recycle(self):
+    self._trees = {}
+    self._names = {}
+
+  def tree(self, fname):
+    if fname not in self._trees:
+      self._trees[fname] = self.uproot.open(fname)[self.tree_name]
+    return self._trees[fname]
+
+  def readable(self, fname):
+    '''
+    the names of the branches of a file that uproot knows how to read
+    '''
+    if fname not in self._names:
+      tree = self.tree(fname)
+      self._names[fname] = set(name for name, branch in tree.iteritems(recursive=True) if branch.interpretation is not None)
+    return self._names[fname]
+
+  def type_name(self, branch, leaf):
+    '''
+    the closest we can get to TLeaf::GetTypeName() from what uproot reads
+    '''
+    if leaf.__class__.__name__ in leaf_types:
+      return leaf_types[leaf.__class__.__name__]
+    streamer = getattr(branch, '_streamer', None)
+    if streamer is not None and getattr(streamer, '_fTypeName', None):
+      return streamer._fTypeName
+    return getattr(branch, '_fClassName', '')
+
+  def leaves(self, selector=None):
+    tree = self.tree(self.input_filenames[0])
+    elements = [(name, branch, self.type_name(branch, leaf)) for name, branch in tree.iteritems(recursive=True) for leaf in branch._fLeaves]
+    selected = selector([(name, elType) for name, branch, elType in elements]) if selector else None
+    for name, branch, elType in elements:
+      if selected is not None and name not in selected: continue
+      # the sizes add up the baskets of the branch
+      yield (name, elType, branch.uncompressedbytes(), branch.compressedbytes())
+
+  def entries(self):
+    return sum(self.tree(fname).numentries for fname in self.input_filenames)
+
+  def file_ranges(self):
+    ranges = []
+    offset = 0
+    for fname in self.input_filenames:
+      entries = self.tree(fname).numentries
+      ranges.append((fname, offset, offset + entries))
+      offset += entries
+    return ranges
+
+  def clusters(self):
+    clusters = []
+    offset = 0
+    for fname in self.input_filenames:
+      tree = self.tree(fname)
+      # the entries where the baskets of every branch start
+      clusters.extend((offset + start, offset + stop) for start, stop in tree.clusters())
+      offset += tree.numentries
+    return clusters
+
+  def profile_branch(self, rootname, max_baskets=0):
+    # like the sizes, this only looks at the first file
+    fname = self.input_filenames[0]
+    if rootname not in self.readable(fname):
+      return None
+    branch = self.tree(fname)[rootname]
+    baskets = spread(branch.numbaskets, max_baskets)
+    start = time.time()
+    for i in baskets:
+      branch.array(entrystart=branch.basket_entrystart(i), entrystop=branch.basket_entrystop(i), cache=None, basketcache=None)
+    return {'wall': time.time() - start,
+            'decompress': None,
+            'bytes_read': sum(branch.basket_compressedbytes(i) for i in baskets),
+            'bytes_unzipped': sum(branch.basket_uncompressedbytes(i) for i in baskets),
+            'baskets': len(baskets)}
+
+  def arrays(self, rootnames, chunk_size=100000, ranges=None):
+    offset = 0
+    for fname in self.input_filenames:
+      tree = self.tree(fname)
+      entries = tree.numentries
+      readable = self.readable(fname)
+      names = [rootname for rootname in rootnames if rootname in readable]
+      # the ranges are over all of the files, so move them to the entries of this one
+      fileRanges = [(max(start, offset) - offset, min(stop, offset + entries) - offset) for start, stop in ranges or [(offset, offset + entries)]]
+      offset += entries
+      for start, stop in fileRanges:
+        if not names or start >= stop: continue
+        for chunk in tree.iterate(names, entrysteps=chunk_size, entrystart=start, entrystop=stop):
+          yield dict((rootname, flat_array(values)) for rootname, values in chunk.items())
+
+def flat_array(values):
+  '''
+  a chunk of values read by uproot as a flat NumPy array, over all of the events of the chunk
+  '''
+  import numpy
+  # jagged arrays (vector<> branches) are flattened one level at a time
+  while hasattr(values, 'starts') and hasattr(values, 'flatten'):
+    values = values.flatten()
+  if isinstance(values, numpy.ndarray) and values.dtype != object:
+    return values
+  # objects, e.g. one list per event of vector<vector<> > branches
+  return numpy.asarray(sghist.flatten(values), dtype='float64')
+
+def spread(n, k):
+  '''
+  k of the indices 0..n-1, evenly spread over them, or all of them if k is 0
+  '''
+  if not k or n <= k:
+    return range(n)
+  return [int(i*float(n)/k) for i in range(k)]
+
+def combine_read_stats(stats):
+  '''
+  add up the read_stats() of several readers, e.g. the workers of a report, None if there are none
+    - each worker registers its own branches, so these are added up too, the cache size is the largest
+    - the efficiencies are averaged, weighted by the bytes each reader read
+  '''
+  stats = [s for s in stats if s is not None]
+  if not stats:
+    return None
+  combined = {'read_calls': sum(s['read_calls'] for s in stats), 'bytes_read': sum(s['bytes_read'] for s in stats),
+              'cache_size': max(s['cache_size'] for s in stats), 'branches': sum(s['branches'] for s in stats)}
+  for key in ['efficiency', 'efficiency_rel']:
+    weighted = [(s[key], s['bytes_read']) for s in stats if s[key] is not None]
+    weights = sum(w for value, w in weighted)
+    if not weighted:
+      combined[key] = None
+    elif weights:
+      combined[key] = sum(value*w for value, w in weighted)/weights
+    else:
+      combined[key] = sum(value for value, w in weighted)/len(weighted)
+  return combined
+
+sample_modes = ['first', 'spread', 'random']
+
+def sample_ranges(clusters, budget, mode='first', seed=42):
+  '''
+  pick the (start, stop) entries to read to get about budget entries out of the clusters
+    - first: the first entries, up to exactly budget of them
+    - spread: whole clusters, evenly spaced over all of them
+    - random: whole clusters picked at random, always the same ones for a given seed
+  whole clusters keep the reading sequential, the ranges are returned in order
+  '''
+  if mode not in sample_modes:
+    raise ValueError('The sample mode `{0}` is not one of {1}.'.format(mode, ', '.join(sample_modes)))
+  if mode == 'first':
+    ranges = []
+    for start, stop in clusters:
+      if budget <= 0: break
+      ranges.append((start, min(stop, start + budget)))
+      budget -= ranges[-1][1] - start
+    return ranges
+
+  if mode == 'spread':
+    # walk the clusters by their entries and take the next one whenever less than the share of the
+    # budget of the entries so far was taken, so that the budget is spread over clusters of any size
+    entries = sum(stop - start for start, stop in clusters)
+    share = float(budget)/entries if entries else 0.
+    order = []
+    taken, seen = 0, 0
+    for start, stop in clusters:
+      if taken >= budget: break
+      if taken <= share*seen:
+        order.append((start, stop))
+        taken += stop - start
+      seen += stop - start
+    chosen = set(order)
+    order += [cluster for cluster in clusters if cluster not in chosen]
+  else:
+    order = list(clusters)
+    random.Random(seed).shuffle(order)
+
+  ranges = []
+  for start, stop in order:
+    if budget <= 0: break
+    ranges.append((start, stop))
+    budget -= stop - start
+  return sorted(ranges)
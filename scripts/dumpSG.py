@@ -47,6 +47,53 @@ import copy
 # used for the filtering of objects
 import fnmatch
 
+# used to fingerprint the set of branches in each file
+import hashlib
+
+# used to pass histogram statistics to and from ROOT
+from array import array
+
+# used to time the reading of each branch
+import time
+
+# used to find the files of the datasets of a batch, and to report why a dataset failed
+import glob
+import traceback
+
+# compact records for the structure of the tree
+import sgschema
+
+# used to skip inspecting files we have already seen
+import sgcache
+
+# used to time where everything goes
+import tracing
+
+# used to read the input files, with or without ROOT
+import backends
+
+# used to handle histograms without ROOT
+import sghist
+
+# used to resume a report instead of redoing it
+import sgmanifest
+
+# used to compare two datasets
+import sgdiff
+
+# used to account for the sizes of everything
+import sgsizes
+
+# used to compare what analysis jobs read with what they use
+import sgaccess
+
+# used to keep the memory of the report in check
+import sgmemory
+
+# the worker pools (multiprocessing), the plots without ROOT (sgrender), the interactive session
+#   (threading, sgquery) and the index (sgindex) are imported by the modes that use them, like ROOT
+#   in load_root(), so that a plain listing does not pay for SocketServer or sqlite3
+
 # used for output formats
 import json
 try:
@@ -65,8 +112,29 @@ except:
       ROOT.gROOT.ProcessLine("gSystem->RedirectOutput(0);")
 '''
 
-# Set up ROOT
-import ROOT
+# Set up ROOT, but only when we actually need to read something: importing it takes
+#   seconds, which --help or a run from the schema cache should not have to pay for
+ROOT = None
+# how ROOT should be configured once it is loaded, set from the command line
+root_settings = {'batch_mode': False, 'redirect': None}
+
+def load_root():
+  '''
+  import and configure ROOT on first use, safe to call as often as needed
+  '''
+  global ROOT
+  if ROOT is None:
+    dumpSG_logger.info("Loading ROOT")
+    with tracing.span('import ROOT'):
+      import ROOT as _ROOT
+      # we already parsed the command line, do not let ROOT look at it
+      _ROOT.PyConfig.IgnoreCommandLineOptions = True
+      if root_settings['redirect']:
+        _ROOT.gSystem.RedirectOutput(root_settings['redirect'], "w")
+      # if flag is shown, set batch_mode to true, else false
+      _ROOT.gROOT.SetBatch(root_settings['batch_mode'])
+    ROOT = _ROOT
+  return ROOT
 
 
 # human readable bytes
@@ -85,6 +153,15 @@ def sizeof_fmt(num):
     if num == 1:
         return '1 byte'
 
+def signed_sizeof_fmt(num, signed=True):
+  '''
+  sizeof_fmt() for differences and sizes per event, which can be negative or less than a byte
+  '''
+  sign = ('-' if num < 0 else '+') if signed else ''
+  if 0 < abs(num) < 1:
+    return '{0}{1:.2f} bytes'.format(sign, abs(num))
+  return sign + sizeof_fmt(abs(num))
+
 
 def format_arg_value(arg_val):
   """ Return a string representing a (name, value) pair.
@@ -133,8 +210,184 @@ def echo(*echoargs, **echokwargs):
   return echo_wrap
 
 #@echo(write=dumpSG_logger.debug)
-def inspect_tree(t):
+def make_chain(tree_name, input_filenames):
+  '''
+  build a TChain of the given tree over all of the input files
+  '''
+  load_root()
+  t = ROOT.TChain(tree_name)
+  for fname in input_filenames:
+    if not fname.startswith('root://') and not os.path.isfile(fname):
+      raise ValueError('The supplied input file `{0}` does not exist or I cannot find it.'.format(fname))
+    else:
+      dumpSG_logger.info("\tAdding {0}".format(fname))
+      t.Add(fname)
+  return t
+
+#@echo(write=dumpSG_logger.debug)
+def list_leaves(t, selector=None):
+  '''
+  yield the (name, type, totbytes, filebytes) of every leaf in the tree
+    - NB: on a TChain, the sizes only reflect the tree currently loaded, see scan_files()
+    - only the leaves picked by the selector have their sizes read, see LeafSelector
+  '''
+  # call them elements, because there are 4 types inside the leaves
+  #   get the name of the element
+  #   because of stupid people, we need to go up to the branch for this
+  elements = [(el.GetBranch(), el.GetTypeName()) for el in t.GetListOfLeaves()]
+  selected = selector([(branch.GetName(), elType) for branch, elType in elements]) if selector else None
+  for branch, elType in elements:
+    if selected is not None and branch.GetName() not in selected: continue
+    # these are the expensive part, GetTotalSize() streams the whole branch to count it
+    yield (branch.GetName(), elType, branch.GetTotalSize(), branch.GetZipBytes())
+
+#@echo(write=dumpSG_logger.debug)
+def inspect_tree(t, selector=None):
   '''
+  build up the dictionary of xAOD objects from the leaves of a reader backend, see classify_leaves()
+    - only the containers, properties and attributes picked by the selector are read, see LeafSelector
+  '''
+  return classify_leaves(t.leaves(selector=selector))
+
+# lots of regex to normalize the type names
+xAOD_Type_Name = re.compile('^(vector<)?(.+?)(?(1)(?: ?>))$')
+xAOD_remove_version = re.compile('_v\d+')
+xAOD_Grab_Inner_Type = re.compile('<([^<>]*)>')
+xAOD_DataVector_Type = re.compile('^DataVector<(.*?)>$')
+
+# the same few hundred type names repeat across all of the leaves, so only normalize each one once
+_normalized_types = {}
+def normalize_type(elType):
+  '''
+  strip the vector<>, Aux and _vN from a leaf type name, and turn DataVector<T> into TContainer
+  '''
+  try:
+    return _normalized_types[elType]
+  except KeyError:
+    pass
+  normalized = xAOD_remove_version.sub('', xAOD_Type_Name.search(elType).groups()[1].replace('Aux','') )
+  m_container_type_name = xAOD_DataVector_Type.search(normalized)
+  if m_container_type_name:  # found a datavector type
+    normalized, = m_container_type_name.groups()
+    normalized += "Container"
+  _normalized_types[elType] = normalized
+  return normalized
+
+_btagging_types = {}
+def btagging_type(elType):
+  '''
+  ElementLink<DataVector<xAOD::BTagging> > becomes xAOD::BTagging *, anything else is left alone
+  '''
+  try:
+    return _btagging_types[elType]
+  except KeyError:
+    pass
+  btaggingType = xAOD_Grab_Inner_Type.search(elType)
+  _btagging_types[elType] = btaggingType.groups()[0] + ' *' if btaggingType else elType
+  return _btagging_types[elType]
+
+def classify_name(elName):
+  '''
+  tokenize a branch name on its Aux./AuxDyn. suffix, returns (kind, container, name)
+    - `AntiKt10LCTopoAux.`         -> ('aux', 'AntiKt10LCTopo', None)
+    - `AntiKt10LCTopoAux.pt`       -> ('prop', 'AntiKt10LCTopo', 'pt')
+    - `AntiKt10LCTopoAuxDyn.Tau1`  -> ('attr', 'AntiKt10LCTopo', 'Tau1')
+    - `AntiKt10LCTopo`             -> ('container', 'AntiKt10LCTopo', None)
+    - anything else                -> (None, None, None)
+  the split is always on the last suffix that is followed by a name without a `:`
+  '''
+  if elName.endswith('Aux.'):
+    return ('aux', elName[:-4], None)
+  i = elName.rfind('Aux.')
+  if i >= 0 and ':' not in elName[i+4:]:
+    return ('prop', elName[:i], elName[i+4:])
+  i = elName.rfind('AuxDyn.')
+  if i >= 0 and i+7 == len(elName):
+    # nothing follows the last one, so the name must come after an earlier one
+    i = elName.rfind('AuxDyn.', 0, i+6)
+  if i >= 0 and ':' not in elName[i+7:]:
+    return ('attr', elName[:i], elName[i+7:])
+  if ':' not in elName and not elName.endswith('.'):
+    return ('container', elName, None)
+  return (None, None, None)
+
+def item_kind(kind, name, elType):
+  '''
+  (kind, name, type) of a property or attribute as it is listed, see classify_leaves()
+  '''
+  if kind == 'attr' and 'btagging' in name.lower():
+    # print attribute, "|", elName, "|", elType
+    '''
+    David found an issue where instead of expecting something that looks like
+        btaggingLink | AntiKt10LCTopoJetsAuxDyn.btaggingLink | ElementLink<DataVector<xAOD::BTagging> >
+    it instead looks like
+        btaggingLink_ | AntiKt10LCTopoJetsAuxDyn.btaggingLink_ | Int_t
+    '''
+    return ('prop', name.replace('Link',''), btagging_type(elType))
+  return (kind, name, elType)
+
+class LeafSelector(object):
+  '''
+  the filters on the container names and types (--container, --type) and on the property and
+  attribute names (--filterProps, --filterAttrs), all Unix filename patterns, compiled once
+    - pushed down into the listing of the leaves: called with the (name, type) of every leaf, it
+      returns the names of the leaves to keep, and only those have their sizes read, see list_leaves()
+    - the type of a container comes from its interface leaf, which can be anywhere in the tree, so
+      the names and types are classified first and the type filter is applied afterwards
+    - the interface and Aux. branches of a selected container are always kept, for its sizes
+    - select() applies the same filters to a schema that was read without them, e.g. from the cache
+  '''
+
+  def __init__(self, container_name='*', container_type='*', property_name='*', attribute_name='*'):
+    self.patterns = (container_name, container_type, property_name, attribute_name)
+    self.container_name, self.container_type, self.property_name, self.attribute_name = [re.compile(fnmatch.translate(pattern)) for pattern in self.patterns]
+
+  @staticmethod
+  def from_args(args):
+    # not every command line has all of them (e.g. diff)
+    return LeafSelector(*[getattr(args, dest, '*') for dest in ['container_name_regex', 'container_type_regex', 'property_name_regex', 'attribute_name_regex']])
+
+  def everything(self):
+    return all(pattern == '*' for pattern in self.patterns)
+
+  def signature(self):
+    return '|'.join(self.patterns)
+
+  def match_item(self, kind, name):
+    return (self.property_name if kind == 'prop' else self.attribute_name).match(name) is not None
+
+  def __call__(self, leaves):
+    types, candidates = {}, []
+    for elName, elType in leaves:
+      kind, container, name = classify_name(elName)
+      if kind is None or not self.container_name.match(container): continue
+      if kind == 'container':
+        types.setdefault(container, normalize_type(elType))
+      elif kind in ['prop', 'attr']:
+        kind, name, itemType = item_kind(kind, name, elType)
+        if not self.match_item(kind, name): continue
+      candidates.append((elName, container))
+    return set(elName for elName, container in candidates if self.container_type.match(types.get(container, '')))
+
+  def select(self, xAOD_Objects):
+    '''
+    the containers, properties and attributes of a schema that pass the filters, without copying the branches
+    '''
+    if self.everything():
+      return xAOD_Objects
+    selected = {}
+    for container, containerVals in xAOD_Objects.iteritems():
+      if not self.container_name.match(container) or not self.container_type.match(containerVals['type']): continue
+      selected[container] = copy.copy(containerVals)
+      for kind in ['prop', 'attr']:
+        selected[container][kind] = [item for item in containerVals[kind] if self.match_item(kind, item['name'])]
+    return selected
+
+#@echo(write=dumpSG_logger.debug)
+def classify_leaves(leaves):
+  '''
+  leaves is an iterable of (name, type, totbytes, filebytes), see list_leaves()
+
   filter based on the 4 elements:
     - Container Name: this comes in the form like `AntiKt10LCTopo`
       - this contains the correct type for the object (xAOD::JetContainer_v1)
@@ -148,87 +401,105 @@ def inspect_tree(t):
   '''
 
   # list of properties and methods given Container Name
-  xAOD_Objects = defaultdict(lambda: {'prop': [], 'attr': [], 'type': '', 'has_interface': False, 'has_aux': False, 'rootname': '', 'totbytes': 0, 'filebytes': 0})
-
-  # lots of regex to pass things around and figure out structure
-  xAOD_Container_Name = re.compile('^([^:]*)(?<!\.)$')
-  xAOD_AuxContainer_Name = re.compile('(.*)Aux\.$')
-  xAOD_Container_Prop = re.compile('(.*)Aux\.([^:]+)$')
-  xAOD_Container_Attr = re.compile('(.*)AuxDyn\.([^:]+)$')
-  xAOD_Type_Name = re.compile('^(vector<)?(.+?)(?(1)(?: ?>))$')
-  xAOD_remove_version = re.compile('_v\d+')
-  xAOD_Grab_Inner_Type = re.compile('<([^<>]*)>')
-  xAOD_DataVector_Type = re.compile('^DataVector<(.*?)>$')
-
-  # call them elements, because there are 4 types inside the leaves
-  elements = t.GetListOfLeaves()
-  for el in elements:
-    # get the name of the element
-    # because of stupid people, we need to go up to the branch for this
-    elName = el.GetBranch().GetName()
-
-    # filter its type out
-    elType = el.GetTypeName()
-    elType = xAOD_remove_version.sub('', xAOD_Type_Name.search(elType).groups()[1].replace('Aux','') )
+  xAOD_Objects = {}
 
+  for elName, elType, totbytes, filebytes in leaves:
     # match the name against the 4 elements we care about, figure out which one it is next
-    m_cont_name = xAOD_Container_Name.search(elName)
-    m_aux_name = xAOD_AuxContainer_Name.search(elName)
-    m_cont_prop = xAOD_Container_Prop.search(elName)
-    m_cont_attr = xAOD_Container_Attr.search(elName)
+    kind, container, name = classify_name(elName)
+    if kind is None: continue
 
-    # filter out the elType
-    m_container_type_name = xAOD_DataVector_Type.search(elType)
-    if m_container_type_name:  # found a datavector type
-      elType, = m_container_type_name.groups()
-      elType += "Container"
+    # filter its type out
+    elType = normalize_type(elType)
 
-    # get size information
-    totbytes = el.GetBranch().GetTotalSize()
-    filebytes = el.GetBranch().GetZipBytes()
+    # initialize with defaults if not set already
+    containerVals = xAOD_Objects.get(container)
+    if containerVals is None:
+      containerVals = xAOD_Objects[container] = sgschema.Container()
 
     # set the type
-    if m_aux_name:
-      container, = m_aux_name.groups()
-      #xAOD_Objects[container]['type'] = elType
-      xAOD_Objects[container]['has_aux'] = True  # we found the aux for it
-      xAOD_Objects[container]['rootname'] = elName
+    if kind == 'aux':
+      #containerVals.type = elType
+      containerVals.has_aux = True  # we found the aux for it
+      containerVals.rootname = elName
       # always add bytes to the parent container, regardless of what we're doing
-      xAOD_Objects[container]['totbytes'] += totbytes
-      xAOD_Objects[container]['filebytes'] += filebytes
-
-    # set the property
-    elif m_cont_prop:
-      container, property = m_cont_prop.groups()
-      xAOD_Objects[container]['prop'].append({'name': property, 'type': elType, 'rootname': elName, 'totbytes': totbytes, 'filebytes': filebytes})
-    # set the attribute
-    elif m_cont_attr:
-      container, attribute = m_cont_attr.groups()
-      if 'btagging' in attribute.lower():
-        # print attribute, "|", elName, "|", elType
-        '''
-        David found an issue where instead of expecting something that looks like
-            btaggingLink | AntiKt10LCTopoJetsAuxDyn.btaggingLink | ElementLink<DataVector<xAOD::BTagging> >
-        it instead looks like
-            btaggingLink_ | AntiKt10LCTopoJetsAuxDyn.btaggingLink_ | Int_t
-        '''
-        btaggingType = xAOD_Grab_Inner_Type.search(elType)
-        if btaggingType:
-          elType = btaggingType.groups()[0] + ' *'
-        attribute = attribute.replace('Link','')
-        xAOD_Objects[container]['prop'].append({'name': attribute, 'type': elType, 'rootname': elName, 'totbytes': totbytes, 'filebytes': filebytes})
-      else:
-        xAOD_Objects[container]['attr'].append({'name': attribute, 'type': elType, 'rootname': elName, 'totbytes': totbytes, 'filebytes': filebytes})
-    elif m_cont_name:
-      # initialize with defaults if not set already
-      container, = m_cont_name.groups()
-      xAOD_Objects[container]['type'] = xAOD_Objects[container]['type'] or elType
-      xAOD_Objects[container]['has_interface'] = True  # we found the interface
-      xAOD_Objects[container]['rootname'] = xAOD_Objects[container]['rootname'] or elName
+      containerVals.totbytes += totbytes
+      containerVals.filebytes += filebytes
+
+    # set the property or the attribute
+    elif kind in ['prop', 'attr']:
+      kind, name, elType = item_kind(kind, name, elType)
+      getattr(containerVals, kind).append(sgschema.Branch(name, elType, elName, totbytes, filebytes))
+    elif kind == 'container':
+      containerVals.type = containerVals.type or elType
+      containerVals.has_interface = True  # we found the interface
+      containerVals.rootname = containerVals.rootname or elName
       # always add bytes to the parent container, regardless of what we're doing
-      xAOD_Objects[container]['totbytes'] += totbytes
-      xAOD_Objects[container]['filebytes'] += filebytes
+      containerVals.totbytes += totbytes
+      containerVals.filebytes += filebytes
+
+  return xAOD_Objects
 
+def _scan_file(payload):
+  backend, tree_name, fname, selector = payload
+  reader = open_backend(backend, tree_name, [fname])
+  leaves = list(reader.leaves(selector=selector))
+  return (fname, reader.entries(), leaves)
+
+#@echo(write=dumpSG_logger.debug)
+def scan_files(tree_name, input_filenames, jobs=1, backend='root', selector=None):
+  '''
+  read the branch metadata of every input file on its own (in parallel if jobs > 1)
+    - the sizes of each branch are added up across all of the files, unlike on a TChain
+    - only the leaves picked by the selector are read, see LeafSelector
+    - the set of branches of each file is fingerprinted and files that differ from the majority are reported
+    - returns (entries, leaves) where leaves is in the same form as list_leaves()
+  '''
+  payloads = [(backend, tree_name, fname, selector) for fname in input_filenames]
+  dumpSG_logger.info("Scanning {0} files with {1} worker(s)".format(len(payloads), jobs))
+  if jobs > 1 and len(payloads) > 1:
+    import multiprocessing
+    pool = multiprocessing.Pool(processes=min(jobs, len(payloads)))
+    try:
+      results = pool.map(_scan_file, payloads)
+    finally:
+      pool.close()
+      pool.join()
+  else:
+    results = map(_scan_file, payloads)
+
+  entries = 0
+  # name -> [type, totbytes, filebytes], keeping the order we first see them in
+  sizes = {}
+  order = []
+  branches = {}
+  fingerprints = defaultdict(list)
+  for fname, fileEntries, leaves in results:
+    entries += fileEntries
+    for elName, elType, totbytes, filebytes in leaves:
+      if elName not in sizes:
+        sizes[elName] = [elType, 0, 0]
+        order.append(elName)
+      sizes[elName][1] += totbytes
+      sizes[elName][2] += filebytes
+    branches[fname] = set((elName, elType) for elName, elType, totbytes, filebytes in leaves)
+    fingerprints[hashlib.sha1(repr(sorted(branches[fname]))).hexdigest()].append(fname)
+
+  if len(fingerprints) > 1:
+    majority = max(fingerprints.itervalues(), key=len)
+    reference = branches[majority[0]]
+    dumpSG_logger.warning("The following files have a different set of branches than the majority ({0} of {1} files)".format(len(majority), len(payloads)))
+    for fname in input_filenames:
+      if fname in majority: continue
+      missing, extra = reference - branches[fname], branches[fname] - reference
+      dumpSG_logger.warning("\t | {0}: {1} missing, {2} extra".format(fname, len(missing), len(extra)))
+      for elName, elType in sorted(missing): dumpSG_logger.info("\t |\t - {0} ({1})".format(elName, elType))
+      for elName, elType in sorted(extra): dumpSG_logger.info("\t |\t + {0} ({1})".format(elName, elType))
+    dumpSG_logger.warning("\t {0}".format("-"*40))
+
+  return (entries, [(elName, sizes[elName][0], sizes[elName][1], sizes[elName][2]) for elName in order])
+
+#@echo(write=dumpSG_logger.debug)
+def warn_missing(xAOD_Objects):
   missing_ifc = []
   missing_aux = []
   for k,v in xAOD_Objects.iteritems():
@@ -244,69 +515,386 @@ def inspect_tree(t):
     for k in missing_aux: dumpSG_logger.warning("\t | {0}".format(k))
     dumpSG_logger.warning("\t {0}".format("-"*40))
 
-  return xAOD_Objects
-
-#@echo(write=dumpSG_logger.debug)
-def save_plot(pathToImage, item, container, width=700, height=500, formats=['png'], logTolerance=5.e2):
+  return True
 
-  tryToDraw = True
-  htemp = None
-  dumpSG_logger.info("Trying to draw {0} of type {1}".format(item['name'], item['type']))
+def undrawable_reason(item):
+  '''
+  some types/branches are known to break drawing, so we never try to draw them
+    - returns the reason why the item cannot be drawn, None if it can be drawn
+  '''
   if 'ElementLink' in item['type']:  # ElementLink type is more or less broken
-    dumpSG_logger.warning("{0} is an ElementLink type, so we will not draw it.".format(item['name']))
-    tryToDraw = False
+    return "{0} is an ElementLink type, so we will not draw it.".format(item['name'])
   if item['name'] in ['CaloCellETByLayer', 'CaloCellEnergyByLayer']:
-    dumpSG_logger.warning("{0} has issues with being drawn, so we will not draw it.".format(item['name']))
-    tryToDraw = False
+    return "{0} has issues with being drawn, so we will not draw it.".format(item['name'])
+  return None
+
+def hist_to_dict(h):
+  '''
+  snapshot a TH1 into a plain dictionary so it can be passed around (and pickled) freely
+    - contents includes the underflow and overflow bins
+    - stats is the TH1::GetStats() array: [sumw, sumw2, sumwx, sumwx2]
+  '''
+  stats = array('d', [0.0]*4)
+  h.GetStats(stats)
+  nbins = h.GetNbinsX()
+  return {'nbins': nbins,
+          'xmin': h.GetXaxis().GetXmin(),
+          'xmax': h.GetXaxis().GetXmax(),
+          'contents': [h.GetBinContent(i) for i in range(nbins+2)],
+          'entries': h.GetEntries(),
+          'stats': list(stats)}
+
+def dict_to_hist(name, hist):
+  '''
+  rebuild a TH1 from hist_to_dict(), detached from gDirectory
+  '''
+  h = ROOT.TH1D(name, name, hist['nbins'], hist['xmin'], hist['xmax'])
+  h.SetDirectory(0)
+  for i, content in enumerate(hist['contents']):
+    h.SetBinContent(i, content)
+  # SetBinContent() resets the statistics, so restore them afterwards
+  h.SetEntries(hist['entries'])
+  h.PutStats(array('d', hist['stats']))
+  return h
+
+def entry_selection(ranges, entry='rdfentry_'):
+  '''
+  a selection on the entry number that keeps the (start, stop) ranges, for RDataFrame or TTree::Draw (Entry$)
+  '''
+  return ' || '.join('({0} >= {1} && {0} < {2})'.format(entry, start, stop) for start, stop in ranges)
 
-  if tryToDraw:
-    c = ROOT.TCanvas(item['name'], item['name'], 200, 10, width, height)
-    t.Draw(item['rootname'])
+#@echo(write=dumpSG_logger.debug)
+def draw_histogram(t, item, ranges=None):
+  '''
+  draw a single branch with TTree::Draw, this is one full pass over the chain
+    - ranges only draws the given (start, stop) entries
+    - returns hist_to_dict() of the drawn histogram, None if nothing could be drawn
+    - nothing is left behind: there is no canvas (goff), and the histogram is made in memory
+      rather than in the directory of the current file, and deleted once it is copied
+  '''
+  ROOT.gROOT.cd()
+  with tracing.span('TTree::Draw', rootname=item['rootname']):
+    t.Draw('{0}>>dumpSG_htemp'.format(item['rootname']), entry_selection(ranges, entry='Entry$') if ranges else '', 'goff')
+  htemp = ROOT.gROOT.FindObject('dumpSG_htemp')
+  if not htemp:
+    return None
+  hist = hist_to_dict(htemp)
+  # TTree::Draw made it, so it is ours to delete
+  htemp.SetDirectory(0)
+  htemp.Delete()
+  return hist
 
-    # get histogram drawn and grab details
-    htemp = c.GetPrimitive("htemp")
+#@echo(write=dumpSG_logger.debug)
+def fill_histograms(t, items, nbins=100, ranges=None, binning=None):
+  '''
+  fill the histograms of all the items in a single pass over the chain
+    - books one Histo1D per item on an RDataFrame, so the report costs one event loop
+      instead of one TTree::Draw per branch
+    - the histograms are auto-binned from the data (xmin == xmax), like TTree::Draw does, unless
+      binning has a fixed (xmin, xmax) range for their rootname
+    - ranges only fills them from the given (start, stop) entries, the branches are not read for the others
+    - returns a dictionary of rootname -> hist_to_dict()
+    - items that could not be booked are left out, save_plot() falls back to TTree::Draw for them
+  '''
+  if not hasattr(ROOT, 'RDataFrame'):
+    dumpSG_logger.info("RDataFrame is not available, falling back to one TTree::Draw per branch.")
+    return {}
+
+  df = ROOT.RDataFrame(t)
+  if ranges:
+    df = df.Filter(entry_selection(ranges), 'sample')
+  binning = binning or {}
+  booked = {}
+  for item in items:
+    if item['rootname'] in booked: continue
+    if undrawable_reason(item): continue
+    try:
+      xmin, xmax = binning.get(item['rootname'], (0., 0.))
+      model = ROOT.RDF.TH1DModel(item['rootname'], item['name'], nbins, xmin, xmax)
+      booked[item['rootname']] = df.Histo1D(model, item['rootname'])
+    except Exception as e:
+      dumpSG_logger.info("Could not book {0} in the single-pass report, it will be drawn separately.".format(item['rootname']))
+      dumpSG_logger.debug(e)
+
+  dumpSG_logger.info("Filling {0} histograms in a single pass over the chain".format(len(booked)))
+  hists = {}
+  try:
+    # the first GetValue() triggers the event loop, filling everything that was booked
+    with tracing.span('fill_histograms', booked=len(booked)):
+      for rootname, result in booked.iteritems():
+        hists[rootname] = hist_to_dict(result.GetValue())
+  except Exception as e:
+    dumpSG_logger.warning("The single-pass report failed, falling back to one TTree::Draw per branch.")
+    dumpSG_logger.debug(e)
+    return {}
+  return hists
+
+#@echo(write=dumpSG_logger.debug)
+def find_extrema(t, items, ranges=None):
+  '''
+  the smallest and largest value of each of the items in a single pass over the chain
+    - books a Min and a Max per item on an RDataFrame, like fill_histograms() books its histograms
+    - ranges only looks at the given (start, stop) entries
+    - returns a dictionary of rootname -> (min, max), items without any values (or that could not
+      be booked) are left out
+  '''
+  if not hasattr(ROOT, 'RDataFrame'):
+    return {}
+
+  df = ROOT.RDataFrame(t)
+  if ranges:
+    df = df.Filter(entry_selection(ranges), 'sample')
+  booked = {}
+  for item in items:
+    if item['rootname'] in booked: continue
+    if undrawable_reason(item): continue
+    try:
+      booked[item['rootname']] = (df.Min(item['rootname']), df.Max(item['rootname']))
+    except Exception as e:
+      dumpSG_logger.debug(e)
+
+  extrema = {}
+  try:
+    with tracing.span('find_extrema', booked=len(booked)):
+      for rootname, (low, high) in booked.iteritems():
+        # without any values, Min and Max are the limits of their type the wrong way around
+        if low.GetValue() <= high.GetValue():
+          extrema[rootname] = (float(low.GetValue()), float(high.GetValue()))
+  except Exception as e:
+    dumpSG_logger.warning("Could not find the range of the values of the branches.")
+    dumpSG_logger.debug(e)
+    return {}
+  return extrema
+
+class PyROOTBackend(backends.ReaderBackend):
+  '''
+  read through a TChain of the input files with PyROOT
+    - the report is filled with RDataFrame, see fill_histograms(), and TTree::Draw for what is left
+  '''
+  name = 'root'
+
+  def __init__(self, tree_name, input_filenames):
+    self.tree_name, self.input_filenames = tree_name, input_filenames
+    self.chain = make_chain(tree_name, input_filenames)
+    self._entries = None
+    self._cache = {'cache_size': 0, 'branches': 0}
+    self._efficiency = (None, None)
+    self._readStart = (0, 0)
+
+  def leaves(self, selector=None):
+    # a chain does not open any of its files until it has to, the first one is enough to list the leaves
+    if not self.chain.GetTree() and self.chain.LoadTree(0) < 0:
+      raise ValueError('Could not read the tree `{0}` from the first input file.'.format(self.chain.GetName()))
+    return list_leaves(self.chain, selector=selector)
+
+  def entries(self):
+    # this opens every file of the chain
+    if self._entries is None:
+      self._entries = self.chain.GetEntries()
+    return self._entries
+
+  def clusters(self):
+    clusters = []
+    # the offsets of the trees are only known once the chain has counted its entries
+    self.entries()
+    offsets = self.chain.GetTreeOffset()
+    for i in range(self.chain.GetNtrees()):
+      self.chain.LoadTree(offsets[i])
+      tree = self.chain.GetTree()
+      iterator = tree.GetClusterIterator(0)
+      start = iterator.Next()
+      while start < tree.GetEntries():
+        clusters.append((offsets[i] + start, offsets[i] + iterator.GetNextEntry()))
+        start = iterator.Next()
+    return clusters
+
+  def arrays(self, rootnames, chunk_size=100000, ranges=None):
+    # entry by entry, this is slow and only here to complete the interface, the report does not use it
+    for start, stop in ranges or [(0, self.entries())]:
+      for chunkStart in range(start, stop, chunk_size):
+        chunk = dict((rootname, []) for rootname in rootnames)
+        for i in range(chunkStart, min(chunkStart+chunk_size, stop)):
+          self.chain.GetEntry(i)
+          for rootname in rootnames:
+            chunk[rootname].extend(sghist.flatten([getattr(self.chain, rootname)]))
+        yield chunk
+
+  def file_ranges(self):
+    # the offsets of the trees are only known once the chain has counted its entries
+    entries = self.entries()
+    offsets = self.chain.GetTreeOffset()
+    files = self.chain.GetListOfFiles()
+    n = self.chain.GetNtrees()
+    return [(files.At(i).GetTitle(), offsets[i], offsets[i+1] if i+1 < n else entries) for i in range(n)]
+
+  def fill_histograms(self, items, nbins=100, ranges=None, binning=None):
+    return fill_histograms(self.chain, items, nbins=nbins, ranges=ranges, binning=binning)
+
+  def extrema(self, items, ranges=None):
+    return find_extrema(self.chain, items, ranges=ranges)
+
+  def profile_branch(self, rootname, max_baskets=0):
+    # like the sizes, this only looks at the tree currently loaded
+    if not self.chain.GetTree():
+      self.chain.LoadTree(0)
+    branch = self.chain.GetTree().GetBranch(rootname)
+    if not branch:
+      return None
+    baskets = backends.spread(branch.GetWriteBasket(), max_baskets)
+    branch.DropBaskets('all')
+    # this becomes gPerfStats, which every basket read and decompression reports to
+    perfStats = ROOT.TTreePerfStats('dumpSG_io', self.chain.GetTree())
+    bytesRead, bytesUnzipped = 0, 0
+    start = time.time()
+    for i in baskets:
+      basket = branch.GetBasket(i)
+      if basket:
+        bytesRead += basket.GetNbytes() - basket.GetKeylen()
+        bytesUnzipped += basket.GetObjlen()
+      # do not keep every basket in memory
+      branch.DropBaskets('all')
+    wall = time.time() - start
+    profile = {'wall': wall, 'decompress': perfStats.GetUnzipTime(), 'bytes_read': bytesRead, 'bytes_unzipped': bytesUnzipped, 'baskets': len(baskets)}
+    # the destructor hands gPerfStats back
+    del perfStats
+    return profile
+
+  def set_cache(self, rootnames, cache_size):
+    # the reads of every TFile are counted together, so count from here
+    self._readStart = (ROOT.TFile.GetFileReadCalls(), ROOT.TFile.GetFileBytesRead())
+    self._cache = {'cache_size': 0, 'branches': 0}
+    if cache_size <= 0:
+      self.chain.SetCacheSize(0)
+      return
+    # the branches can only be registered once the cache is attached to a file
+    if not self.chain.GetTree() and self.chain.LoadTree(0) < 0:
+      return
+    self.chain.SetCacheSize(int(cache_size))
+    # register what we are going to read, rather than have the cache learn it from the first entries,
+    #   the chain hands the cache and its branches on to each file it opens
+    for rootname in rootnames:
+      self.chain.AddBranchToCache(rootname, True)
+    self.chain.StopCacheLearningPhase()
+    self._cache = {'cache_size': int(cache_size), 'branches': len(rootnames)}
+    dumpSG_logger.info("Reading through a TTreeCache of {0} with {1} branches".format(sizeof_fmt(cache_size), len(rootnames)))
+
+  def cache_efficiency(self):
+    currentFile = self.chain.GetCurrentFile()
+    cache = currentFile.GetCacheRead(self.chain.GetTree()) if currentFile else None
+    if cache and hasattr(cache, 'GetEfficiency'):
+      return (cache.GetEfficiency(), cache.GetEfficiencyRel())
+    return self._efficiency
+
+  def read_stats(self):
+    stats = dict(self._cache)
+    stats['read_calls'] = ROOT.TFile.GetFileReadCalls() - self._readStart[0]
+    stats['bytes_read'] = ROOT.TFile.GetFileBytesRead() - self._readStart[1]
+    stats['efficiency'], stats['efficiency_rel'] = self.cache_efficiency()
+    return stats
+
+  def recycle(self):
+    # the files, their baskets and the TTreeCache go with the chain, only keep what read_stats() needs,
+    #   the reads are counted by TFile for every file, so those still add up
+    self._efficiency = self.cache_efficiency()
+    self.chain.Reset()
+    del self.chain
+    self.chain = make_chain(self.tree_name, self.input_filenames)
+
+  def draw_histogram(self, item, ranges=None):
+    return draw_histogram(self.chain, item, ranges=ranges)
+
+  def has_missing_values(self, item):
+    # this is when the values are missing, but Leaf.GetValue(0) returns 0.0
+    #     not sure why, ask someone what the hell is going on
+    return self.chain.GetBranch(item['rootname']).GetListOfLeaves()[0].GetValue(0) == 0
+
+# the backends that can be picked with --backend
+reader_backends = {'root': PyROOTBackend, 'uproot': backends.UprootBackend}
+
+def open_backend(backend, tree_name, input_filenames):
+  '''
+  open the input files with the named reader backend, see reader_backends
+  '''
+  try:
+    return reader_backends[backend](tree_name, input_filenames)
+  except ImportError as e:
+    raise ImportError('The {0} backend is not available: {1}'.format(backend, e))
+
+_root_available = None
+def root_available():
+  '''
+  whether ROOT can be loaded to draw the report, only checked once
+  '''
+  global _root_available
+  if _root_available is None:
+    try:
+      load_root()
+      _root_available = True
+    except ImportError:
+      dumpSG_logger.warning("ROOT is not available, so nothing will be drawn with it: the report will only have the statistics of each branch and the html or json plots, and the size report no pie charts.")
+      _root_available = False
+  return _root_available
+
+def plot_page(item, container, hist, sample=None, logTolerance=5.e2):
+  '''
+  everything needed to draw the histogram of an item, without the item itself, see sgrender.py
+    - flag is what looks wrong with it, the background is colored with --noEntries, --noRMS or --noMean
+    - the y axis is in log scale if the maximum/minimum is greater than logTolerance
+  '''
+  entries, mean, rms, counts_min, counts_max = sghist.hist_stats(hist)
+  if entries == 0:
+    flag = 'no_entries'
+  elif mean != 0 and rms == 0:
+    flag = 'no_rms'
+  elif mean == 0:
+    flag = 'no_mean'
+  else:
+    flag = None
+  return {'container': container,
+          'name': item['name'],
+          'rootname': item['rootname'],
+          'type': item['type'],
+          'title': item['name'] if not sample else '{0} [sampled: {1} of {2} events]'.format(item['name'], sample['events'], sample['total']),
+          'hist': hist,
+          'entries': entries,
+          'mean': mean,
+          'rms': rms,
+          # note that the absolute minimum is X > 0 [so 1 is the minimum value we obtain]
+          #   this fixes the divide-by-zero error we would get
+          'logy': bool(counts_max/counts_min > logTolerance),
+          'flag': flag}
+
+#@echo(write=dumpSG_logger.debug)
+def save_plot(t, item, container, hist=None, sample=None):
+  '''
+  work out the statistics of the item from its histogram and store them on the item
+    - hist is the output of fill_histograms() for this item, if it is not given we draw it with the backend t
+    - sample is the output of choose_sample() if only some of the events are used, the plot is
+      marked as sampled and the uncertainties of the mean and rms are stored as well
+    - returns the plot_page() to render, None if nothing could be drawn, see PlotRenderer
+  '''
+
+  dumpSG_logger.info("Trying to draw {0} of type {1}".format(item['name'], item['type']))
+  reason = undrawable_reason(item)
+  if reason:
+    dumpSG_logger.warning(reason)
+  tryToDraw = reason is None
+
+  if not tryToDraw:
+    hist = None
+  elif hist is None:
+    hist = t.draw_histogram(item, ranges=sample['ranges'] if sample else None)
 
   # if it didn't draw a histogram, there was an error drawing it
-  if htemp == None:
+  if hist is None:
     entries, mean, rms =  0, 0.0, 0.0
     drawable = False
     counts_min, counts_max = 0.0, 0.0
   else:
-    # we didn't have an error drawing it, let's apply makeup
-    entries, mean, rms =  htemp.GetEntries(), htemp.GetMean(), htemp.GetRMS()
-    # note that the absolute minimum is X > 0 [so 1 is the minimum value we obtain]
-    #   this fixes the divide-by-zero error we would get
-    counts_min, counts_max = htemp.GetMinimum(0), htemp.GetMaximum()
+    # the statistics come from the histogram itself, so they are the same whether or not ROOT draws it
+    entries, mean, rms, counts_min, counts_max = sghist.hist_stats(hist)
     drawable = True
 
-    # set up the labeling correctly
-    htemp.SetTitle(item['name'])
-    htemp.SetXTitle(item['name'])
-
-    # set log scale if htemp is drawable and the maximum/minimum is greater than tolerance
-    if bool(counts_max/counts_min > logTolerance):
-      dumpSG_logger.info("\tTolerance exceeded for {0}. Switching to log scale.".format(item['name']))
-    c.SetLogy(bool(counts_max/counts_min > logTolerance))
-
-    #color the fill of the canvas based on various issues
-    if entries == 0:
-      c.SetFillColor(getattr(ROOT, args.no_entries))
-    elif mean != 0 and rms == 0:
-      c.SetFillColor(getattr(ROOT, args.no_rms))
-    elif mean == 0:
-      c.SetFillColor(getattr(ROOT, args.no_mean))
-    else:
-      c.SetFillColor(0)
-
-    # no issues with drawing it
-    c.Update()  # why need this?
-    c.Modified()  # or this???
-    # https://sft.its.cern.ch/jira/browse/ROOT-7087
-    #   cannot have Vertex in name
-    c.Print(pathToImage, 'Title:{0}'.format(item['name'].replace('tex','tek')))
-  if tryToDraw:  # we tried to draw it
-    del c
-
   item['entries'] = entries
   item['mean'] = mean
   item['rms'] = rms
@@ -314,12 +902,18 @@ def save_plot(pathToImage, item, container, width=700, height=500, formats=['png
   item['counts'] = {}
   item['counts']['min'] = counts_min
   item['counts']['max'] = counts_max
+  if sample:
+    item['mean_error'], item['rms_error'] = sghist.stat_errors(hist) if drawable else (0.0, 0.0)
 
   if drawable:
+    page = plot_page(item, container, hist, sample=sample)
+    if page['logy']:
+      dumpSG_logger.info("\tTolerance exceeded for {0}. Switching to log scale.".format(item['name']))
     # let the user know that this has RMS=0 and may be of interest
     if rms == 0:
       dumpSG_logger.warning("{0}/{1} might be problematic (RMS=0)".format(container, item['name']))
       dumpSG_logger.info("\t\tpath:\t\t{0}\n\t\tmean:\t\t{1}\n\t\trms:\t\t{2}\n\t\tentries:\t{3}".format(item['rootname'], item['mean'], item['rms'], item['entries']))
+    return page
   else:
     errString = "{0}/{1} {{0}}".format(container, item['name'])
     detailErrString = "\t\tpath:\t\t{0}".format(item['rootname'])
@@ -327,106 +921,655 @@ def save_plot(pathToImage, item, container, width=700, height=500, formats=['png
       # this is an example of what we can't draw normally
       dumpSG_logger.info(errString.format("is an ElementLink type"))
       dumpSG_logger.info(detailErrString)
-    elif t.GetBranch(item['rootname']).GetListOfLeaves()[0].GetValue(0) == 0:
-      # this is when the values are missing, but Leaf.GetValue(0) returns 0.0
-      #     not sure why, ask someone what the hell is going on
+    elif t.has_missing_values(item):
       dumpSG_logger.warning(errString.format("has missing values"))
       dumpSG_logger.info(detailErrString)
     else:
       dumpSG_logger.warning(errString.format("couldn't be drawn"))
       dumpSG_logger.info(detailErrString)
-  return drawable
+  return None
+
+# the fields save_plot() adds to an item, these are what the report workers send back
+report_fields = ['entries', 'mean', 'rms', 'drawable', 'counts', 'mean_error', 'rms_error']
 
 #@echo(write=dumpSG_logger.debug)
-def make_report(t, xAOD_Objects, directory="report", merge_report=False):
-  # first start by making the report directory
-  if not os.path.exists(directory):
-    os.makedirs(directory)
+def report_container(t, container, propsAndAttrs, hists, sample=None):
+  '''
+  work out the statistics of the given properties and attributes of a container, returns the plots to render
+    - sample is the output of choose_sample(), if only some of the events are used
+    - the histograms drawn on their own (see save_plot()) are added to hists
+  '''
+  pages = []
+  for item in propsAndAttrs:
+    with tracing.span('draw', category='draw', rootname=item['rootname']):
+      page = save_plot(t, item, container, hist=hists.get(item['rootname']), sample=sample)
+    if page is not None:
+      hists[item['rootname']] = page['hist']
+      pages.append(page)
+  return pages
+
+# the formats the plots of a report can be written in, the first two are drawn with ROOT
+plot_formats = ['pdf', 'png', 'html', 'json']
+
+def report_paths(directory, container, pages, formats=['pdf'], merge_report=False):
+  '''
+  the files ROOT draws the plots of a container into, as a list of (path, pages)
+    - pdf: directory/container.pdf with a page per plot if merging, directory/container/name.pdf otherwise
+    - png: a thumbnail per plot, directory/container/name.png
+  '''
+  paths = []
+  if 'pdf' in formats:
+    if merge_report:
+      paths.append((os.path.join(directory, '{0}.pdf'.format(container)), pages))
+    else:
+      paths.extend((os.path.join(directory, container, '{0}.pdf'.format(page['name'])), [page]) for page in pages)
+  if 'png' in formats:
+    paths.extend((os.path.join(directory, container, '{0}.png'.format(page['name'])), [page]) for page in pages)
+  return paths
+
+# the size of the canvas of each format, the png files are only thumbnails
+canvas_sizes = {'.pdf': (700, 500), '.png': (350, 250)}
+
+def render_plots(task):
+  '''
+  draw the pages of a single file with ROOT, a PDF with a page per plot or a single PNG
+    - task is (path, pages, colors), colors maps the flag of a page to a ROOT color, see plot_page()
+    - a single canvas is used for all of the pages and closed at the end, and the histograms are
+      detached from gDirectory and deleted as soon as their page is printed, so nothing piles up
+    - returns the spans of the drawing (see tracing.py) and the RSS of the process afterwards
+  '''
+  pathToImage, pages, colors = task
+  load_root()
+  try:
+    os.makedirs(os.path.dirname(pathToImage))
+  except OSError:
+    # another worker might have made it already
+    if not os.path.isdir(os.path.dirname(pathToImage)): raise
+  width, height = canvas_sizes[os.path.splitext(pathToImage)[1]]
+  merged = len(pages) > 1
+  c = ROOT.TCanvas('dumpSG_canvas', 'dumpSG_canvas', 200, 10, width, height)
+  if merged:
+    # https://root.cern.ch/root/HowtoPS.html
+    # print the blank canvas for initializing the pdf
+    c.Print('{0}['.format(pathToImage))
+
+  for page in pages:
+    htemp = dict_to_hist(page['rootname'], page['hist'])
+    c.cd()
+    htemp.Draw()
+
+    # set up the labeling correctly
+    htemp.SetTitle(page['title'])
+    htemp.SetXTitle(page['name'])
+    c.SetLogy(page['logy'])
+
+    #color the fill of the canvas based on various issues
+    c.SetFillColor(getattr(ROOT, colors[page['flag']]) if page['flag'] else 0)
+
+    # no issues with drawing it
+    c.Update()  # why need this?
+    c.Modified()  # or this???
+    # https://sft.its.cern.ch/jira/browse/ROOT-7087
+    #   cannot have Vertex in name
+    with tracing.span('print', category='print', rootname=page['rootname']):
+      c.Print(pathToImage, 'Title:{0}'.format(page['name'].replace('tex','tek')))
+    # the canvas only refers to the histogram, python owns it and deletes it here
+    c.Clear()
+    del htemp
+
+  if merged:
+    # finalize the pdf, note -- due to a bug, you need to close with the last title
+    #     even though it was written inside the loop otherwise, it won't save right
+    c.Print('{0}]'.format(pathToImage), 'Title:{0}'.format(page['name'].replace('tex','tek')))
+  # take it off the list of canvases before python deletes it
+  c.Close()
+  del c
+
+  spans, tracing.tracer.spans = tracing.tracer.spans, []
+  return (spans, tracing.current_rss())
+
+def _init_render_worker():
+  # only send back the spans of the drawing
+  tracing.tracer.reset()
+
+class PlotRenderer(object):
+  '''
+  writes the plots of a report, away from the reading
+    - the containers are handed over with add() as soon as their statistics are known, the report
+      goes on reading while a pool of `jobs` worker processes draws them with ROOT (0 draws them
+      right away instead, in between the reading)
+    - pdf and png are only drawn if ROOT is available, see report_paths()
+    - html and json are bundles of all of the plots, which do not need ROOT (see sgrender.py), they
+      are written once the renderer is closed
+    - with max_rss (in bytes), the pool is replaced by fresh workers once one of them goes above it
+  '''
+
+  def __init__(self, directory, formats=['pdf'], merge_report=False, jobs=1, sample=None, max_rss=0):
+    self.directory = directory
+    self.merge_report = merge_report
+    self.sample = {k: sample[k] for k in ['mode', 'events', 'total']} if sample else None
+    self.formats = [f for f in formats if f in ['html', 'json'] or root_available()]
+    self.rootFormats = [f for f in self.formats if f in ['pdf', 'png']]
+    self.colors = {'no_entries': args.no_entries, 'no_rms': args.no_rms, 'no_mean': args.no_mean} if self.rootFormats else {}
+    self.plots = []
+    self.pending = []
+    self.jobs = jobs if self.rootFormats else 0
+    self.guard = sgmemory.MemoryGuard(max_rss, name='plot renderer')
+    self.pool = None
+    self.start()
+
+  def start(self):
+    if self.jobs > 0:
+      import multiprocessing
+      self.pool = multiprocessing.Pool(processes=self.jobs, initializer=_init_render_worker)
+
+  def add(self, container, pages, draw=True):
+    '''
+    the plots of a container, or part of it, draw is False for plots that a previous report already drew
+    '''
+    if 'html' in self.formats or 'json' in self.formats:
+      self.plots.extend(pages)
+    if not draw or not pages:
+      return
+    for pathToImage, filePages in report_paths(self.directory, container, pages, formats=self.rootFormats, merge_report=self.merge_report):
+      task = (pathToImage, filePages, self.colors)
+      if self.pool is None:
+        # the memory of the report itself is looked after by make_report()
+        spans, rss = render_plots(task)
+        tracing.tracer.extend(spans)
+      else:
+        self.pending.append((pathToImage, self.pool.apply_async(render_plots, (task,))))
+    self.collect()
+
+  def collect(self, wait=False):
+    '''
+    pick up the plots that were drawn, and recycle the pool if a worker went above max_rss
+    '''
+    recycle = None
+    while self.pending and (wait or self.pending[0][1].ready()):
+      pathToImage, result = self.pending.pop(0)
+      try:
+        spans, rss = result.get()
+        tracing.tracer.extend(spans)
+        if self.guard.sample(pathToImage, rss=rss):
+          recycle = pathToImage
+      except Exception as e:
+        dumpSG_logger.warning("Could not draw {0}".format(pathToImage))
+        dumpSG_logger.debug(e)
+    if recycle and not wait:
+      self.stop()
+      # the floor is the RSS of the fresh workers, once they drew their first plot
+      self.guard.restarted(recycle)
+      self.start()
+
+  def stop(self):
+    if self.pool is not None:
+      self.pool.close()
+      self.collect(wait=True)
+      self.pool.join()
+      self.pool = None
+
+  def close(self):
+    '''
+    wait for every plot to be drawn, and write the bundles
+    '''
+    if self.pool is not None:
+      self.stop()
+      dumpSG_logger.info(self.guard.summary())
+    if 'json' in self.formats or 'html' in self.formats:
+      import sgrender
+    if 'json' in self.formats:
+      with open(os.path.join(self.directory, 'plots.json'), 'w+') as f:
+        sgrender.write_json_bundle(self.plots, f, sample=self.sample)
+    if 'html' in self.formats:
+      with open(os.path.join(self.directory, 'report.html'), 'wb') as f:
+        sgrender.write_html_bundle(self.plots, f, sample=self.sample)
+
+#@echo(write=dumpSG_logger.debug)
+def balance_report_work(xAOD_Objects, jobs, merge_report=False):
+  '''
+  split the report into (at most) `jobs` groups that have roughly the same number of bytes to read
+    - the unit of work is a container, weighted by the totbytes of its properties and attributes
+    - if we are not merging, containers larger than a fair share are split into groups of branches
+      so that one huge container (like the jets) does not hold up everything else
+    - units are placed largest first onto the least loaded group (longest processing time first)
+    - each group is a list of (container, items, whole) where whole is False for a split container
+  '''
+  weight = lambda items: sum(max(item.get('totbytes', 0), 1) for item in items)
+
+  units = []
+  total = sum(weight(v.get('prop', [])+v.get('attr', [])) for v in xAOD_Objects.itervalues())
+  fairShare = float(total)/jobs
   for container, containerVals in xAOD_Objects.iteritems():
     propsAndAttrs = containerVals.get('prop', [])+containerVals.get('attr', [])
+    if not propsAndAttrs: continue
+    if merge_report or weight(propsAndAttrs) <= fairShare:
+      units.append((weight(propsAndAttrs), container, propsAndAttrs, True))
+      continue
+    # split the container into chunks no bigger than the fair share
+    chunk = []
+    for item in sorted(propsAndAttrs, key=lambda item: -item.get('totbytes', 0)):
+      if chunk and weight(chunk+[item]) > fairShare:
+        units.append((weight(chunk), container, chunk, False))
+        chunk = []
+      chunk.append(item)
+    units.append((weight(chunk), container, chunk, False))
+
+  groups = [[] for i in range(min(jobs, len(units)))]
+  loads = [0]*len(groups)
+  for size, container, items, whole in sorted(units, key=lambda unit: -unit[0]):
+    i = loads.index(min(loads))
+    groups[i].append((container, items, whole))
+    loads[i] += size
+
+  for i, load in enumerate(loads):
+    dumpSG_logger.info("Report worker {0} has {1} work units with {2}".format(i, len(groups[i]), sizeof_fmt(load)))
+  return groups
+
+def _init_report_worker():
+  # each worker opens the input files itself, and only sends back its own spans
+  global t
+  tracing.tracer.reset()
+  t = open_backend(args.backend, args.tree_name, args.input_filename)
+
+def _report_worker(payload):
+  group, sample, stored, cache_size, max_rss = payload
+  guard = sgmemory.MemoryGuard(max_rss, name='report worker {0}'.format(os.getpid()))
+  # only read what a previous report did not already store
+  missing = [item for container, items, whole in group for item in items if undrawable_reason(item) is None and item['rootname'] not in stored]
+  t.set_cache([item['rootname'] for item in missing], cache_size)
+  hists = dict(stored)
+  hists.update(t.fill_histograms(missing, ranges=sample['ranges'] if sample else None))
+  keep_memory_in_check(t, guard, 'fill_histograms')
+  results = []
+  for container, items, whole in group:
+    with tracing.span('report_container', category='memory', container=container):
+      report_container(t, container, items, hists, sample=sample)
+    results.append((container, [(item['rootname'], {k: item[k] for k in report_fields if k in item}, hists.get(item['rootname'])) for item in items]))
+    keep_memory_in_check(t, guard, container)
+  dumpSG_logger.info(guard.summary())
+  spans, tracing.tracer.spans = tracing.tracer.spans, []
+  return (results, spans, t.read_stats())
+
+def keep_memory_in_check(t, guard, label):
+  '''
+  sample the RSS once label (a container, or the filling) is done, and let the backend go if it is above the ceiling
+    - everything that was done is already in the manifest and info.json, and the histograms
+      that are still needed are plain dictionaries, so only the backend holds on to ROOT memory
+  '''
+  if guard.sample(label):
+    t.recycle()
+    guard.recycled_after(label)
 
-    numDrawn = 0
-    # only make stuff if stuff exists
-    if propsAndAttrs:
-      # check if we want to merge
-      if merge_report:
-        # we do, so pathToImage is directory/container.pdf
-        pathToImage = os.path.join(directory, '{0}.pdf'.format(container))
-        # https://root.cern.ch/root/HowtoPS.html
-        # create a blank canvas for initializing the pdf
-        blankCanvas = ROOT.TCanvas()
-        blankCanvas.Print('{0}['.format(pathToImage))
-      else:
-        # we don't so pathToImage is directory/container/item['name'].pdf
-        sub_directory = os.path.join(directory, container)
-        if not os.path.exists(sub_directory):
-          os.makedirs(sub_directory)
-
-      for item in propsAndAttrs:
-        if not merge_report:
-          # if we aren't merging, the path to image is based on item['name']
-          pathToImage = os.path.join(sub_directory, '{0}.pdf'.format(item['name']))
-
-        numDrawn += save_plot(pathToImage, item, container)
-
-      if merge_report:
-        # finalize the pdf, note -- due to a bug, you need to close with the last title
-        #     even though it was written inside save_plot() otherwise, it won't save right
-        blankCanvas.Print('{0}]'.format(pathToImage), 'Title:{0}'.format(item['name'].replace('tex','tek')))
-        del blankCanvas
-
-      if numDrawn == 0:
-        dumpSG_logger.info("{0} has no drawable children elements.".format(container))
-        # we were unable to draw anything
-        if merge_report:
-          dumpSG_logger.info("\tRemoving the file: {0}".format(pathToImage))
-          # so delete the merged PDF file
-          os.remove(pathToImage)
-        else:
-          dumpSG_logger.info("\tRemoving the directory: {0}".format(sub_directory))
-          # so delete the directory
-          os.rmdir(sub_directory)
-
-    # add the number of plots drawn
-    containerVals['drawn'] = numDrawn
-
-  with open(os.path.join(directory, "info.json"), 'w+') as f:
-    f.write(json.dumps(xAOD_Objects, sort_keys=True, indent=4))
+#@echo(write=dumpSG_logger.debug)
+def make_report_parallel(xAOD_Objects, renderer, merge_report=False, jobs=1, sample=None, stored={}, manifest=None, cache_size=0, max_rss=0):
+  '''
+  spread the report over a pool of worker processes, each opening its own chain and filling its own histograms
+    - the per-item statistics and histograms are sent back and merged into xAOD_Objects, and the
+      plots are handed over to the renderer (see PlotRenderer) as soon as each group is done
+    - stored are the histograms a previous report already filled, see resume_report()
+    - each group is recorded in the manifest as soon as it is done
+    - each worker reads its group through a cache of cache_size bytes, see ReaderBackend.set_cache()
+    - each worker keeps its own RSS under max_rss, see keep_memory_in_check()
+    - returns the reads of all of the workers added up, see backends.combine_read_stats()
+  '''
+  groups = balance_report_work(xAOD_Objects, jobs, merge_report=merge_report)
+  for containerVals in xAOD_Objects.itervalues():
+    containerVals['drawn'] = 0
+  if not groups:
+    return None
+
+  payloads = []
+  for group in groups:
+    groupStored = {item['rootname']: stored[item['rootname']] for container, items, whole in group for item in items if item['rootname'] in stored}
+    payloads.append((group, sample, groupStored, cache_size, max_rss))
+
+  import multiprocessing
+  readStats = []
+  pool = multiprocessing.Pool(processes=len(groups), initializer=_init_report_worker)
+  try:
+    for groupResults, spans, groupReadStats in pool.imap_unordered(_report_worker, payloads):
+      tracing.tracer.extend(spans)
+      readStats.append(groupReadStats)
+      for container, stats in groupResults:
+        containerVals = xAOD_Objects[container]
+        propsAndAttrs = {item['rootname']: item for item in containerVals.get('prop', [])+containerVals.get('attr', [])}
+        pages = []
+        for rootname, fields, hist in stats:
+          propsAndAttrs[rootname].update(fields)
+          if fields.get('drawable'):
+            pages.append(plot_page(propsAndAttrs[rootname], container, hist, sample=sample))
+        containerVals['drawn'] += len(pages)
+        renderer.add(container, pages)
+        if manifest is not None:
+          manifest.record([(propsAndAttrs[rootname], hist, fields) for rootname, fields, hist in stats])
+  finally:
+    pool.close()
+    pool.join()
+
+  return backends.combine_read_stats(readStats)
+
+def _init_events_worker(items, cache_size, max_rss):
+  # the items are only sent once to each worker, which opens the input files one at a time
+  global t, events_items, events_cache_size, events_guard
+  tracing.tracer.reset()
+  t = None
+  events_items, events_cache_size = items, cache_size
+  events_guard = sgmemory.MemoryGuard(max_rss, name='report worker {0}'.format(os.getpid()))
+
+def _events_worker(task):
+  # the extrema (binning is None) or the partial histograms of the events of one unit, see ReaderBackend.split_events()
+  global t
+  (fname, start, stop, fileRanges), binning = task
+  if t is None or t.input_filenames != [fname]:
+    t = open_backend(args.backend, args.tree_name, [fname])
+  t.set_cache([item['rootname'] for item in events_items], events_cache_size)
+  if binning is None:
+    with tracing.span('find_extrema', fname=fname, start=start, stop=stop):
+      result = t.extrema(events_items, ranges=fileRanges)
+  else:
+    with tracing.span('fill_histograms', fname=fname, start=start, stop=stop):
+      result = t.fill_histograms(events_items, ranges=fileRanges, binning=binning)
+  readStats = t.read_stats()
+  keep_memory_in_check(t, events_guard, '{0} [{1}, {2})'.format(fname, start, stop))
+  spans, tracing.tracer.spans = tracing.tracer.spans, []
+  return (result, spans, readStats)
 
-  return True
+#@echo(write=dumpSG_logger.debug)
+def fill_histograms_by_events(t, items, jobs, sample=None, cache_size=0, max_rss=0, nbins=100):
+  '''
+  fill the histograms of the items like t.fill_histograms(), with the events split over a pool of worker processes
+    - each unit of work is an input file, or a range of its clusters if there are fewer files than
+      jobs (see ReaderBackend.split_events()), so this scales with the number of input files
+    - the units are read twice: first for the smallest and largest value of each branch, then to
+      fill partial histograms that all span that range (see sghist.common_range()). These have the
+      same bins, so merging them (see sghist.merge()) gives the histogram of all of the events
+    - sample is the output of choose_sample(), if only some of the events are used
+    - each worker reads through a cache of cache_size bytes and keeps its RSS under max_rss
+    - returns (hists, readStats), (None, None) if the backend cannot open its files one at a time
+  '''
+  units = t.split_events(jobs, ranges=sample['ranges'] if sample else None)
+  if not units:
+    return (None, None)
+  dumpSG_logger.info("Filling {0} histograms from {1} ranges of events with {2} worker(s)".format(len(items), len(units), min(jobs, len(units))))
+
+  extrema = {}
+  hists = {}
+  unitReadStats = []
+  import multiprocessing
+  pool = multiprocessing.Pool(processes=min(jobs, len(units)), initializer=_init_events_worker, initargs=(items, cache_size, max_rss))
+  try:
+    for unitExtrema, spans, readStats in pool.imap_unordered(_events_worker, [(unit, None) for unit in units]):
+      tracing.tracer.extend(spans)
+      unitReadStats.append(readStats)
+      for rootname, (low, high) in unitExtrema.iteritems():
+        if rootname in extrema:
+          low, high = min(low, extrema[rootname][0]), max(high, extrema[rootname][1])
+        extrema[rootname] = (low, high)
+    # the branches without any values keep their auto-binned (empty) histograms
+    binning = {rootname: sghist.common_range(low, high, nbins) for rootname, (low, high) in extrema.iteritems()}
+    # in the order of the events, the partial histograms are added up the way a single pass fills them
+    for unitHists, spans, readStats in pool.imap(_events_worker, [(unit, binning) for unit in units]):
+      tracing.tracer.extend(spans)
+      unitReadStats.append(readStats)
+      for rootname, hist in unitHists.iteritems():
+        hists[rootname] = sghist.merge([hists.get(rootname), hist])
+  finally:
+    pool.close()
+    pool.join()
+  readStats = backends.combine_read_stats(unitReadStats)
+  if readStats is not None:
+    # every unit registers the same branches
+    readStats['branches'] = max(stats['branches'] for stats in unitReadStats if stats is not None)
+  return (hists, readStats)
 
 #@echo(write=dumpSG_logger.debug)
-def make_size_report_pie(t, xAOD_Objects, directory="report"):
-  total = {'totbytes': 0, 'filebytes': 0}
+def io_profile(t, xAOD_Objects, max_baskets=0):
+  '''
+  read every branch of the containers on its own, and store how expensive that was
+    - item['io'] has the wall and decompression time, the bytes read, MB/s, the number of baskets
+      and the compression ratio, the backend may not know all of them (they are None then)
+    - containerVals['io'] adds up the times and bytes of the branches of the container
+    - every branch of the containers is read, even the ones that are not listed (see --prop/--attr)
+    - returns the items, most expensive to read first
+  '''
+  profiled = []
+  for container in sorted(xAOD_Objects):
+    containerVals = xAOD_Objects[container]
+    # views hide the items unless they are listed, but we want to read all of them
+    underlying = getattr(containerVals, 'container', containerVals)
+    total = {'wall': 0., 'decompress': 0., 'bytes_read': 0}
+    for item in underlying.get('prop', [])+underlying.get('attr', []):
+      with tracing.span('read', category='io', rootname=item['rootname']):
+        profile = t.profile_branch(item['rootname'], max_baskets=max_baskets)
+      if profile is None:
+        dumpSG_logger.info("Could not read {0} on its own".format(item['rootname']))
+        continue
+      # fall back on the sizes of the whole branch if the backend does not know what it read
+      bytesRead = profile['bytes_read'] if profile['bytes_read'] is not None else item['filebytes']
+      bytesUnzipped = profile['bytes_unzipped'] if profile['bytes_unzipped'] is not None else item['totbytes']
+      profile['mb_per_s'] = bytesRead/1024.**2/profile['wall'] if profile['wall'] > 0 else None
+      profile['compression'] = float(bytesUnzipped)/bytesRead if bytesRead else None
+      item['io'] = profile
+      profiled.append((container, item))
+      total['wall'] += profile['wall']
+      total['decompress'] += profile['decompress'] or 0.
+      total['bytes_read'] += bytesRead
+    containerVals['io'] = total
+  return sorted(profiled, key=lambda (container, item): -item['io']['wall'])
+
+def io_summary(profiled, n=20):
+  '''
+  a table of the n most expensive branches to read, see io_profile()
+  '''
+  lines = ['The {0} most expensive branches to read'.format(min(n, len(profiled))),
+           '  {0:<62}{1:>12}{2:>12}{3:>10}{4:>9}{5:>8}'.format('branch', 'wall', 'decompress', 'MB/s', 'baskets', 'ratio')]
+  fmt = lambda value, spec, unit='': format(value, spec) + unit if value is not None else '-'
+  for container, item in profiled[:n]:
+    io = item['io']
+    lines.append('  {0:<62}{1:>12}{2:>12}{3:>10}{4:>9}{5:>8}'.format(item['rootname'], fmt(io['wall'], '.3f', 's'), fmt(io['decompress'], '.3f', 's'),
+                                                                       fmt(io['mb_per_s'], '.1f'), fmt(io['baskets'], 'd'), fmt(io['compression'], '.2f')))
+  return '\n'.join(lines)
+
+def read_summary(stats):
+  '''
+  a line with the reads of a report, see ReaderBackend.read_stats()
+  '''
+  perCall = float(stats['bytes_read'])/stats['read_calls'] if stats['read_calls'] else 0
+  line = 'Read {0} in {1} read calls ({2} per call)'.format(signed_sizeof_fmt(stats['bytes_read'], signed=False), stats['read_calls'], signed_sizeof_fmt(perCall, signed=False))
+  if not stats['cache_size']:
+    return line + ' without a TTreeCache'
+  line += ' through a TTreeCache of {0} with {1} branches'.format(signed_sizeof_fmt(stats['cache_size'], signed=False), stats['branches'])
+  if stats['efficiency'] is not None:
+    line += ': {0:.1%} of the prefetched baskets were used, {1:.1%} of the baskets came from the cache'.format(stats['efficiency'], stats['efficiency_rel'])
+  return line
+
+#@echo(write=dumpSG_logger.debug)
+def choose_sample(t, sample, mode='first'):
+  '''
+  the events to fill the report from, None if that would be all of them
+    - sample is ('events', N) or ('fraction', f), see parse_sample()
+    - returns a dictionary with the mode, the number of events sampled, the total and the (start, stop) ranges
+  '''
+  total = t.entries()
+  kind, value = sample
+  budget = min(total, int(value) if kind == 'events' else int(math.ceil(value*total)))
+  if budget >= total:
+    dumpSG_logger.info("The sample covers all {0} events, so every event is used".format(total))
+    return None
+  ranges = backends.sample_ranges(t.clusters(), budget, mode=mode)
+  events = sum(stop - start for start, stop in ranges)
+  dumpSG_logger.info("Sampling {0} of {1} events ({2} entry ranges, {3})".format(events, total, len(ranges), mode))
+  return {'mode': mode, 'events': events, 'total': total, 'ranges': ranges}
+
+def parse_sample(value):
+  '''
+  --sample is either a number of events (1000) or a fraction of them (0.05 or 5%)
+  '''
+  try:
+    if value.endswith('%'):
+      kind, number = 'fraction', float(value[:-1])/100.
+    elif value.isdigit():
+      kind, number = 'events', int(value)
+    else:
+      kind, number = 'fraction', float(value)
+  except ValueError:
+    raise argparse.ArgumentTypeError('{0} is not a number of events or a fraction of them'.format(value))
+  if number <= 0 or (kind == 'fraction' and number > 1):
+    raise argparse.ArgumentTypeError('{0} is not a number of events or a fraction of them'.format(value))
+  return (kind, number)
+
+def report_outputs_exist(container, propsAndAttrs, directory="report", formats=['pdf'], merge_report=False):
+  '''
+  whether the plots of the drawable items of a container are where PlotRenderer puts them, see report_paths()
+    - the html and json bundles are written again every time, so they are never missing
+  '''
+  drawn = [item for item in propsAndAttrs if item['drawable']]
+  if not drawn or not root_available():
+    return True
+  return all(os.path.isfile(path) for path, pages in report_paths(directory, container, drawn, formats=formats, merge_report=merge_report))
+
+#@echo(write=dumpSG_logger.debug)
+def resume_report(xAOD_Objects, manifest, directory="report", formats=['pdf'], merge_report=False):
+  '''
+  find what a previous report in the same directory already did, see sgmanifest.py
+    - containers whose items all have unchanged inputs, were drawn the same way and still have their
+      plots are not redone, their statistics are restored from the manifest
+    - returns (done, hists): the set of containers that are done, and the stored histograms, which
+      can be drawn again without reading anything (the ones of the containers that are done only go
+      into the html and json bundles)
+  '''
+  done, hists = set(), {}
+  if manifest is None:
+    return (done, hists)
+
+  for container, containerVals in xAOD_Objects.iteritems():
+    propsAndAttrs = containerVals.get('prop', [])+containerVals.get('attr', [])
+    entries = [manifest.lookup(item) for item in propsAndAttrs]
+    if propsAndAttrs and all(entry is not None and entry['fields'] is not None and entry['render'] == manifest.render for entry in entries):
+      # only update the items once we know the plots are still there
+      fields = [entry['fields'] for entry in entries]
+      if report_outputs_exist(container, [dict(itemFields, name=item['name']) for item, itemFields in zip(propsAndAttrs, fields)], directory=directory, formats=formats, merge_report=merge_report):
+        for item, itemFields in zip(propsAndAttrs, fields):
+          item.update(itemFields)
+        containerVals['drawn'] = sum(1 for item in propsAndAttrs if item['drawable'])
+        done.add(container)
+    for item, entry in zip(propsAndAttrs, entries):
+      if entry is not None and entry['hist'] is not None:
+        hists[item['rootname']] = entry['hist']
+
+  if done or hists:
+    dumpSG_logger.info("Resuming the report: {0} containers are unchanged and {1} histograms do not need to be filled again".format(len(done), len(hists)))
+  return (done, hists)
 
+#@echo(write=dumpSG_logger.debug)
+def make_report(t, xAOD_Objects, directory="report", merge_report=False, jobs=1, sample=None, manifest=None, cache_size=0, formats=['pdf'], render_jobs=1, max_rss=0, split='branches'):
+  '''
+  draw every property and attribute, and write their statistics to info.json
+    - with jobs > 1, the report is split over worker processes by branches (see make_report_parallel())
+      or by events (see fill_histograms_by_events())
+    - sample is the output of choose_sample(), to only use some of the events
+    - the plots are written in the given formats by render_jobs worker processes, see PlotRenderer
+    - manifest is a sgmanifest.ReportManifest to resume from and record into, see resume_report()
+    - the branches to fill are read through a cache of cache_size bytes, see ReaderBackend.set_cache()
+    - the RSS is sampled after every container, and kept under max_rss bytes (if given) by
+      recycling the backend and the workers drawing the plots, see sgmemory.py
+    - returns the reads the report made, see ReaderBackend.read_stats()
+  '''
   # first start by making the report directory
   if not os.path.exists(directory):
     os.makedirs(directory)
-  sizeByType = defaultdict(lambda: {'totbytes': 0, 'filebytes': 0})
-  for ContainerName, Elements in sorted(xAOD_Objects.items(), key=lambda (k,v): (v['type'].lower(), k.lower())):
-    sizeByType[Elements['type']]['totbytes'] += Elements['totbytes']
-    sizeByType[Elements['type']]['filebytes'] += Elements['filebytes']
-    total['totbytes'] += Elements['totbytes']
-    total['filebytes'] += Elements['filebytes']
 
+  if manifest is not None:
+    # redraw everything if the plots would come out differently
+    manifest.render = [merge_report, root_available(), args.no_entries, args.no_rms, args.no_mean]
+  done, stored = resume_report(xAOD_Objects, manifest, directory=directory, formats=formats, merge_report=merge_report)
+  todo = {k: v for (k, v) in xAOD_Objects.iteritems() if k not in done}
+
+  renderer = PlotRenderer(directory, formats=formats, merge_report=merge_report, jobs=render_jobs, sample=sample, max_rss=max_rss)
+  # the plots of the containers that are done are already drawn, they only go into the bundles
+  for container in sorted(done):
+    containerVals = xAOD_Objects[container]
+    renderer.add(container, [plot_page(item, container, stored[item['rootname']], sample=sample)
+                             for item in containerVals.get('prop', [])+containerVals.get('attr', []) if item['drawable'] and item['rootname'] in stored], draw=False)
+
+  # info.json is written out container by container, as soon as each one is done
+  with open(os.path.join(directory, "info.json"), 'w+') as f, JSONStreamWriter(f) as writer:
+    # fill everything we need in one pass over the chain, rather than once per branch
+    missing = [item for containerVals in todo.itervalues() for item in containerVals.get('prop', [])+containerVals.get('attr', []) if undrawable_reason(item) is None and item['rootname'] not in stored]
+    filled, filledReadStats = None, None
+    if jobs > 1 and split == 'events':
+      filled, filledReadStats = fill_histograms_by_events(t, missing, jobs, sample=sample, cache_size=cache_size, max_rss=max_rss)
+      if filled is None:
+        dumpSG_logger.warning("The {0} backend cannot read the input files one at a time, so the report is split by branches instead.".format(t.name))
+    if jobs > 1 and filled is None:
+      readStats = make_report_parallel(todo, renderer, merge_report=merge_report, jobs=jobs, sample=sample, stored=stored, manifest=manifest, cache_size=cache_size, max_rss=max_rss)
+      for container in sorted(xAOD_Objects):
+        if sample: xAOD_Objects[container]['sample'] = {k: sample[k] for k in ['mode', 'events', 'total']}
+        writer.write(container, xAOD_Objects[container])
+    else:
+      if filled is None:
+        t.set_cache([item['rootname'] for item in missing], cache_size)
+        filled = t.fill_histograms(missing, ranges=sample['ranges'] if sample else None)
+      else:
+        # the workers filled everything they could, only count what is drawn here on its own
+        t.set_cache([], 0)
+      hists = dict(stored)
+      hists.update(filled)
+      # keep what was filled, so that a crash while drawing does not mean filling it again
+      if manifest is not None:
+        manifest.record([(item, hists.get(item['rootname']), None) for item in missing])
+      guard = sgmemory.MemoryGuard(max_rss)
+      keep_memory_in_check(t, guard, 'fill_histograms')
+
+      for container in sorted(xAOD_Objects):
+        containerVals = xAOD_Objects[container]
+        if container not in done:
+          propsAndAttrs = containerVals.get('prop', [])+containerVals.get('attr', [])
+          with tracing.span('report_container', category='memory', container=container):
+            pages = report_container(t, container, propsAndAttrs, hists, sample=sample)
+          # add the number of plots drawn
+          containerVals['drawn'] = len(pages)
+          renderer.add(container, pages)
+          if manifest is not None:
+            manifest.record([(item, hists.get(item['rootname']), {k: item[k] for k in report_fields if k in item}) for item in propsAndAttrs])
+          # the renderer and the manifest have what they need of the histograms of the container
+          for item in propsAndAttrs:
+            hists.pop(item['rootname'], None)
+          keep_memory_in_check(t, guard, container)
+        if sample: containerVals['sample'] = {k: sample[k] for k in ['mode', 'events', 'total']}
+        writer.write(container, containerVals)
+      readStats = t.read_stats() if filledReadStats is None else backends.combine_read_stats([filledReadStats, t.read_stats()])
+      dumpSG_logger.log(25 if max_rss else logging.INFO, guard.summary())
+
+  with tracing.span('render'):
+    renderer.close()
+  if manifest is not None:
+    manifest.close()
+  return readStats
+
+def make_size_pies(sizes, pathToImage):
+  '''
+  pie charts of the on-disk and in-memory sizes of each type, see sgsizes.breakdown()
+  '''
   width = 1200
   height = 1000
   blankCanvas = ROOT.TCanvas("test", "", width, height)
-  blankCanvas.Print('{0}['.format('sizes.pdf'))
+  blankCanvas.Print('{0}['.format(pathToImage))
 
   # manually set the list of "good" colors to use for the piechart
   validColors = [2, 4, 6, 8, 9, 11, 12, 15, 20, 28, 29, 30, 33, 36, 38, 41, 43, 46]
 
   for title, key in [('On-Disk Size', 'filebytes'), ('In-Mem Size', 'totbytes')]:
     c = ROOT.TCanvas("MyCanvas", "", width, height)
-    pie = ROOT.TPie("%s_pie" % title, "%s: %s" % (title, sizeof_fmt(total[key])), len(sizeByType))
+    types = sgsizes.by_size(sizes['types'], key)
+    pie = ROOT.TPie("%s_pie" % title, "%s: %s" % (title, sizeof_fmt(sizes[key])), len(types))
     # need to use enumerate for TPie
-    for i, containerType in enumerate(sizeByType):
-      sizes = sizeByType[containerType]
-      pie.SetEntryVal(i, sizes[key])
+    for i, (containerType, typeSizes) in enumerate(types):
+      pie.SetEntryVal(i, typeSizes[key])
       pie.SetEntryFillColor(i, validColors[i%len(validColors)])
 
-      if float(sizes[key])/float(total[key]) > 0.05:
+      if sizes[key] and float(typeSizes[key])/float(sizes[key]) > 0.05:
         pie.SetEntryRadiusOffset(i, 0.03)
         pie.SetEntryLabel(i, "#splitline{%s}{          (%%perc)}" % containerType)
       else:
@@ -440,87 +1583,90 @@ def make_size_report_pie(t, xAOD_Objects, directory="report"):
     pie.SetY(0.6)
 
     pie.Draw("3D NOL SC <")
-    c.Print('sizes.pdf', 'Title:{0}'.format(title))
+    c.Print(pathToImage, 'Title:{0}'.format(title))
     del pie, c
 
-  blankCanvas.Print('{0}]'.format('sizes.pdf'), 'Title:{0}'.format(title))
+  blankCanvas.Print('{0}]'.format(pathToImage), 'Title:{0}'.format(title))
   del blankCanvas
 
   return True
 
-
-
-#TODO: create it for each container as well automatically, this is for each type
 #@echo(write=dumpSG_logger.debug)
-def make_size_report(t, xAOD_Objects, directory="report"):
-  total = {'totbytes': 0, 'filebytes': 0}
-
+def make_size_report(xAOD_Objects, directory="report", entries=None):
+  '''
+  account for the size of every type, container and branch in a single pass, see sgsizes.py
+    - sizes.json, sizes.csv (to sort however you like) and sizes.txt have the whole breakdown,
+      per event as well if the number of entries is given
+    - sizes_ondisk.svg and sizes_inmemory.svg are treemaps of the types and their containers
+    - sizes.pdf has pie charts of the types, if ROOT is available
+  '''
   # first start by making the report directory
   if not os.path.exists(directory):
     os.makedirs(directory)
-  sizeByType = defaultdict(lambda: {'totbytes': 0, 'filebytes': 0})
-  for ContainerName, Elements in sorted(xAOD_Objects.items(), key=lambda (k,v): (v['type'].lower(), k.lower())):
-    sizeByType[Elements['type']]['totbytes'] += Elements['totbytes']
-    sizeByType[Elements['type']]['filebytes'] += Elements['filebytes']
-    total['totbytes'] += Elements['totbytes']
-    total['filebytes'] += Elements['filebytes']
 
-  width = 1200
-  height = 1000
-  blankCanvas = ROOT.TCanvas("test", "", width, height)
-  blankCanvas.Print('{0}['.format('sizes.pdf'))
+  sizes = sgsizes.breakdown(xAOD_Objects, entries=entries)
+  fmt = lambda num: signed_sizeof_fmt(num, signed=False)
 
-  # manually set the list of "good" colors to use for the piechart
-  validColors = [2, 4, 6, 8, 9, 11, 12, 15, 20, 28, 29, 30, 33, 36, 38, 41, 43, 46]
+  with open(os.path.join(directory, 'sizes.json'), 'w+') as f:
+    sgsizes.write_json(sizes, f)
+  with open(os.path.join(directory, 'sizes.csv'), 'wb') as f:
+    sgsizes.write_csv(sizes, f)
+  with open(os.path.join(directory, 'sizes.txt'), 'w+') as f:
+    sgsizes.write_table(sizes, f, sizeof_fmt=fmt)
+  for key, title, fname in [('filebytes', 'On-Disk Size', 'sizes_ondisk.svg'), ('totbytes', 'In-Mem Size', 'sizes_inmemory.svg')]:
+    with open(os.path.join(directory, fname), 'w+') as f:
+      sgsizes.write_treemap(sizes, f, key=key, title=title, sizeof_fmt=fmt)
 
-  for title, key in [('On-Disk Size', 'filebytes'), ('In-Mem Size', 'totbytes')]:
-    c = ROOT.TCanvas("MyCanvas", "", width, height)
-    pie = ROOT.TPie("%s_pie" % title, "%s: %s" % (title, sizeof_fmt(total[key])), len(sizeByType))
-    # need to use enumerate for TPie
-    for i, containerType in enumerate(sizeByType):
-      sizes = sizeByType[containerType]
-      pie.SetEntryVal(i, sizes[key])
-      pie.SetEntryFillColor(i, validColors[i%len(validColors)])
+  if root_available():
+    with tracing.span('make_size_pies'):
+      make_size_pies(sizes, os.path.join(directory, 'sizes.pdf'))
 
-      if float(sizes[key])/float(total[key]) > 0.05:
-        pie.SetEntryRadiusOffset(i, 0.03)
-        pie.SetEntryLabel(i, "#splitline{%s}{          (%%perc)}" % containerType)
-      else:
-        pie.SetEntryLabel(i, "")
+  dumpSG_logger.info("Wrote the size report to {0}".format(directory))
+  return sizes
 
-    pie.SetRadius(0.2)
-    pie.SetTextSize(0.02)
-    pie.SetAngularOffset(90.)
-    pie.SetHeight(0.1)
-    pie.SetAngle3D(100.0)
-    pie.SetY(0.6)
+#@echo(write=dumpSG_logger.debug)
+def make_access_report(xAOD_Objects, used, read=None, read_time=None, directory="report"):
+  '''
+  compare the branches analysis jobs read with the ones they used, see sgaccess.py
+    - used and read are lists of files with access records, every branch is read if read is None
+    - access.json and access.txt are written to directory
+  '''
+  if not os.path.exists(directory):
+    os.makedirs(directory)
 
-    pie.Draw("3D NOL SC <")
-    c.Print('sizes.pdf', 'Title:{0}'.format(title))
-    del pie, c
+  usedRecords = [record for path in used for record in sgaccess.load_records(path)]
+  readRecords = [record for path in read for record in sgaccess.load_records(path)] if read else None
+  report = sgaccess.access_report(xAOD_Objects, usedRecords, read=readRecords, read_time=read_time)
+  fmt = lambda num: signed_sizeof_fmt(num, signed=False)
 
-  blankCanvas.Print('{0}]'.format('sizes.pdf'), 'Title:{0}'.format(title))
-  del blankCanvas
+  with open(os.path.join(directory, 'access.json'), 'w+') as f:
+    sgaccess.write_json(report, f)
+  with open(os.path.join(directory, 'access.txt'), 'w+') as f:
+    sgaccess.write_table(report, f, sizeof_fmt=fmt)
 
-  return True
+  dumpSG_logger.info("Wrote the access report to {0}".format(directory))
+  return report
 
 #@echo(write=dumpSG_logger.debug)
 def filter_xAOD_objects(xAOD_Objects, args):
-  p_container_name = re.compile(fnmatch.translate(args.container_name_regex))
-  p_container_type = re.compile(fnmatch.translate(args.container_type_regex))
-
-  # Python Level: EXPERT MODE
-  filtered_xAOD_Objects = {k:{prop:val for prop, val in v.iteritems() if (args.list_properties and prop=='prop') or (args.list_attributes and prop=='attr') or prop not in ['prop','attr']}
-                            for (k,v) in xAOD_Objects.iteritems()
-                            if p_container_name.match(k) and p_container_type.match(v['type']) and (not args.has_aux or v['has_aux']) and (not args.has_interface or v['has_interface'])
+  # the name and type filters were already applied while reading the files, unless the schema came from the cache
+  selected = LeafSelector.from_args(args).select(xAOD_Objects)
+
+  # views share everything with xAOD_Objects, only hiding prop/attr if they are not listed
+  # the items of --io-profile are always listed, they carry its records
+  hidden = sgschema.ContainerView.hide(list_properties=args.list_properties or args.io_profile, list_attributes=args.list_attributes or args.io_profile)
+  filtered_xAOD_Objects = {k:sgschema.ContainerView(v, hidden)
+                            for (k,v) in selected.iteritems()
+                            if (not args.has_aux or v.has_aux) and (not args.has_interface or v.has_interface)
                           }
   return filtered_xAOD_Objects
 
 #@echo(write=dumpSG_logger.debug)
 def update_sizes(xAOD_Objects):
   for ContainerName, Elements in xAOD_Objects.iteritems():
-    Elements['totbytes'] += reduce(lambda a,d: a+d.get('totbytes', 0), Elements.get('prop', []) + Elements.get('attr', []), 0)
-    Elements['filebytes'] += reduce(lambda a,d: a+d.get('filebytes', 0), Elements.get('prop', []) + Elements.get('attr', []), 0)
+    propsAndAttrs = Elements.get('prop', []) + Elements.get('attr', [])
+    Elements['totbytes'] += sum(item.totbytes for item in propsAndAttrs)
+    Elements['filebytes'] += sum(item.filebytes for item in propsAndAttrs)
   return True
 
 #@echo(write=dumpSG_logger.debug)
@@ -540,11 +1686,11 @@ def dump_pretty(xAOD_Objects, f):
     f.write('  |\t%s* %s\n' % (Elements['type'], ContainerName))
 
     if args.list_properties:
-      for prop in sorted(Elements['prop'], key=lambda k: k['name'].lower()):
-        f.write('  |\t  |\t%s &->%s()\n' % (prop['type'], prop['name']))
+      for prop in sorted(Elements['prop'], key=lambda k: k.name.lower()):
+        f.write('  |\t  |\t%s &->%s()\n' % (prop.type, prop.name))
     if args.list_attributes:
-      for attr in sorted(Elements['attr'], key=lambda k: k['name'].lower()):
-        f.write('  |\t  |\t&->getAttribute<%s>("%s")\n' % (attr['type'], attr['name']))
+      for attr in sorted(Elements['attr'], key=lambda k: k.name.lower()):
+        f.write('  |\t  |\t&->getAttribute<%s>("%s")\n' % (attr.type, attr.name))
     # this is to add a closing line on the secondary level if we're outputting one of props/attrs
     # NB: we should only add this if there are properties or attributes to print out
     if (args.list_attributes and len(Elements['attr']) > 0) or (args.list_properties and len(Elements['prop']) > 0):
@@ -552,28 +1698,309 @@ def dump_pretty(xAOD_Objects, f):
 
   f.write('  %s\n' % ('-'*20))
 
+class JSONStreamWriter(object):
+  '''
+  write the containers to a file one at a time, as soon as each one is done
+    - json: the same text as json.dumps(xAOD_Objects, sort_keys=True, indent=4) if the containers
+      are written in sorted order, but only one container is ever serialized in memory
+    - jsonl: one line per container, {"container": name, ...} with the values of the container
+  '''
+  def __init__(self, f, output_format='json'):
+    if output_format not in ['json', 'jsonl']:
+      raise ValueError('output_format was not valid!')
+    self.f = f
+    self.output_format = output_format
+    self.encoder = json.JSONEncoder(sort_keys=True, indent=4 if output_format == 'json' else None)
+    self.written = 0
+
+  def write(self, container, containerVals):
+    containerVals = sgschema.as_dict(containerVals)
+    if self.output_format == 'jsonl':
+      self.f.write(self.encoder.encode(dict(containerVals, container=container)))
+      self.f.write('\n')
+    else:
+      # everything inside of the top-level dictionary is indented one more level
+      self.f.write('{0}\n    {1}{2}{3}'.format('{' if self.written == 0 else self.encoder.item_separator,
+                                                self.encoder.encode(container),
+                                                self.encoder.key_separator,
+                                                self.encoder.encode(containerVals).replace('\n', '\n    ')))
+    self.f.flush()
+    self.written += 1
+
+  def close(self):
+    if self.output_format == 'json':
+      self.f.write('\n}' if self.written else '{}')
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
 #@echo(write=dumpSG_logger.debug)
 def dump_xAOD_objects(xAOD_Objects, args):
   # dumps object information given the structure output by inspect_tree()
   # NB: all sorting is done using lowercased strings because it's human-sorting
+  if args.output_format == 'pickle':
+    # the binary protocol is streamed to the file and is much smaller than the default text one
+    with open(args.output_filename, 'wb') as f:
+      pickle.dump(sgschema.as_dict(xAOD_Objects), f, pickle.HIGHEST_PROTOCOL)
+    return True
+
   with open(args.output_filename, 'w+') as f:
     if args.output_format == 'pretty':
       dump_pretty(xAOD_Objects, f)
-    elif args.output_format == 'json':
-      f.write(json.dumps(xAOD_Objects, sort_keys=True, indent=4))
-    elif args.output_format == 'pickle':
-      pickle.dump(xAOD_Objects, f)
+    elif args.output_format in ['json', 'jsonl']:
+      with JSONStreamWriter(f, output_format=args.output_format) as writer:
+        for container in sorted(xAOD_Objects):
+          writer.write(container, xAOD_Objects[container])
     else:
       raise ValueError('args.output_format was not valid!')
   return True
 
-if __name__ == "__main__":
-  parser = argparse.ArgumentParser(description='Process xAOD File and Dump Information.', usage='%(prog)s filename [filename] [options]')
-  # positional argument, require the first argument to be the input filename
-  parser.add_argument('input_filename',
+def set_verbosity(verbose):
+  # set verbosity for python printing
+  if verbose < 5:
+    dumpSG_logger.setLevel(25 - verbose*5)
+  else:
+    dumpSG_logger.setLevel(logging.NOTSET + 1)
+
+def open_reader(input_filenames, args):
+  # start by opening the input files
+  dumpSG_logger.info("Opening the input files with the {0} backend".format(args.backend))
+  with tracing.span('open_backend'):
+    return open_backend(args.backend, args.tree_name, input_filenames)
+
+#@echo(write=dumpSG_logger.debug)
+def load_xAOD_objects(input_filenames, args, count_entries=False):
+  '''
+  build up the raw dictionary of xAOD objects of the input files, from the schema cache if we can
+    - returns (entries, xAOD_Objects, t): entries is None if they were not counted, and t is the
+      reader backend if the files had to be opened, None otherwise
+    - the name and type filters are applied while the files are read, so only what they select
+      has its sizes read (see LeafSelector), and it is cached apart from the whole schema. If the
+      whole schema is in the cache, it is used instead, and filtered by filter_xAOD_objects()
+  '''
+  selector = LeafSelector.from_args(args)
+  # look for the raw dictionary in the schema cache first
+  cache, cacheKey, cached = None, None, None
+  if args.use_cache:
+    cache = sgcache.SchemaCache(directory=args.cache_directory)
+    # backends can disagree on the type names, so they each get their own entries
+    cacheMode = ('scan' if args.scan_files else 'chain') + ('' if args.backend == 'root' else ':' + args.backend)
+    cacheModes = [cacheMode] if selector.everything() else [cacheMode, cacheMode + ':select:' + selector.signature()]
+    for mode in cacheModes:
+      cacheKey = sgcache.cache_key(args.tree_name, input_filenames, mode=mode)
+      if cacheKey is None or args.refresh_cache: continue
+      cached = cache.get(cacheKey)
+      if cached is not None: break
+
+  # we only need to read the files if we missed the cache
+  t = None
+  if cached is None:
+    # first, just build up the whole dictionary
+    if args.scan_files:
+      # every file gets opened anyway, so the number of entries comes for free
+      with tracing.span('scan_files'):
+        entries, leaves = scan_files(args.tree_name, input_filenames, jobs=args.jobs, backend=args.backend, selector=None if selector.everything() else selector)
+      with tracing.span('classify_leaves'):
+        xAOD_Objects = classify_leaves(leaves)
+    else:
+      entries = None
+      t = open_reader(input_filenames, args)
+      with tracing.span('inspect_tree'):
+        xAOD_Objects = inspect_tree(t, selector=None if selector.everything() else selector)
+  else:
+    entries, xAOD_Objects = cached['entries'], cached['xAOD_Objects']
+
+  # counting the entries can mean opening every file, so only do it if asked to
+  if entries is None and count_entries:
+    if t is None:
+      t = open_reader(input_filenames, args)
+    with tracing.span('count_entries'):
+      entries = t.entries()
+
+  if cacheKey is not None and (cached is None or cached['entries'] != entries):
+    cache.put(cacheKey, {'entries': entries, 'xAOD_Objects': xAOD_Objects})
+
+  return (entries, xAOD_Objects, t)
+
+def load_diff_side(path, entries, args):
+  '''
+  (entries, xAOD_Objects) of one side of a diff, either a saved dump or a ROOT file read like any other run
+  '''
+  isRoot = path.startswith('root://')
+  if not isRoot:
+    with open(path, 'rb') as f:
+      isRoot = f.read(4) == b'root'
+  if not isRoot:
+    return (entries, sgdiff.load_dump(path))
+
+  fileEntries, xAOD_Objects, t = load_xAOD_objects([path], args, count_entries=entries is None)
+  # the same sizes as a dump with --prop --attr, so that files and dumps can be compared with each other
+  views = {k: sgschema.ContainerView(v) for (k, v) in xAOD_Objects.iteritems()}
+  update_sizes(views)
+  return (entries if entries is not None else fileEntries, sgschema.as_dict(views))
+
+def dump_diff_pretty(diff, f, names=('A', 'B')):
+  f.write('Comparing {0}\n     with {1}\n'.format(*names))
+  entries = diff['entries']
+  if entries[0] and entries[1]:
+    f.write('Events: {0} -> {1}\n'.format(*entries))
+
+  f.write('\nContainers: {0} added, {1} removed, {2} retyped, {3} with changed properties/attributes\n'.format(len(diff['added']), len(diff['removed']), len(diff['retyped']), len(diff['changed'])))
+  for container in sorted(diff['added'], key=lambda k: k.lower()):
+    f.write('  + {0:<50} {1}\n'.format(container, diff['added'][container]))
+  for container in sorted(diff['removed'], key=lambda k: k.lower()):
+    f.write('  - {0:<50} {1}\n'.format(container, diff['removed'][container]))
+  for container in sorted(diff['retyped'], key=lambda k: k.lower()):
+    f.write('  ~ {0:<50} {1} -> {2}\n'.format(container, *diff['retyped'][container]))
+
+  notCompared = {'prop': 'properties (--prop)', 'attr': 'attributes (--attr)'}
+  if diff.get('not_compared'):
+    f.write('\nNot compared, only one side lists them: {0}\n'.format(', '.join(notCompared[kind] for kind in diff['not_compared'])))
+
+  if diff['changed']:
+    f.write('\nProperties and attributes\n')
+  for container in sorted(diff['changed'], key=lambda k: k.lower()):
+    changes = diff['changed'][container]
+    f.write('  {0}\n'.format(container))
+    for item in changes['added']:
+      f.write('    + {0} {1:<44} {2}\n'.format(item['kind'], item['name'], item['type']))
+    for item in changes['removed']:
+      f.write('    - {0} {1:<44} {2}\n'.format(item['kind'], item['name'], item['type']))
+    for item in changes['retyped']:
+      f.write('    ~ {0} {1:<44} {2} -> {3}\n'.format(item['kind'], item['name'], item['from'], item['to']))
+
+  # per event if we can, otherwise a dataset with more events always looks bigger
+  suffix = '_per_event' if entries[0] and entries[1] else ''
+  changed = [(container, sizes) for (container, sizes) in diff['sizes'].iteritems() if sizes['filebytes']['delta'] or sizes['totbytes']['delta']]
+  if changed:
+    f.write('\nSizes{0}, largest change on disk first\n'.format(' per event' if suffix else ''))
+    f.write('  {0:<50}{1:>14}{2:>14}{3:>14}{4:>14}{5:>14}{6:>14}\n'.format('container', 'disk A', 'disk B', 'disk delta', 'memory A', 'memory B', 'memory delta'))
+  for container, sizes in sorted(changed, key=lambda (k, v): (-abs(v['filebytes']['delta'+suffix]), k.lower())):
+    fields = []
+    for key in ['filebytes', 'totbytes']:
+      fields += [signed_sizeof_fmt(sizes[key]['a'+suffix], signed=False), signed_sizeof_fmt(sizes[key]['b'+suffix], signed=False), signed_sizeof_fmt(sizes[key]['delta'+suffix])]
+    f.write('  {0:<50}{1:>14}{2:>14}{3:>14}{4:>14}{5:>14}{6:>14}\n'.format(container, *fields))
+
+def diff_main(argv):
+  parser = argparse.ArgumentParser(prog='dumpSG.py diff', description='Compare the StoreGate structure and sizes of two datasets.', usage='%(prog)s A B [options]')
+  parser.add_argument('a',
                       type=str,
-                      nargs='+',
-                      help='input root file(s) to read')
+                      help='the baseline: a json, jsonl or pickle dump of dumpSG.py, or a ROOT file. Dumps only have the properties and attributes to compare if they were written with --prop --attr, and are compared without reading any ROOT file')
+  parser.add_argument('b',
+                      type=str,
+                      help='what to compare to the baseline, like A')
+  parser.add_argument('--entries',
+                      type=int,
+                      nargs=2,
+                      required=False,
+                      dest='entries',
+                      metavar=('ENTRIES_A', 'ENTRIES_B'),
+                      help='Number of events of A and B, to compare the sizes per event. The events of ROOT files are counted. Default: not used for dumps',
+                      default=[None, None])
+  parser.add_argument('--tree',
+                      type=str,
+                      required=False,
+                      dest='tree_name',
+                      help='Specify the tree that contains the StoreGate structure. Default: CollectionTree',
+                      default='CollectionTree')
+  parser.add_argument('--backend',
+                      type=str,
+                      required=False,
+                      dest='backend',
+                      choices=sorted(reader_backends),
+                      help='How to read ROOT files, see dumpSG.py --help. Default: root',
+                      default='root')
+  parser.add_argument('-o',
+                      '--output',
+                      type=str,
+                      required=False,
+                      dest='output_filename',
+                      help='Output file to store the differences. Default: the standard output',
+                      default=None)
+  parser.add_argument('-f',
+                      '--format',
+                      type=str,
+                      required=False,
+                      dest='output_format',
+                      choices=['json','pretty'],
+                      help='Specify the output format. Default: pretty',
+                      default='pretty')
+  parser.add_argument('-v',
+                      '--verbose',
+                      dest='verbose',
+                      action='count',
+                      default=0,
+                      help='Enable verbose output of various levels. Default: no verbosity')
+  parser.add_argument('--no-cache',
+                      dest='use_cache',
+                      action='store_false',
+                      help='Disable the on-disk schema cache for ROOT files. Default: enabled')
+  parser.add_argument('--refresh-cache',
+                      dest='refresh_cache',
+                      action='store_true',
+                      help='Ignore any cached structure of ROOT files and read them again, refreshing the cache. Default: disabled')
+  parser.add_argument('--cache-dir',
+                      type=str,
+                      required=False,
+                      dest='cache_directory',
+                      help='Directory of the on-disk schema cache. Default: {0}'.format(sgcache.default_directory),
+                      default=sgcache.default_directory)
+  diff_args = parser.parse_args(argv)
+  # ROOT files are read like a normal run without --scan-files
+  diff_args.scan_files, diff_args.jobs = False, 1
+
+  set_verbosity(diff_args.verbose)
+  root_settings['batch_mode'] = True
+
+  entriesA, a = load_diff_side(diff_args.a, diff_args.entries[0], diff_args)
+  entriesB, b = load_diff_side(diff_args.b, diff_args.entries[1], diff_args)
+  with tracing.span('diff_xAOD_objects'):
+    diff = sgdiff.diff_xAOD_objects(a, b, entries=(entriesA, entriesB))
+  if not (entriesA and entriesB):
+    dumpSG_logger.info("The number of events of both sides is not known, so the sizes are not compared per event. Use --entries.")
+
+  f = open(diff_args.output_filename, 'w+') if diff_args.output_filename else STDOUT
+  try:
+    if diff_args.output_format == 'json':
+      json.dump(diff, f, sort_keys=True, indent=4)
+      f.write('\n')
+    else:
+      dump_diff_pretty(diff, f, names=(diff_args.a, diff_args.b))
+  finally:
+    if f is STDOUT:
+      f.flush()
+    else:
+      f.close()
+  return True
+
+def make_parser(batch=False):
+  '''
+  the options of a run, a batch (see batch_main()) takes the same options for every dataset
+  '''
+  if batch:
+    parser = argparse.ArgumentParser(prog='dumpSG.py batch', description='Process many datasets with the same options, on a pool of worker processes.', usage='%(prog)s DATASET [DATASET ...] [options]')
+    parser.add_argument('input_filename',
+                        type=str,
+                        nargs='*',
+                        metavar='DATASET',
+                        help='the input root files of a dataset, as a glob (quote it) or a directory. NAME=GLOB names the dataset, by default it is named after the directory of its files')
+    parser.add_argument('--datasets',
+                        type=str,
+                        required=False,
+                        dest='dataset_list',
+                        metavar='FILENAME',
+                        help='A file with more datasets, one per line, like the positional arguments. Default: none',
+                        default=None)
+  else:
+    parser = argparse.ArgumentParser(description='Process xAOD File and Dump Information.', usage='%(prog)s filename [filename] [options]\n       %(prog)s diff A B [options]\n       %(prog)s batch DATASET [DATASET ...] [options]\n       %(prog)s query SOCKET QUERY [QUERY ...] [options]\n       %(prog)s index INDEX [PATTERN ...] [options]')
+    # positional argument, require the first argument to be the input filename
+    parser.add_argument('input_filename',
+                        type=str,
+                        nargs='+',
+                        help='input root file(s) to read')
   # these are options allowing for various additional configurations in filtering container and types to dump
   parser.add_argument('--tree',
                       type=str,
@@ -586,15 +2013,15 @@ if __name__ == "__main__":
                       type=str,
                       required=False,
                       dest='output_filename',
-                      help='Output file to store dumped information. Default: info.dump',
+                      help='Output file to store dumped information, in the directory of each dataset. Default: info.dump' if batch else 'Output file to store dumped information. Default: info.dump',
                       default='info.dump')
   parser.add_argument('-d',
                       '--output_directory',
                       type=str,
                       required=False,
                       dest='output_directory',
-                      help='Output directory to store the report generated. Default: report',
-                      default='report')
+                      help='Output directory of the batch: every dataset gets a directory in it with its dump and reports, next to the summary of the batch. Default: batch' if batch else 'Output directory to store the report generated. Default: report',
+                      default='batch' if batch else 'report')
   parser.add_argument('-t',
                       '--type',
                       type=str,
@@ -614,8 +2041,8 @@ if __name__ == "__main__":
                       type=str,
                       required=False,
                       dest='output_format',
-                      choices=['json','pickle','pretty'],
-                      help='Specify the output format. Default: pretty',
+                      choices=['json','jsonl','pickle','pretty'],
+                      help='Specify the output format. jsonl writes one JSON record per container per line. Default: pretty',
                       default='pretty')
   parser.add_argument('-v',
                       '--verbose',
@@ -664,10 +2091,137 @@ if __name__ == "__main__":
                       dest='merge_report',
                       action='store_true',
                       help='Enable to merge the generated report by container. By default, this is turned off. Default: disabled')
+  parser.add_argument('--plot-format',
+                      type=str,
+                      nargs='+',
+                      required=False,
+                      dest='plot_formats',
+                      choices=plot_formats,
+                      metavar='FORMAT',
+                      help='Formats to write the plots of the report in, any of {0}. pdf is a file per branch (or per container with --merge-report) and png a small thumbnail per branch, both drawn with ROOT. html is a single self-contained page with every plot, drawn in the browser as it is scrolled to and searchable by name, and json has all of the histograms to draw them with something else. Neither of these needs ROOT, and they are much quicker to write and to open for thousands of branches. Default: pdf'.format(', '.join(plot_formats)),
+                      default=['pdf'])
+  parser.add_argument('--render-jobs',
+                      type=int,
+                      required=False,
+                      dest='render_jobs',
+                      help='Number of worker processes drawing the pdf and png plots with ROOT. The plots of each container are handed over as soon as its histograms are filled, so the report goes on reading while they are drawn. 0 draws them in between the reading instead. Default: 1',
+                      default=1)
+  parser.add_argument('--max-rss',
+                      type=float,
+                      required=False,
+                      dest='max_rss',
+                      metavar='MB',
+                      help='Keep the resident memory of each process of the report under this many MB, for batch slots with a hard memory limit. The memory is sampled after every container, and once it goes above the ceiling the input files, their baskets and caches are closed and opened again, and the workers drawing the plots are replaced by fresh ones. What is already done is on disk by then (see --no-resume), so nothing is lost. The peak memory of the report is printed at the end either way. 0 means no ceiling. Default: 0',
+                      default=0.)
+  parser.add_argument('--no-resume',
+                      dest='resume_report',
+                      action='store_false',
+                      help='Redo the whole report. By default, a manifest in the output directory records what a report has done, so a report that crashed resumes where it stopped, and branches whose input files did not change are not filled or drawn again. Default: enabled')
+  parser.add_argument('--sample',
+                      type=parse_sample,
+                      required=False,
+                      dest='sample',
+                      help='Only fill the report from a sample of the events, either a number of events (--sample 10000) or a fraction of them (--sample 0.05 or --sample 5%%). The mean and RMS in info.json then come with their uncertainties, and the plots are marked as sampled. Default: every event',
+                      default=None)
+  parser.add_argument('--sample-mode',
+                      type=str,
+                      required=False,
+                      dest='sample_mode',
+                      choices=backends.sample_modes,
+                      help='How to pick the events for --sample. first takes the first events. spread and random take whole clusters, so the reading stays sequential, either evenly spaced over the input files or at random (always the same ones for the same files). Default: first',
+                      default='first')
+  parser.add_argument('-j',
+                      '--jobs',
+                      type=int,
+                      required=False,
+                      dest='jobs',
+                      help='Number of worker processes, each processing one dataset at a time. The workers stay up for the whole batch, so ROOT is loaded once per worker rather than once per dataset, and each dataset is processed with a single job. Default: 1' if batch else 'Number of worker processes used to build the report, or to scan the input files with --scan-files. Each report worker reads its own chain, and the work is balanced across them by the in-memory size of the branches, or split by events, see --report-split. Default: 1',
+                      default=1)
+  parser.add_argument('--report-split',
+                      type=str,
+                      choices=['branches', 'events'],
+                      dest='report_split',
+                      help='How --jobs splits the report between the workers: by branches, where each worker reads all of the events of some of the containers, or by events, where each worker reads all of the branches of an input file (or of a range of its clusters, if there are fewer files than workers) and their partial histograms are merged. The files are read twice then, first for the range of the values of each branch, which all of the partial histograms span. Splitting by events scales with the number of input files rather than with the number of containers. Default: branches',
+                      default='branches')
+  parser.add_argument('--cache-size',
+                      type=float,
+                      required=False,
+                      dest='cache_size',
+                      metavar='MB',
+                      help='Size of the TTreeCache the report reads through, in MB, with the branches it fills registered up front. This turns many small reads into a few large ones, which matters most for root:// inputs and slow shared disks. The number of read calls, the bytes read and the efficiency of the cache are printed at the end, to tune it. 0 turns the cache off. Only the root backend has a TTreeCache. Default: 30',
+                      default=30.)
+  parser.add_argument('--backend',
+                      type=str,
+                      required=False,
+                      dest='backend',
+                      choices=sorted(reader_backends),
+                      help='How to read the input files. root reads them through a TChain with PyROOT. uproot reads them with uproot 3 (the uproot3 package) and NumPy, without ROOT; the report then only has the statistics of each branch, unless ROOT is also available to draw the plots. Default: root',
+                      default='root')
+  parser.add_argument('--scan-files',
+                      dest='scan_files',
+                      action='store_true',
+                      help='Enable to read the branch metadata of each input file separately (in parallel with --jobs). The sizes are added up over all of the files, rather than taken from the first file of the chain, and files with a different set of branches than the majority are reported. Default: disabled')
+  parser.add_argument('--count-entries',
+                      dest='count_entries',
+                      action='store_true',
+                      help='Enable to count the number of entries in the input files. This opens every file in the chain, so it is off by default (unless --scan-files already opened them). Default: disabled')
+  parser.add_argument('--trace',
+                      type=str,
+                      required=False,
+                      dest='trace_filename',
+                      help='Write the time, CPU time and memory spent in each step to this file in the Chrome trace format (open it in chrome://tracing or ui.perfetto.dev), and print a summary with the 20 branches that took the longest in the report: the time to work out the statistics of each (with TTree::Draw, for a branch that could not be filled in the single pass over all of them) plus the time to print its plots. The single pass itself is only in the totals. Default: disabled',
+                      default=None)
+  parser.add_argument('--no-cache',
+                      dest='use_cache',
+                      action='store_false',
+                      help='Disable the on-disk schema cache. By default, the structure of the input files is cached so repeated runs over the same files do not need to read them again. Default: enabled')
+  parser.add_argument('--refresh-cache',
+                      dest='refresh_cache',
+                      action='store_true',
+                      help='Ignore any cached structure of the input files and read them again, refreshing the cache. Default: disabled')
+  parser.add_argument('--cache-dir',
+                      type=str,
+                      required=False,
+                      dest='cache_directory',
+                      help='Directory of the on-disk schema cache. Default: {0}'.format(sgcache.default_directory),
+                      default=sgcache.default_directory)
+  parser.add_argument('--io-profile',
+                      dest='io_profile',
+                      action='store_true',
+                      help='Enable to read every branch of the selected containers on its own, and record how long that took, how much of it was decompression, the MB/s, the number of baskets and the compression ratio. These are added to the properties and attributes in the output, which are listed even without --prop/--attr (and summed up for each container), and the most expensive branches to read are printed at the end. Default: disabled')
+  parser.add_argument('--io-profile-baskets',
+                      type=int,
+                      required=False,
+                      dest='io_profile_baskets',
+                      help='Only read this many baskets of each branch for --io-profile, spread over the branch. 0 reads every basket. Default: 0',
+                      default=0)
+  parser.add_argument('--access',
+                      type=str,
+                      required=False,
+                      dest='access_used',
+                      action='append',
+                      metavar='RECORD',
+                      help='A record of the branches an analysis job used: a plain list of branches (fnmatch patterns work too), a JSON list, or the output of TTreePerfStats::PrintBasketInfo() or TTreeCache::Print("a") from the job log. Can be given several times. The bytes read and used by each container and branch, and the file size and read time with the unused branches slimmed away, are written to access.txt and access.json in the output directory. Default: disabled',
+                      default=[])
+  parser.add_argument('--access-read',
+                      type=str,
+                      required=False,
+                      dest='access_read',
+                      action='append',
+                      metavar='RECORD',
+                      help='A record of the branches the analysis job read, in the same formats as --access, e.g. the branches in its TTreeCache. Can be given several times. Default: every branch of the selected containers',
+                      default=[])
+  parser.add_argument('--access-read-time',
+                      type=float,
+                      required=False,
+                      dest='access_read_time',
+                      metavar='SECONDS',
+                      help='The time the analysis job spent reading, to project onto the bytes it used. With --io-profile, the read times of the branches are projected as well. Default: none',
+                      default=None)
   parser.add_argument('--size',
                       dest='make_size_report',
                       action='store_true',
-                      help='Enable to build a pie chart of the size distributions in memory and on-disk. By default, this is turned off. Default: disabled')
+                      help='Enable to account for the size of every type, container and branch, in memory and on-disk, in total and per event. This is written to the output directory as sizes.json, sizes.csv and a sizes.txt table, with treemaps of the containers (sizes_ondisk.svg, sizes_inmemory.svg) and pie charts of the types (sizes.pdf, if ROOT is available). By default, this is turned off. Default: disabled')
 
   # arguments for report coloring
   parser.add_argument('--noEntries',
@@ -694,81 +2248,515 @@ if __name__ == "__main__":
                       type=str,
                       required=False,
                       dest='property_name_regex',
-                      help='(INACTIVE) Regex specification for xAOD property names. Only used if --prop enabled.',
+                      help='Regex specification for xAOD property names. For example, --filterProps="pt*" keeps `pt` and `ptcone20`. Like --container and --type, this uses Unix filename matching and is applied while the input files are read, so the branches it leaves out never have their sizes read, are not in the size report and are not drawn. Default: *',
                       default='*')
   parser.add_argument('--filterAttrs',
                       type=str,
                       required=False,
                       dest='attribute_name_regex',
-                      help='(INACTIVE) Regex specification for xAOD attribute names. Only used if --attr enabled.',
+                      help='Regex specification for xAOD attribute names, like --filterProps. Default: *',
                       default='*')
   parser.add_argument('-i',
                       '--interactive',
                       dest='interactive',
                       action='store_true',
-                      help='(INACTIVE) Flip on/off interactive mode allowing you to navigate through the container types and properties.')
+                      help='Keep the containers in memory and answer queries about them at a prompt: the container types, the containers, the properties and attributes with a given name, the size of a container, and so on (type help). Queries that have to read the files, like the statistics of a branch, run in the background so the prompt stays responsive. Nothing is written out. Default: disabled')
+  parser.add_argument('--socket',
+                      type=str,
+                      required=False,
+                      dest='query_socket',
+                      metavar='PATH',
+                      help='With --interactive, also answer the queries sent to a Unix socket at this path, one per line, each answered with a line of JSON, e.g. with `dumpSG.py query PATH QUERY`. Without a terminal, only the socket is served, until it is sent `shutdown`. Default: not used',
+                      default=None)
+  if batch:
+    parser.add_argument('--index',
+                        type=str,
+                        required=False,
+                        dest='index_path',
+                        metavar='PATH',
+                        help='Also add every container, property and attribute of each dataset (whatever --prop/--attr list, within the other filters) to the index at PATH, an SQLite file which is created if needed, see `dumpSG.py index`. A dataset already in the index is replaced. Default: not used',
+                        default=None)
+  return parser
 
-  # parse the arguments, throw errors if missing any
-  args = parser.parse_args()
-  if args.property_name_regex != '*' or args.attribute_name_regex != '*' or args.interactive:
-    parser.error("The following arguments have not been implemented yet: --filterProps, --filterAttrs, --interactive. Sorry for the inconvenience.")
+#@echo(write=dumpSG_logger.debug)
+def process(args):
+  '''
+  everything a run does with its input files (args.input_filename), up to and including the dump
+    - returns (entries, xAOD_Objects) with the filtered xAOD objects, entries is None if they were not counted
+  '''
+  # the files are only read if they are not in the schema cache, t is None if they were not
+  entries, xAOD_Objects, t = load_xAOD_objects(args.input_filename, args, count_entries=args.count_entries)
+
+  # Print some information
+  if entries is not None:
+    dumpSG_logger.info('Number of input events: %s' % entries)
+
+  warn_missing(xAOD_Objects)
+
+  # next, use the filters to cut down the dictionaries for outputting
+  with tracing.span('filter_xAOD_objects'):
+    filtered_xAOD_Objects = filter_xAOD_objects(xAOD_Objects, args)
+
+  with tracing.span('update_sizes'):
+    update_sizes(filtered_xAOD_Objects)
+
+  profiled, readStats = None, None
+  if args.io_profile:
+    if t is None:
+      t = open_reader(args.input_filename, args)
+    with tracing.span('io_profile'):
+      profiled = io_profile(t, filtered_xAOD_Objects, max_baskets=args.io_profile_baskets)
+
+  # next, make a report -- add in information about mean, RMS, entries
+  if args.make_report:
+    if t is None:
+      t = open_reader(args.input_filename, args)
+    sample = None
+    if args.sample:
+      with tracing.span('choose_sample'):
+        sample = choose_sample(t, args.sample, mode=args.sample_mode)
+    manifest = None
+    if args.resume_report:
+      # the histograms depend on the input files, and on the events and binning used
+      manifest = sgmanifest.ReportManifest(args.output_directory,
+                                           inputs=sgcache.cache_key(args.tree_name, args.input_filename, mode='report:' + args.backend),
+                                           settings={'nbins': 100, 'ranges': sample['ranges'] if sample else None})
+    with tracing.span('make_report'):
+      readStats = make_report(t, filtered_xAOD_Objects, directory=args.output_directory, merge_report=args.merge_report, jobs=args.jobs, sample=sample, manifest=manifest,
+                            cache_size=int(args.cache_size*1024**2), formats=args.plot_formats, render_jobs=args.render_jobs,
+                            max_rss=int(args.max_rss*1024**2), split=args.report_split)
+
+  if args.make_size_report:
+    # the sizes per event need the number of events
+    if entries is None:
+      if t is None:
+        t = open_reader(args.input_filename, args)
+      with tracing.span('count_entries'):
+        entries = t.entries()
+    with tracing.span('make_size_report'):
+      make_size_report(filtered_xAOD_Objects, directory=args.output_directory, entries=entries)
+
+  access = None
+  if args.access_used:
+    with tracing.span('make_access_report'):
+      access = make_access_report(filtered_xAOD_Objects, args.access_used, read=args.access_read, read_time=args.access_read_time, directory=args.output_directory)
+
+  # dump to file
+  with tracing.span('dump_xAOD_objects'):
+    dump_xAOD_objects(filtered_xAOD_Objects, args)
+
+  if profiled:
+    dumpSG_logger.log(25, io_summary(profiled, n=20))
+
+  if readStats:
+    dumpSG_logger.log(25, read_summary(readStats))
+
+  if access:
+    dumpSG_logger.log(25, sgaccess.summary(access, sizeof_fmt=lambda num: signed_sizeof_fmt(num, signed=False)))
+
+  return (entries, filtered_xAOD_Objects)
+
+def _query_worker(kind, item):
+  '''
+  a heavy query of an interactive session, run on the worker that keeps its own chain open, see sgquery.py
+  '''
+  if kind == 'entries':
+    return t.entries()
+  reason = undrawable_reason(item)
+  if reason:
+    raise ValueError(reason)
+  hist = t.fill_histograms([item]).get(item['rootname']) or t.draw_histogram(item)
+  if hist is None:
+    return None
+  entries, mean, rms, counts_min, counts_max = sghist.hist_stats(hist)
+  return {'entries': entries, 'mean': mean, 'rms': rms, 'xmin': hist['xmin'], 'xmax': hist['xmax']}
 
+#@echo(write=dumpSG_logger.debug)
+def interactive(args):
+  '''
+  keep the containers of the input files in memory and answer queries about them, see sgquery.py
+    - from the prompt, and from the Unix socket at args.query_socket if it is given
+    - without a terminal to prompt at, the socket is served until it is sent `shutdown`
+    - every property and attribute can be queried, whether or not it is listed with --prop/--attr,
+      but only the containers that pass the other filters
+  '''
+  entries, xAOD_Objects, t = load_xAOD_objects(args.input_filename, args, count_entries=args.count_entries)
+  views = {k: sgschema.ContainerView(v.container) for (k, v) in filter_xAOD_objects(xAOD_Objects, args).iteritems()}
+  update_sizes(views)
+
+  import multiprocessing
+  import threading
+  import sgquery
+  # the heavy queries go to a worker with its own chain, one at a time
+  pool = multiprocessing.Pool(processes=1, initializer=_init_report_worker)
+  session = sgquery.QuerySession(views, entries=entries, submit=lambda kind, argument: pool.apply_async(_query_worker, (kind, argument)))
+  sizeof = lambda num: signed_sizeof_fmt(num, signed=False)
+  server = None
   try:
-    # start execution of actual program
-    import timing
-
-    # set verbosity for python printing
-    if args.verbose < 5:
-      dumpSG_logger.setLevel(25 - args.verbose*5)
+    if args.query_socket:
+      server = sgquery.serve(session, args.query_socket)
+      dumpSG_logger.log(25, "Answering queries on {0}, e.g. dumpSG.py query {0} 'find Tau1'".format(args.query_socket))
+    if server is not None and not sys.stdin.isatty():
+      server.serve_forever()
     else:
-      dumpSG_logger.setLevel(logging.NOTSET + 1)
+      if server is not None:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+      dumpSG_logger.log(25, "{0} containers loaded, type help for the queries".format(len(views)))
+      # through STDOUT, ROOT may have redirected sys.stdout when it loaded the schema
+      sgquery.repl(session, sizeof_fmt=sizeof, stdout=STDOUT)
+  finally:
+    if server is not None:
+      server.server_close()
+      os.remove(args.query_socket)
+    pool.terminate()
+  return (entries, views)
+
+def query_main(argv):
+  parser = argparse.ArgumentParser(prog='dumpSG.py query', description='Ask a running dumpSG.py --interactive --socket about its dataset.', usage='%(prog)s SOCKET QUERY [QUERY ...] [options]')
+  parser.add_argument('socket',
+                      type=str,
+                      help='the Unix socket the session answers on, see --socket')
+  parser.add_argument('queries',
+                      type=str,
+                      nargs='+',
+                      metavar='QUERY',
+                      help='the queries to ask, each in quotes, e.g. "find Tau1" or "size AntiKt4EMTopoJets", see `help`')
+  parser.add_argument('--json',
+                      dest='as_json',
+                      action='store_true',
+                      help='Print the replies as JSON, one per line. Default: as text')
+  args = parser.parse_args(argv)
+  import sgquery
+  ok = True
+  for reply in sgquery.send(args.socket, args.queries):
+    print(json.dumps(reply, sort_keys=True) if args.as_json else sgquery.format_reply(reply, sizeof_fmt=lambda num: signed_sizeof_fmt(num, signed=False)))
+    ok = ok and 'error' not in reply
+  return ok
+
+def index_main(argv):
+  import sgindex
+  parser = argparse.ArgumentParser(prog='dumpSG.py index', description='Look up which datasets have a container, property or attribute, in an index built by dumpSG.py batch --index or from saved dumps. No ROOT file is opened.', usage='%(prog)s INDEX [PATTERN ...] [options]')
+  parser.add_argument('index_path',
+                      type=str,
+                      metavar='INDEX',
+                      help='the SQLite file of the index, see dumpSG.py batch --index')
+  parser.add_argument('patterns',
+                      type=str,
+                      nargs='*',
+                      metavar='PATTERN',
+                      help='the names to look for: with *, ? or [ a Unix filename pattern, otherwise a substring, both ignoring case. Without any, the datasets in the index are listed')
+  parser.add_argument('--add',
+                      type=str,
+                      nargs='+',
+                      default=[],
+                      metavar='DUMP',
+                      help='Add saved dumps (-f json/jsonl/pickle, with --prop --attr for the properties and attributes) to the index first. NAME=DUMP names the dataset, by default it is named after the dump, or after its directory for an info.* dump. Default: none')
+  parser.add_argument('--remove',
+                      type=str,
+                      nargs='+',
+                      default=[],
+                      metavar='NAME',
+                      help='Remove datasets from the index first. Default: none')
+  parser.add_argument('--kind',
+                      type=str,
+                      nargs='+',
+                      dest='kinds',
+                      choices=sgindex.index_kinds,
+                      default=sgindex.index_kinds,
+                      help='Only look for containers, properties (prop) and/or attributes (attr). Default: all of them')
+  parser.add_argument('-c',
+                      '--container',
+                      type=str,
+                      dest='container_pattern',
+                      help='Only the matches in the containers with a name matching this pattern. Default: any',
+                      default=None)
+  parser.add_argument('-t',
+                      '--type',
+                      type=str,
+                      dest='type_pattern',
+                      help='Only the matches with a type matching this pattern. Default: any',
+                      default=None)
+  parser.add_argument('--dataset',
+                      type=str,
+                      dest='dataset_pattern',
+                      help='Only the matches in (or, without a PATTERN, list only) the datasets with a name matching this pattern. Default: any',
+                      default=None)
+  parser.add_argument('--limit',
+                      type=int,
+                      help='Only the first matches of each pattern. Default: 0 (all of them)',
+                      default=0)
+  parser.add_argument('--json',
+                      dest='as_json',
+                      action='store_true',
+                      help='Print the matches of each pattern as JSON, one line per pattern. Default: as text')
+  args = parser.parse_args(argv)
 
-    with tempfile.NamedTemporaryFile() as tmpFile:
-      if not args.root_verbose:
-        ROOT.gSystem.RedirectOutput(tmpFile.name, "w")
+  sizeof = lambda num: signed_sizeof_fmt(num, signed=False)
+  try:
+    index = sgindex.BranchIndex(args.index_path)
+  except sgindex.BranchIndexError as e:
+    parser.error(str(e))
+  with index:
+    for name in args.remove:
+      if not index.remove(name):
+        dumpSG_logger.warning("{0} is not in the index".format(name))
+    for dump in args.add:
+      match = re.match(r'^([\w.+-]+)=(.+)$', dump)
+      if match:
+        name, dump = match.group(1), match.group(2)
+      else:
+        name = os.path.splitext(os.path.basename(dump))[0]
+        if name == 'info':
+          name = os.path.basename(os.path.dirname(os.path.abspath(dump)))
+      try:
+        xAOD_Objects = sgdiff.load_dump(dump)
+      except (IOError, ValueError) as e:
+        parser.error(str(e))
+      # e.g. a pickle of something else, or json that is not a dump at all
+      if not isinstance(xAOD_Objects, dict) or not all(isinstance(containerVals, dict) and 'type' in containerVals for containerVals in xAOD_Objects.itervalues()):
+        parser.error('`{0}` is not a dump of the containers of a dataset ({{container: {{"type": ...}}}}), it cannot be indexed.'.format(dump))
+      index.add(name, xAOD_Objects, source=dump)
+
+    if not args.patterns:
+      datasets = index.datasets(args.dataset_pattern)
+      if args.as_json:
+        print(json.dumps(datasets, sort_keys=True))
+      for dataset in datasets if not args.as_json else []:
+        print('{0:<70}{1:>6} containers{2:>8} files{3:>12} events'.format(dataset['name'], dataset['containers'], dataset['files'] if dataset['files'] is not None else '-', dataset['entries'] if dataset['entries'] is not None else '-'))
+      return True
+
+    for pattern in args.patterns:
+      start = time.time()
+      matches = index.find(pattern, kinds=args.kinds, container=args.container_pattern, dataset=args.dataset_pattern, type=args.type_pattern, limit=args.limit)
+      ms = 1000.*(time.time() - start)
+      if args.as_json:
+        print(json.dumps({'pattern': pattern, 'matches': matches, 'ms': ms}, sort_keys=True))
+      else:
+        print('{0}: {1} matches in {2} datasets ({3:.1f} ms)'.format(pattern, len(matches), len(set(match['dataset'] for match in matches)), ms))
+        print(sgindex.format_matches(matches, sizeof_fmt=sizeof))
+  return True
 
-      # if flag is shown, set batch_mode to true, else false
-      ROOT.gROOT.SetBatch(args.batch_mode)
+def dataset_name(pattern):
+  # the directory of the files (or the file), without the wildcards
+  head, tail = os.path.split(pattern.rstrip('/'))
+  if head and (any(c in tail for c in '*?[') or tail.endswith('.root')):
+    tail = os.path.basename(head)
+  return re.sub(r'[*?\[\]]', '', tail).strip('_.') or 'dataset'
+
+def expand_datasets(patterns):
+  '''
+  the (name, input files) of each dataset of a batch
+    - a pattern is a glob, a directory (of .root files) or a single file, NAME=PATTERN gives it a name
+    - datasets with the same name are told apart by a number
+  '''
+  datasets = []
+  names = set()
+  for pattern in patterns:
+    match = re.match(r'^([\w.+-]+)=(.+)$', pattern)
+    name, pattern = (match.group(1), match.group(2)) if match else (dataset_name(pattern), pattern)
+    if os.path.isdir(pattern):
+      files = sorted(glob.glob(os.path.join(pattern, '*.root')))
+    elif any(c in pattern for c in '*?['):
+      files = sorted(glob.glob(pattern))
+    else:
+      files = [pattern]
+    unique, i = name, 1
+    while unique in names:
+      i += 1
+      unique = '{0}_{1}'.format(name, i)
+    names.add(unique)
+    datasets.append((unique, files))
+  return datasets
+
+def _batch_worker(payload):
+  # the workers live for the whole batch, so ROOT (and the dictionaries) are only loaded once in each
+  global args
+  name, input_filenames, args = payload
+  result = {'name': name, 'directory': args.output_directory, 'files': len(input_filenames), 'status': 'ok', 'error': None, 'entries': None, 'containers': {}}
+  start = time.time()
+  if not os.path.exists(args.output_directory):
+    os.makedirs(args.output_directory)
+  # everything logged about the dataset also goes to its own log
+  handler = logging.FileHandler(os.path.join(args.output_directory, 'dumpSG.log'), mode='w')
+  dumpSG_logger.addHandler(handler)
+  tracing.tracer.reset()
+  try:
+    if not input_filenames:
+      raise ValueError('No input files were found for the dataset {0}.'.format(name))
+    args.input_filename = input_filenames
+    entries, xAOD_Objects = process(args)
+    if args.trace_filename:
+      tracing.tracer.write(args.trace_filename)
+    sizes = sgsizes.breakdown(xAOD_Objects, entries=entries)
+    result['entries'] = entries
+    if args.index_path:
+      # the index gets the whole of every container (with its sizes including all of its properties and attributes), it is only written by the parent
+      schema = {container: sgschema.ContainerView(view.container) for container, view in xAOD_Objects.iteritems()}
+      update_sizes(schema)
+      result['schema'] = sgschema.as_dict(schema)
+    result['containers'] = {container: {'type': containerType, 'filebytes': containerSizes['filebytes'], 'totbytes': containerSizes['totbytes']}
+                            for containerType, typeSizes in sizes['types'].iteritems() for container, containerSizes in typeSizes['containers'].iteritems()}
+  except Exception:
+    # one bad dataset does not stop the others
+    result['status'] = 'failed'
+    result['error'] = traceback.format_exc()
+    dumpSG_logger.error("{0}: failed with {1}, see {2}".format(name, result['error'].strip().splitlines()[-1], handler.baseFilename))
+    # the whole traceback only goes to the log of the dataset
+    handler.stream.write(result['error'])
+  finally:
+    dumpSG_logger.removeHandler(handler)
+    handler.close()
+  result['elapsed'] = time.time() - start
+  return result
 
-      # start by making a TChain
-      dumpSG_logger.info("Initializing TChain")
-      t = ROOT.TChain(args.tree_name)
-      for fname in args.input_filename:
-        if not fname.startswith('root://') and not os.path.isfile(fname):
-          raise ValueError('The supplied input file `{0}` does not exist or I cannot find it.'.format(fname))
-        else:
-          dumpSG_logger.info("\tAdding {0}".format(fname))
-          t.Add(fname)
+#@echo(write=dumpSG_logger.debug)
+def write_batch_summary(results, directory):
+  '''
+  the summary of a batch, next to the directories of its datasets
+    - summary.json: the status, number of files and events, time taken and error of every dataset,
+      and the on-disk and in-memory size of every container in every dataset
+    - summary.csv: the containers x datasets matrix of the on-disk sizes, largest container first
+  '''
+  names = [result['name'] for result in results]
+  matrix = {}
+  for result in results:
+    for container, sizes in result['containers'].iteritems():
+      row = matrix.setdefault(container, {'type': sizes['type'], 'datasets': {}})
+      row['datasets'][result['name']] = {'filebytes': sizes['filebytes'], 'totbytes': sizes['totbytes']}
+  with open(os.path.join(directory, 'summary.json'), 'w+') as f:
+    json.dump({'datasets': [dict((k, v) for k, v in result.iteritems() if k not in ['containers', 'schema']) for result in results], 'containers': matrix}, f, sort_keys=True, indent=4)
+
+  total = lambda row: sum(sizes['filebytes'] for sizes in row['datasets'].itervalues())
+  with open(os.path.join(directory, 'summary.csv'), 'wb') as f:
+    import csv
+    writer = csv.writer(f)
+    writer.writerow(['container', 'type'] + names)
+    for container, row in sorted(matrix.iteritems(), key=lambda (container, row): (-total(row), container.lower())):
+      writer.writerow([container, row['type']] + [row['datasets'][name]['filebytes'] if name in row['datasets'] else '' for name in names])
+  return True
 
-      # Print some information
-      dumpSG_logger.info('Number of input events: %s' % t.GetEntries())
+def batch_main(argv):
+  parser = make_parser(batch=True)
+  batch_args = parser.parse_args(argv)
+  if batch_args.interactive or batch_args.query_socket:
+    parser.error("A batch cannot be --interactive, run it on one dataset at a time.")
+  patterns = list(batch_args.input_filename)
+  if batch_args.dataset_list:
+    with open(batch_args.dataset_list) as f:
+      patterns += [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+  if not patterns:
+    parser.error("No datasets were given.")
+
+  set_verbosity(batch_args.verbose)
+  datasets = expand_datasets(patterns)
+  payloads = []
+  for name, input_filenames in datasets:
+    # every dataset is a run of its own, in its own directory
+    datasetArgs = copy.copy(batch_args)
+    datasetArgs.output_directory = os.path.join(batch_args.output_directory, name)
+    datasetArgs.output_filename = os.path.join(datasetArgs.output_directory, os.path.basename(batch_args.output_filename))
+    if batch_args.trace_filename:
+      datasetArgs.trace_filename = os.path.join(datasetArgs.output_directory, os.path.basename(batch_args.trace_filename))
+    # the workers cannot start workers of their own
+    datasetArgs.jobs = 1
+    datasetArgs.render_jobs = 0
+    payloads.append((name, input_filenames, datasetArgs))
+
+  jobs = max(1, min(batch_args.jobs, len(payloads)))
+  dumpSG_logger.log(25, "Processing {0} datasets with {1} worker(s)".format(len(payloads), jobs))
+  if not os.path.exists(batch_args.output_directory):
+    os.makedirs(batch_args.output_directory)
+
+  results = []
+  progress = lambda result: dumpSG_logger.log(25, "[{0}/{1}] {2}: {3} in {4}".format(len(results), len(payloads), result['name'], result['status'], tracing.secondsToStr(result['elapsed'])))
+  with tempfile.NamedTemporaryFile() as tmpFile:
+    # applied when (and if) ROOT gets loaded in each worker
+    root_settings['batch_mode'] = True
+    if not batch_args.root_verbose:
+      root_settings['redirect'] = tmpFile.name
+    if jobs > 1:
+      import multiprocessing
+      pool = multiprocessing.Pool(processes=jobs)
+      try:
+        # whichever finishes first, so the small datasets are not held up behind the large ones
+        for result in pool.imap_unordered(_batch_worker, payloads):
+          results.append(result)
+          progress(result)
+      finally:
+        pool.close()
+        pool.join()
+    else:
+      for payload in payloads:
+        results.append(_batch_worker(payload))
+        progress(results[-1])
+
+  # back in the order they were given
+  order = dict((name, i) for i, (name, input_filenames) in enumerate(datasets))
+  results.sort(key=lambda result: order[result['name']])
+  write_batch_summary(results, batch_args.output_directory)
+
+  if batch_args.index_path:
+    import sgindex
+    with sgindex.BranchIndex(batch_args.index_path) as index:
+      for result in results:
+        if result['status'] != 'ok': continue
+        index.add(result['name'], result.pop('schema'), entries=result['entries'], files=result['files'], source=patterns[order[result['name']]])
+    dumpSG_logger.log(25, "Added {0} datasets to the index {1}".format(sum(1 for result in results if result['status'] == 'ok'), batch_args.index_path))
+
+  failed = [result['name'] for result in results if result['status'] != 'ok']
+  dumpSG_logger.log(25, "{0} of {1} datasets done, the summary is in {2}".format(len(results) - len(failed), len(results), batch_args.output_directory))
+  if failed:
+    dumpSG_logger.error("{0} datasets failed: {1}".format(len(failed), ', '.join(failed)))
+  return not failed
 
-      # first, just build up the whole dictionary
-      xAOD_Objects = inspect_tree(t)
+if __name__ == "__main__":
+  if len(sys.argv) > 1 and sys.argv[1] == 'diff':
+    diff_main(sys.argv[2:])
+    sys.exit(0)
+  if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+    sys.exit(0 if batch_main(sys.argv[2:]) else 1)
+  if len(sys.argv) > 1 and sys.argv[1] == 'query':
+    sys.exit(0 if query_main(sys.argv[2:]) else 1)
+  if len(sys.argv) > 1 and sys.argv[1] == 'index':
+    sys.exit(0 if index_main(sys.argv[2:]) else 1)
+
+  parser = make_parser()
 
-      # next, use the filters to cut down the dictionaries for outputting
-      filtered_xAOD_Objects = filter_xAOD_objects(xAOD_Objects, args)
+  # parse the arguments, throw errors if missing any
+  args = parser.parse_args()
+  if args.query_socket and not args.interactive:
+    parser.error("--socket only makes sense with --interactive.")
 
-      update_sizes(filtered_xAOD_Objects)
+  try:
+    # start execution of actual program
+    set_verbosity(args.verbose)
 
-      # next, make a report -- add in information about mean, RMS, entries
-      if args.make_report:
-        make_report(t, filtered_xAOD_Objects, directory=args.output_directory, merge_report=args.merge_report)
+    with tempfile.NamedTemporaryFile() as tmpFile:
+      # applied when (and if) ROOT gets loaded
+      root_settings['batch_mode'] = args.batch_mode
+      if not args.root_verbose:
+        root_settings['redirect'] = tmpFile.name
 
-      if args.make_size_report:
-        make_size_report(t, filtered_xAOD_Objects, directory=args.output_directory)
+      if args.interactive:
+        entries, filtered_xAOD_Objects = interactive(args)
+      else:
+        entries, filtered_xAOD_Objects = process(args)
 
-      # dump to file
-      dump_xAOD_objects(filtered_xAOD_Objects, args)
+      if args.trace_filename:
+        tracing.tracer.write(args.trace_filename)
+        dumpSG_logger.log(25, tracing.tracer.summary(categories=['draw', 'print'], n=20))
 
-      dumpSG_logger.log(25, "All done!")
+      wall, cpu = tracing.tracer.elapsed()
+      dumpSG_logger.log(25, "All done! Elapsed time: {0} (CPU: {1})".format(tracing.secondsToStr(wall), tracing.secondsToStr(cpu)))
 
-      if not args.root_verbose:
+      if not args.root_verbose and ROOT is not None:
         ROOT.gROOT.ProcessLine("gSystem->RedirectOutput(0);")
 
   except Exception, e:
     # stop redirecting if we crash as well
-    if not args.root_verbose:
+    if not args.root_verbose and ROOT is not None:
       ROOT.gROOT.ProcessLine("gSystem->RedirectOutput(0);")
 
     dumpSG_logger.exception("{0}\nAn exception was caught!".format("-"*20))
@@ -0,0 +1,179 @@
+'''
+  Access patterns: how many of the bytes an analysis job reads it actually uses.
+
+  The access records of a job are the branches it used, and optionally the branches it
+  read (e.g. everything its TTreeCache fetched, by default every branch of the selected
+  containers, as for a job that does not select its branches). They are joined with the
+  schema by the name of the branch in the tree (rootname), and every branch and container
+  gets the bytes on disk that were read and used. The unused ones are what slimming them
+  away would save, on disk and in the time spent reading.
+
+  A record is either JSON (a list of branch names, or a dictionary keyed by them) or text
+  that is split into words, of which only the names of branches are kept. So a plain list
+  of branches works, one per line, and so does the output of
+  TTreePerfStats::PrintBasketInfo() or TTreeCache::Print("a") copied from a job log. A
+  TTreePerfStats saved to a ROOT file does not keep the names of the branches it read, so
+  print them instead. Names can be fnmatch patterns, e.g. `AntiKt4EMTopoJetsAuxDyn.*`.
+'''
+import re
+import json
+import fnmatch
+
+# what separates the words of a text record, a `.` is part of the names of the branches
+separators = re.compile(r'[\s,;:"\'`()\[\]{}<>=|]+')
+
+def load_records(path):
+  '''
+  the branch names (or patterns) in an access record
+  '''
+  with open(path) as f:
+    content = f.read()
+  try:
+    records = json.loads(content)
+  except ValueError:
+    records = None
+  if isinstance(records, (list, dict)):
+    return [str(name) for name in records]
+  names = []
+  for line in content.splitlines():
+    # a `#` starts a comment, it is never part of the name of a branch
+    names.extend(word for word in separators.split(line.split('#')[0]) if word)
+  return names
+
+def match(records, names):
+  '''
+  the names matched by the records, and the records that look like branches but did not match any of them
+    - a record matches a name exactly, also without a trailing `.` (the end of a sentence in a log)
+    - records with *, ? or [ are fnmatch patterns
+    - the other words of a job log are not branches, only records with a `.` in them (as in `Aux.`) are reported
+  '''
+  names = set(names)
+  matched, unmatched = set(), []
+  for record in records:
+    if record in names:
+      matched.add(record)
+    elif record.rstrip('.') in names:
+      matched.add(record.rstrip('.'))
+    elif any(c in record for c in '*?['):
+      found = fnmatch.filter(names, record)
+      matched.update(found)
+      if not found: unmatched.append(record)
+    elif '.' in record.rstrip('.'):
+      unmatched.append(record)
+  return matched, unmatched
+
+def container_names(container):
+  # the interface and Aux. branches of a container, the ones without a property or attribute
+  return [container, container + 'Aux.']
+
+def wall(item):
+  io = item.get('io')
+  return io['wall'] if io else None
+
+def access_report(xAOD_Objects, used, read=None, read_time=None):
+  '''
+  join the access records with the containers, see load_records()
+    - used (and read) are lists of records, every branch of the containers is read if read is None
+    - the interface and Aux. branches of a container are used as soon as any of its branches are,
+      the container cannot be read without them
+    - read_time is the time the job spent reading, which is projected onto the bytes it used
+    - if the branches were profiled (see dumpSG.io_profile()), their read times are projected as well
+  returns a dictionary with the bytes of all the containers (filebytes), the ones read, used and
+  unused, the projected size once the unused branches are slimmed away, the records that did not
+  match any branch, and all of this per container and branch
+  '''
+  branchNames = set()
+  for container, containerVals in xAOD_Objects.iteritems():
+    underlying = getattr(containerVals, 'container', containerVals)
+    branchNames.update(container_names(container))
+    branchNames.update(item['rootname'] for item in underlying.get('prop', [])+underlying.get('attr', []))
+
+  usedNames, unmatchedUsed = match(used, branchNames)
+  if read is None:
+    readNames, unmatchedRead = set(branchNames), []
+  else:
+    readNames, unmatchedRead = match(read, branchNames)
+  # a branch that was used was also read, whatever the records say
+  notRead = sorted(usedNames - readNames)
+  readNames |= usedNames
+
+  report = {'filebytes': 0, 'read': 0, 'used': 0, 'unused': 0, 'wall_read': 0., 'wall_used': 0., 'profiled': False,
+            'unmatched': {'used': unmatchedUsed, 'read': unmatchedRead}, 'used_not_read': notRead, 'containers': {}}
+  for container, containerVals in xAOD_Objects.iteritems():
+    underlying = getattr(containerVals, 'container', containerVals)
+    node = {'type': underlying.get('type', ''), 'filebytes': 0, 'read': 0, 'used': 0, 'unused': 0, 'branches': {}}
+    for item in underlying.get('prop', [])+underlying.get('attr', []):
+      isRead, isUsed = item['rootname'] in readNames, item['rootname'] in usedNames
+      node['branches'][item['rootname']] = {'filebytes': item['filebytes'], 'read': isRead, 'used': isUsed, 'wall': wall(item)}
+      node['filebytes'] += item['filebytes']
+      node['read'] += item['filebytes'] if isRead else 0
+      node['used'] += item['filebytes'] if isUsed else 0
+      if wall(item) is not None:
+        report['profiled'] = True
+        report['wall_read'] += wall(item) if isRead else 0.
+        report['wall_used'] += wall(item) if isUsed else 0.
+
+    names = container_names(container)
+    interface = {'filebytes': underlying.get('filebytes', 0),
+                 'read': any(name in readNames for name in names) or node['read'] > 0,
+                 'used': any(name in usedNames for name in names) or node['used'] > 0}
+    node['interface'] = interface
+    node['filebytes'] += interface['filebytes']
+    node['read'] += interface['filebytes'] if interface['read'] else 0
+    node['used'] += interface['filebytes'] if interface['used'] else 0
+    node['unused'] = node['read'] - node['used']
+    report['containers'][container] = node
+    for key in ['filebytes', 'read', 'used', 'unused']:
+      report[key] += node[key]
+
+  # slimming keeps what was used, and the time spent reading goes down with the bytes read
+  report['slimmed'] = report['used']
+  report['read_time'] = read_time
+  report['projected_read_time'] = read_time*report['used']/report['read'] if read_time is not None and report['read'] else None
+  return report
+
+def by_unused(children):
+  # the most to gain first, then by name so that the order is stable
+  return sorted(children.iteritems(), key=lambda (name, node): (-node['unused'], name.lower()))
+
+def write_json(report, f):
+  json.dump(report, f, sort_keys=True, indent=4)
+
+def summary(report, sizeof_fmt=str):
+  '''
+  a few lines with the totals and the projections
+  '''
+  fraction = lambda num, den: 100.*num/den if den else 0.
+  lines = ['Read {0} of {1} ({2:.1f}%), used {3} of it ({4:.1f}%), {5} were read but not used'.format(
+             sizeof_fmt(report['read']), sizeof_fmt(report['filebytes']), fraction(report['read'], report['filebytes']),
+             sizeof_fmt(report['used']), fraction(report['used'], report['read']), sizeof_fmt(report['unused'])),
+           'Slimming away the unused branches: {0} instead of {1} on disk ({2:.1f}% smaller)'.format(
+             sizeof_fmt(report['slimmed']), sizeof_fmt(report['filebytes']), 100. - fraction(report['slimmed'], report['filebytes']))]
+  if report['projected_read_time'] is not None:
+    lines.append('Projected read time: {0:.1f}s instead of {1:.1f}s, scaled by the bytes read'.format(report['projected_read_time'], report['read_time']))
+  if report['profiled']:
+    lines.append('Projected read time from --io-profile: {0:.3f}s instead of {1:.3f}s'.format(report['wall_used'], report['wall_read']))
+  unmatched = report['unmatched']['used'] + report['unmatched']['read']
+  if unmatched:
+    lines.append('{0} records did not match any branch, e.g. {1}'.format(len(unmatched), ', '.join(unmatched[:5])))
+  if report['used_not_read']:
+    lines.append('{0} branches were used but not read, they are counted as read, e.g. {1}'.format(len(report['used_not_read']), ', '.join(report['used_not_read'][:5])))
+  return '\n'.join(lines)
+
+def write_table(report, f, sizeof_fmt=str):
+  '''
+  the containers and the branches that were read, the most bytes read but not used first
+  '''
+  f.write(summary(report, sizeof_fmt) + '\n\n')
+  f.write('{0:<70}{1:>14}{2:>14}{3:>14}{4:>10}\n'.format('container / branch', 'read', 'used', 'unused', 'wall'))
+  fmtWall = lambda value: '{0:.3f}s'.format(value) if value is not None else '-'
+  for container, node in by_unused(report['containers']):
+    if not node['read']: continue
+    f.write('{0:<70}{1:>14}{2:>14}{3:>14}{4:>10}\n'.format('{0} ({1})'.format(container, node['type']), sizeof_fmt(node['read']),
+                                                          sizeof_fmt(node['used']), sizeof_fmt(node['unused']), ''))
+    branches = [(rootname, branch) for rootname, branch in node['branches'].iteritems() if branch['read']]
+    for rootname, branch in sorted(branches, key=lambda (rootname, branch): (branch['used'], -branch['filebytes'], rootname.lower())):
+      f.write('{0:<70}{1:>14}{2:>14}{3:>14}{4:>10}\n'.format('  ' + rootname, sizeof_fmt(branch['filebytes']),
+                                                            sizeof_fmt(branch['filebytes'] if branch['used'] else 0),
+                                                            sizeof_fmt(0 if branch['used'] else branch['filebytes']),
+                                                            fmtWall(branch['wall'])))
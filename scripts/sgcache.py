@@ -0,0 +1,121 @@
+'''
+  A persistent, size-bounded cache of the raw inspect_tree() output.
+
+  Entries are keyed by the tree name and, for every input file, its path, size, mtime
+  and the UUID stored in its TFile header. The UUID is read straight out of the header
+  so that a cache hit never needs ROOT. Entries are zlib-compressed pickles, one file
+  per entry, and the least recently used entries are evicted when the cache grows
+  beyond its size limit.
+'''
+import os
+import struct
+import binascii
+import hashlib
+import zlib
+import tempfile
+import logging
+try:
+  import cPickle as pickle
+except:
+  import pickle
+
+logger = logging.getLogger("dumpSG.cache")
+
+# bump this whenever the structure returned by inspect_tree() changes
+CACHE_VERSION = 2
+
+default_directory = os.environ.get('XAODDUMPER_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'xAODDumper'))
+default_max_bytes = 256*1024**2
+
+def read_root_uuid(fname):
+  '''
+  read the UUID out of the TFile header without ROOT, see TFile::WriteHeader()
+    - small files (version < 1000000) use 4-byte seek pointers, large files use 8-byte ones
+    - the UUID is written as a 2-byte version followed by 16 bytes
+  '''
+  with open(fname, 'rb') as f:
+    header = f.read(80)
+  if len(header) < 80 or header[:4] != b'root':
+    return None
+  version, = struct.unpack('>i', header[4:8])
+  offset = 45 if version < 1000000 else 57
+  return binascii.hexlify(header[offset+2:offset+18]).decode('ascii')
+
+def file_fingerprint(fname):
+  '''
+  (path, size, mtime, uuid) of a local file, None for remote files which we cannot stat cheaply
+  and for missing files, which are reported when they get opened
+  '''
+  if fname.startswith('root://') or not os.path.isfile(fname):
+    return None
+  stat = os.stat(fname)
+  return (os.path.abspath(fname), stat.st_size, int(stat.st_mtime), read_root_uuid(fname))
+
+def cache_key(tree_name, input_filenames, mode=''):
+  '''
+  a key for the chain over the input files, None if the chain cannot be cached
+    - mode distinguishes different ways of inspecting the same files
+  '''
+  fingerprints = []
+  for fname in input_filenames:
+    fingerprint = file_fingerprint(fname)
+    if fingerprint is None:
+      return None
+    fingerprints.append(fingerprint)
+  return hashlib.sha1(repr((CACHE_VERSION, mode, tree_name, fingerprints)).encode('utf-8')).hexdigest()
+
+class SchemaCache(object):
+  def __init__(self, directory=default_directory, max_bytes=default_max_bytes):
+    self.directory = directory
+    self.max_bytes = max_bytes
+
+  def path(self, key):
+    return os.path.join(self.directory, '{0}.pkz'.format(key))
+
+  def get(self, key):
+    '''
+    the cached value for the key, None on a miss
+    '''
+    path = self.path(key)
+    try:
+      with open(path, 'rb') as f:
+        value = pickle.loads(zlib.decompress(f.read()))
+    except (IOError, OSError):
+      logger.info("Schema cache miss for {0}".format(key))
+      return None
+    except Exception:
+      logger.warning("Schema cache entry {0} is corrupt, ignoring it.".format(path))
+      return None
+    # touch it, the mtime is what we use for the LRU eviction
+    try:
+      os.utime(path, None)
+    except OSError:
+      pass
+    logger.info("Schema cache hit for {0}".format(key))
+    return value
+
+  def put(self, key, value):
+    '''
+    store the value for the key, then evict the least recently used entries if needed
+    '''
+    if not os.path.isdir(self.directory):
+      os.makedirs(self.directory)
+    # write then rename, so that concurrent runs never read a partial entry
+    fd, tmpPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+      f.write(zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+    os.rename(tmpPath, self.path(key))
+    self.evict()
+
+  def evict(self):
+    entries = []
+    for fname in os.listdir(self.directory):
+      if not fname.endswith('.pkz'): continue
+      stat = os.stat(os.path.join(self.directory, fname))
+      entries.append((stat.st_mtime, stat.st_size, fname))
+    total = sum(size for mtime, size, fname in entries)
+    for mtime, size, fname in sorted(entries):
+      if total <= self.max_bytes: break
+      logger.info("Evicting {0} from the schema cache".format(fname))
+      os.remove(os.path.join(self.directory, fname))
+      total -= size
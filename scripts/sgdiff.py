@@ -0,0 +1,94 @@
+'''
+  Differences between the StoreGate structure of two datasets.
+
+  Either side is the dictionary of xAOD objects, as dumped with -f json/jsonl/pickle (or the
+  info.json of a report), so old baselines can be compared against without reading any ROOT
+  file. The sizes are the ones written by update_sizes(), i.e. a container includes its
+  properties and attributes. Properties and attributes are only compared if both sides list
+  them: a dump written without --prop/--attr is compared with a ROOT file, which always lists
+  everything, on its containers and sizes only.
+'''
+import json
+try:
+  import cPickle as pickle
+except:
+  import pickle
+
+def load_dump(path):
+  '''
+  read a dump written by dump_xAOD_objects() in the json, jsonl or pickle format
+  '''
+  with open(path, 'rb') as f:
+    content = f.read()
+  try:
+    xAOD_Objects = json.loads(content)
+  except ValueError:
+    xAOD_Objects = None
+  # a jsonl dump of a single container is a json object too, but one with a container name in it
+  if isinstance(xAOD_Objects, dict) and not isinstance(xAOD_Objects.get('container'), basestring):
+    return xAOD_Objects
+  try:
+    xAOD_Objects = {}
+    for line in content.splitlines():
+      if not line.strip(): continue
+      containerVals = json.loads(line)
+      xAOD_Objects[containerVals.pop('container')] = containerVals
+    return xAOD_Objects
+  except (ValueError, KeyError, AttributeError, TypeError):
+    pass
+  try:
+    return pickle.loads(content)
+  except Exception:
+    raise ValueError('`{0}` is not a json, jsonl or pickle dump of dumpSG.py (the pretty format cannot be read back).'.format(path))
+
+def branches(containerVals, kinds=['prop', 'attr']):
+  '''
+  (kind, name) -> type of the properties and attributes of the given kinds that were dumped
+  '''
+  return dict(((kind, item['name']), item['type']) for kind in kinds for item in containerVals.get(kind, []))
+
+def size_delta(a, b, key, entries):
+  sizes = {'a': a.get(key, 0), 'b': b.get(key, 0)}
+  sizes['delta'] = sizes['b'] - sizes['a']
+  if entries[0] and entries[1]:
+    sizes['a_per_event'] = float(sizes['a'])/entries[0]
+    sizes['b_per_event'] = float(sizes['b'])/entries[1]
+    sizes['delta_per_event'] = sizes['b_per_event'] - sizes['a_per_event']
+  return sizes
+
+def diff_xAOD_objects(a, b, entries=(None, None)):
+  '''
+  compare two dictionaries of xAOD objects, going from a to b
+    - added/removed: the containers only in b/a, with their types
+    - retyped: container -> [type in a, type in b]
+    - changed: container -> {'added', 'removed', 'retyped'} for the properties and attributes of
+      the containers in both, as lists of {'kind', 'name', 'type'} (or 'from' and 'to' if retyped)
+    - not_compared: the kinds (prop, attr) only one side listed for some of the containers in both,
+      these are not compared rather than all reported as added or removed
+    - sizes: container -> {'filebytes', 'totbytes'} with the sizes in a, b and their difference,
+      also per event if the number of events of both sides is given
+  '''
+  diff = {'added': {}, 'removed': {}, 'retyped': {}, 'changed': {}, 'sizes': {}, 'entries': list(entries)}
+  notCompared = set()
+  for container in set(a) | set(b):
+    containerA, containerB = a.get(container), b.get(container)
+    if containerA is None:
+      diff['added'][container] = containerB.get('type', '')
+    elif containerB is None:
+      diff['removed'][container] = containerA.get('type', '')
+    else:
+      if containerA.get('type') != containerB.get('type'):
+        diff['retyped'][container] = [containerA.get('type'), containerB.get('type')]
+      # a dump only has the kinds it was written with, see dump_xAOD_objects()
+      kinds = [kind for kind in ['prop', 'attr'] if kind in containerA and kind in containerB]
+      notCompared.update(kind for kind in ['prop', 'attr'] if (kind in containerA) != (kind in containerB))
+      branchesA, branchesB = branches(containerA, kinds), branches(containerB, kinds)
+      changes = {'added': [{'kind': kind, 'name': name, 'type': branchesB[(kind, name)]} for (kind, name) in sorted(set(branchesB) - set(branchesA))],
+                 'removed': [{'kind': kind, 'name': name, 'type': branchesA[(kind, name)]} for (kind, name) in sorted(set(branchesA) - set(branchesB))],
+                 'retyped': [{'kind': kind, 'name': name, 'from': branchesA[(kind, name)], 'to': branchesB[(kind, name)]}
+                             for (kind, name) in sorted(set(branchesA) & set(branchesB)) if branchesA[(kind, name)] != branchesB[(kind, name)]]}
+      if any(changes.values()):
+        diff['changed'][container] = changes
+    diff['sizes'][container] = dict((key, size_delta(containerA or {}, containerB or {}, key, entries)) for key in ['filebytes', 'totbytes'])
+  diff['not_compared'] = sorted(notCompared)
+  return diff
@@ -0,0 +1,181 @@
+'''
+  Histograms as plain dictionaries, and how to fill them without ROOT.
+
+  A histogram is passed around as a dictionary (see hist_to_dict() in dumpSG.py):
+    - nbins, xmin, xmax: the binning
+    - contents: the bin contents, including the underflow and overflow bins
+    - entries: the number of entries
+    - stats: the TH1::GetStats() array [sumw, sumw2, sumwx, sumwx2]
+  so that it can be pickled, written to JSON and drawn later with or without ROOT.
+'''
+import sys
+
+def is_numpy_array(values):
+  '''
+  whether values is a NumPy array, without importing NumPy: there can only be one once it was imported
+  '''
+  numpy = sys.modules.get('numpy')
+  return numpy is not None and isinstance(values, numpy.ndarray)
+
+# what TH1::GetMinimum()/GetMaximum() start from
+FLT_MAX = 3.4028234663852886e+38
+
+def hist_stats(hist):
+  '''
+  (entries, mean, rms, counts_min, counts_max) of a histogram dictionary, computed exactly like
+  TH1::GetEntries(), GetMean(), GetRMS(), GetMinimum(0) and GetMaximum() do
+  '''
+  sumw, sumw2, sumwx, sumwx2 = hist['stats']
+  if sumw == 0:
+    mean, rms = 0.0, 0.0
+  else:
+    mean = sumwx/sumw
+    rms = abs(sumwx2/sumw - mean*mean)**0.5
+  counts = hist['contents'][1:hist['nbins']+1]
+  counts_min = min([count for count in counts if count > 0] or [FLT_MAX])
+  counts_max = max(counts or [-FLT_MAX])
+  return (hist['entries'], mean, rms, counts_min, counts_max)
+
+def stat_errors(hist):
+  '''
+  (mean_error, rms_error) of a histogram dictionary, like TH1::GetMeanError() and GetRMSError()
+    - these are statistical only, and assume the values are independent of each other
+  '''
+  entries, mean, rms, counts_min, counts_max = hist_stats(hist)
+  sumw, sumw2 = hist['stats'][:2]
+  # the effective number of entries, which is the number of entries for unweighted histograms
+  neff = sumw*sumw/sumw2 if sumw2 > 0 else 0.
+  if neff == 0:
+    return (0.0, 0.0)
+  return (rms/neff**0.5, rms/(2*neff)**0.5)
+
+def flatten(values):
+  '''
+  flatten nested sequences (one per event, for vector<> branches) into a flat list of numbers
+  '''
+  flat = []
+  for value in values:
+    if hasattr(value, '__len__') and not isinstance(value, str):
+      flat.extend(flatten(value))
+    else:
+      flat.append(value)
+  return flat
+
+class Histogram(object):
+  '''
+  a 1D histogram with the statistics of a TH1, filled from chunks of values
+    - the range is set from the first chunk that has any values, like TTree::Draw does from its
+      first entries; later values outside of it go into the underflow/overflow bins
+    - limits is a (xmin, xmax) range to use instead, e.g. from common_range()
+    - the statistics use every value (like RDataFrame does), so the mean and rms are exact
+  '''
+  def __init__(self, nbins=100, limits=None):
+    self.nbins = nbins
+    self.xmin, self.xmax = 0.0, 0.0
+    self.contents = [0.0]*(nbins+2)
+    self.entries = 0
+    self.stats = [0.0]*4
+    self.fixed = limits is not None
+    if self.fixed:
+      self.set_range(*limits)
+
+  def set_range(self, xmin, xmax):
+    if xmin == xmax:
+      xmin, xmax = xmin - 1, xmax + 1
+    self.xmin, self.xmax = float(xmin), float(xmax)
+
+  def fill(self, values):
+    if is_numpy_array(values):
+      return self.fill_numpy(values)
+    values = [float(value) for value in values]
+    if not values:
+      return
+    if self.entries == 0 and not self.fixed:
+      self.set_range(min(values), max(values))
+
+    xmin, xmax, nbins = self.xmin, self.xmax, self.nbins
+    scale = nbins/(xmax - xmin)
+    contents = self.contents
+    for value in values:
+      if value < xmin:
+        contents[0] += 1
+      elif value > xmax:
+        contents[nbins+1] += 1
+      else:
+        # the upper edge belongs to the last bin
+        contents[min(int((value - xmin)*scale), nbins-1) + 1] += 1
+    self.entries += len(values)
+    self.stats[0] += len(values)
+    self.stats[1] += len(values)
+    self.stats[2] += sum(values)
+    self.stats[3] += sum(value*value for value in values)
+
+  def fill_numpy(self, values):
+    import numpy
+    values = numpy.asarray(values, dtype='float64').ravel()
+    if values.size == 0:
+      return
+    if self.entries == 0 and not self.fixed:
+      self.set_range(values.min(), values.max())
+
+    inside = values[(values >= self.xmin) & (values <= self.xmax)]
+    counts, edges = numpy.histogram(inside, bins=self.nbins, range=(self.xmin, self.xmax))
+    for i, count in enumerate(counts):
+      self.contents[i+1] += float(count)
+    self.contents[0] += float((values < self.xmin).sum())
+    self.contents[self.nbins+1] += float((values > self.xmax).sum())
+    self.entries += int(values.size)
+    self.stats[0] += float(values.size)
+    self.stats[1] += float(values.size)
+    self.stats[2] += float(values.sum())
+    self.stats[3] += float((values*values).sum())
+
+  def to_dict(self):
+    return {'nbins': self.nbins,
+            'xmin': self.xmin,
+            'xmax': self.xmax,
+            'contents': list(self.contents),
+            'entries': self.entries,
+            'stats': list(self.stats)}
+
+def value_range(values):
+  '''
+  the (min, max) of a chunk of values (a list or a numpy array), None if it is empty
+  '''
+  if is_numpy_array(values):
+    values = values.astype('float64').ravel()
+    return (float(values.min()), float(values.max())) if values.size else None
+  values = [float(value) for value in values]
+  return (min(values), max(values)) if values else None
+
+def common_range(vmin, vmax, nbins=100):
+  '''
+  the (xmin, xmax) range of histograms that have to hold every value from vmin to vmax, e.g. all
+  of the partial histograms of a branch, see merge()
+    - xmax is a thousandth of a bin above vmax, so that vmax goes into the last bin with ROOT too
+      (a TH1 puts a value on its upper edge into the overflow bin)
+  '''
+  if vmin == vmax:
+    return (vmin - 1., vmax + 1.)
+  return (float(vmin), vmax + (vmax - vmin)/nbins*1e-3)
+
+def merge(hists):
+  '''
+  merge the partial histograms of a branch, filled from different events with the same bins
+    - the contents and entries are the ones of a single histogram of all of the events with these
+      bins, the statistics are added up in the order of the events so the mean and rms are too, up
+      to the rounding of the sums
+    - None are left out, returns None if there is nothing to merge
+  '''
+  hists = [hist for hist in hists if hist is not None]
+  if not hists:
+    return None
+  base = hists[0]
+  merged = {'nbins': base['nbins'], 'xmin': base['xmin'], 'xmax': base['xmax'], 'contents': [0.0]*(base['nbins']+2), 'entries': 0, 'stats': [0.0]*4}
+  for hist in hists:
+    if (hist['nbins'], hist['xmin'], hist['xmax']) != (base['nbins'], base['xmin'], base['xmax']):
+      raise ValueError('cannot merge histograms with different bins: {0} and {1}'.format((base['nbins'], base['xmin'], base['xmax']), (hist['nbins'], hist['xmin'], hist['xmax'])))
+    merged['contents'] = [total + content for total, content in zip(merged['contents'], hist['contents'])]
+    merged['entries'] += hist['entries']
+    merged['stats'] = [total + value for total, value in zip(merged['stats'], hist['stats'])]
+  return merged
@@ -0,0 +1,210 @@
+'''
+  An index of the containers, properties and attributes of many datasets, see dumpSG.py index.
+
+  Finding which datasets carry a given attribute used to mean dumping each of them again.
+  The index keeps the structure of every dataset added to it (from dumpSG.py batch --index,
+  or from saved json/jsonl/pickle dumps) in a single SQLite file, so the lookups never open
+  a ROOT file.
+
+  Every distinct name is stored once, in the names table, next to its lowercased form. A
+  query only matches its pattern against these names (a few ten thousand, however many
+  datasets there are), and then follows the index on the name to the containers and
+  branches of every dataset that have it. The branches are stored in the order of their
+  name, so all of the datasets having a branch are read in one go.
+
+  A pattern is matched like the queries of dumpSG.py --interactive: with *, ? or [ as a
+  Unix filename pattern, otherwise as a substring, both ignoring case.
+'''
+import time
+import logging
+import sqlite3
+
+logger = logging.getLogger("dumpSG.index")
+
+# bump this whenever the tables change, an index of another version has to be built again
+INDEX_VERSION = 1
+
+schema = '''
+  CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT);
+  CREATE TABLE IF NOT EXISTS datasets (id INTEGER PRIMARY KEY, name TEXT UNIQUE, source TEXT, files INTEGER, entries INTEGER, indexed REAL);
+  CREATE TABLE IF NOT EXISTS names (id INTEGER PRIMARY KEY, name TEXT UNIQUE, folded TEXT);
+  CREATE TABLE IF NOT EXISTS containers (id INTEGER PRIMARY KEY, dataset INTEGER, name INTEGER, type TEXT, filebytes INTEGER, totbytes INTEGER);
+  CREATE TABLE IF NOT EXISTS branches (name INTEGER, container INTEGER, kind TEXT, type TEXT, rootname TEXT, filebytes INTEGER, totbytes INTEGER,
+                                        PRIMARY KEY (name, container, kind)) WITHOUT ROWID;
+  CREATE INDEX IF NOT EXISTS containers_by_name ON containers (name);
+  CREATE INDEX IF NOT EXISTS containers_by_dataset ON containers (dataset);
+  CREATE INDEX IF NOT EXISTS branches_by_container ON branches (container);
+'''
+
+index_kinds = ['container', 'prop', 'attr']
+
+class BranchIndexError(Exception):
+  pass
+
+def match_clause(column, pattern):
+  '''
+  (SQL condition, parameter) matching the column against the pattern, see matches() in sgquery.py
+    - the column has to be lowercased already, SQLite's GLOB is case sensitive
+  '''
+  if any(c in pattern for c in '*?['):
+    # fnmatch negates a set with [!...], SQLite with [^...]
+    return ('{0} GLOB ?'.format(column), pattern.lower().replace('[!', '[^'))
+  return ('instr({0}, ?) > 0'.format(column), pattern.lower())
+
+class BranchIndex(object):
+  '''
+  the index in the SQLite file at path, created if it does not exist
+  '''
+
+  def __init__(self, path):
+    self.path = path
+    self.db = sqlite3.connect(path)
+    self.db.row_factory = sqlite3.Row
+    # the index is only ever written by one process at a time, and can always be built again
+    self.db.execute('PRAGMA synchronous = OFF')
+    self.db.executescript(schema)
+    row = self.db.execute("SELECT value FROM info WHERE key = 'version'").fetchone()
+    if row is None:
+      with self.db:
+        self.db.execute("INSERT INTO info VALUES ('version', ?)", (str(INDEX_VERSION),))
+    elif int(row['value']) != INDEX_VERSION:
+      raise BranchIndexError('{0} is an index of version {1}, this is version {2}: build it again'.format(path, row['value'], INDEX_VERSION))
+    self._names = {}
+
+  def close(self):
+    self.db.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def name_ids(self, names):
+    '''
+    the id of each of the names, adding the ones that are not in the index yet
+    '''
+    missing = [name for name in set(names) if name not in self._names]
+    if missing:
+      self.db.executemany('INSERT OR IGNORE INTO names (name, folded) VALUES (?, ?)', ((name, name.lower()) for name in missing))
+      # looked up in chunks, SQLite has a limit on the number of parameters of a statement
+      for i in range(0, len(missing), 500):
+        chunk = missing[i:i+500]
+        self._names.update(tuple(row) for row in self.db.execute('SELECT name, id FROM names WHERE name IN ({0})'.format(','.join('?'*len(chunk))), chunk))
+    return self._names
+
+  def add(self, name, xAOD_Objects, entries=None, files=None, source=''):
+    '''
+    add a dataset (the dictionary of its containers, as dumped), replacing any dataset of the same name
+      - the sizes of a container are the ones of the dump, i.e. including its properties and attributes
+    '''
+    with self.db:
+      self._delete(name)
+      dataset = self.db.execute('INSERT INTO datasets (name, source, files, entries, indexed) VALUES (?, ?, ?, ?, ?)',
+                                (name, source, files, entries, time.time())).lastrowid
+      ids = self.name_ids(list(xAOD_Objects) + [item['name'] for containerVals in xAOD_Objects.itervalues() for kind in ['prop', 'attr'] for item in containerVals.get(kind, [])])
+      branches = []
+      for container, containerVals in xAOD_Objects.iteritems():
+        containerId = self.db.execute('INSERT INTO containers (dataset, name, type, filebytes, totbytes) VALUES (?, ?, ?, ?, ?)',
+                                      (dataset, ids[container], containerVals['type'], containerVals.get('filebytes', 0), containerVals.get('totbytes', 0))).lastrowid
+        branches.extend((ids[item['name']], containerId, kind, item['type'], item['rootname'], item.get('filebytes', 0), item.get('totbytes', 0))
+                        for kind in ['prop', 'attr'] for item in containerVals.get(kind, []))
+      self.db.executemany('INSERT OR REPLACE INTO branches VALUES (?, ?, ?, ?, ?, ?, ?)', branches)
+    logger.info("Indexed {0}: {1} containers and {2} properties and attributes".format(name, len(xAOD_Objects), len(branches)))
+    return dataset
+
+  def remove(self, name):
+    '''
+    remove a dataset, returns whether it was in the index
+    '''
+    with self.db:
+      return self._delete(name)
+
+  def _delete(self, name):
+    row = self.db.execute('SELECT id FROM datasets WHERE name = ?', (name,)).fetchone()
+    if row is None:
+      return False
+    self.db.execute('DELETE FROM branches WHERE container IN (SELECT id FROM containers WHERE dataset = ?)', (row['id'],))
+    self.db.execute('DELETE FROM containers WHERE dataset = ?', (row['id'],))
+    self.db.execute('DELETE FROM datasets WHERE id = ?', (row['id'],))
+    return True
+
+  def datasets(self, pattern=None):
+    '''
+    the datasets in the index, with their number of containers
+    '''
+    query = 'SELECT d.name, d.source, d.files, d.entries, d.indexed, COUNT(c.id) AS containers FROM datasets d LEFT JOIN containers c ON c.dataset = d.id'
+    params = []
+    if pattern:
+      clause, param = match_clause('lower(d.name)', pattern)
+      query += ' WHERE ' + clause
+      params.append(param)
+    query += ' GROUP BY d.id ORDER BY lower(d.name)'
+    return [dict(zip(row.keys(), row)) for row in self.db.execute(query, params)]
+
+  def find(self, pattern, kinds=index_kinds, container=None, dataset=None, type=None, limit=None):
+    '''
+    the containers, properties and attributes with a name matching the pattern, in every dataset
+      - kinds restricts them to containers, properties (prop) and/or attributes (attr)
+      - container, dataset and type are patterns the matches also have to match
+      - a match is a dictionary with the dataset and its number of events, the container, the kind,
+        name, type and sizes, and the name in the tree of a property or attribute
+    '''
+    if not pattern:
+      raise BranchIndexError('a pattern is needed')
+    # the pattern is only matched against the distinct names, the rest follows their index
+    clause, param = match_clause('folded', pattern)
+    names = 'SELECT id FROM names WHERE {0}'.format(clause)
+    selects = []
+    params = []
+    if 'container' in kinds:
+      selects.append('''SELECT d.name AS dataset, d.entries AS entries, n.name AS container, 'container' AS kind, n.name AS name,
+                               c.type AS type, NULL AS rootname, c.filebytes AS filebytes, c.totbytes AS totbytes
+                        FROM containers c JOIN names n ON n.id = c.name JOIN datasets d ON d.id = c.dataset
+                        WHERE c.name IN ({0})'''.format(names))
+      params.append(param)
+    branchKinds = [kind for kind in kinds if kind in ['prop', 'attr']]
+    if branchKinds:
+      selects.append('''SELECT d.name AS dataset, d.entries AS entries, cn.name AS container, b.kind AS kind, n.name AS name,
+                               b.type AS type, b.rootname AS rootname, b.filebytes AS filebytes, b.totbytes AS totbytes
+                        FROM branches b JOIN names n ON n.id = b.name JOIN containers c ON c.id = b.container
+                             JOIN names cn ON cn.id = c.name JOIN datasets d ON d.id = c.dataset
+                        WHERE b.name IN ({0}) AND b.kind IN ({1})'''.format(names, ','.join('?'*len(branchKinds))))
+      params.extend([param] + branchKinds)
+    if not selects:
+      raise BranchIndexError('no kind to look for, the kinds are {0}'.format(', '.join(index_kinds)))
+
+    query = 'SELECT * FROM ({0})'.format(' UNION ALL '.join(selects))
+    conditions = []
+    for column, value in [('container', container), ('dataset', dataset), ('type', type)]:
+      if value:
+        clause, param = match_clause('lower({0})'.format(column), value)
+        conditions.append(clause)
+        params.append(param)
+    if conditions:
+      query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY lower(name), kind, lower(container), type, lower(dataset)'
+    if limit:
+      query += ' LIMIT {0:d}'.format(limit)
+    return [dict(zip(row.keys(), row)) for row in self.db.execute(query, params)]
+
+def format_matches(matches, sizeof_fmt=str):
+  '''
+  the matches of find() as text, grouped by container and name, with the datasets having each of them
+  '''
+  key = lambda match: (match['kind'], match['container'], match['name'], match['type'])
+  datasets = {}
+  for match in matches:
+    datasets[key(match)] = datasets.get(key(match), 0) + 1
+  lines = []
+  current = None
+  for match in matches:
+    if key(match) != current:
+      current = key(match)
+      lines.append('{0:<10}{1:<60}{2:<30}in {3} dataset{4}'.format(match['kind'], match['name'] if match['kind'] == 'container' else '{0}.{1}'.format(match['container'], match['name']),
+                                                                    match['type'], datasets[current], '' if datasets[current] == 1 else 's'))
+    line = '    {0:<66}{1:>12} on disk'.format(match['dataset'], sizeof_fmt(match['filebytes']))
+    if match['entries']:
+      line += ', {0}/event'.format(sizeof_fmt(float(match['filebytes'])/match['entries']))
+    lines.append(line)
+  return '\n'.join(lines) if lines else '  (nothing)'
@@ -0,0 +1,101 @@
+'''
+  The manifest of a report, so that it can be resumed or updated instead of redone.
+
+  For every branch it keeps a fingerprint of its inputs (the input files, the branch and
+  its type, and the events and binning used), the histogram it was filled into, and the
+  statistics save_plot() worked out once it was drawn. The manifest is a JSON Lines file
+  in the report directory that is only ever appended to while the report runs, one line
+  per batch of branches, so a report that crashes keeps everything finished up to that
+  point. Later lines replace earlier ones, and the file is rewritten without the
+  replaced lines once the report is done.
+'''
+import os
+import json
+import hashlib
+import tempfile
+import logging
+
+logger = logging.getLogger("dumpSG.manifest")
+
+# bump this whenever what goes into a fingerprint or an entry changes
+MANIFEST_VERSION = 1
+
+class ReportManifest(object):
+  filename = 'manifest.jsonl'
+
+  def __init__(self, directory, inputs, settings=None):
+    '''
+      - inputs is a key for the input files (see sgcache.cache_key()), None if they cannot be
+        fingerprinted, in which case nothing is ever reused
+      - settings is anything else that changes the histograms, e.g. the sampled events
+    '''
+    self.path = os.path.join(directory, self.filename)
+    self.inputs = inputs
+    self.settings = hashlib.sha1(json.dumps([MANIFEST_VERSION, inputs, settings], sort_keys=True).encode('utf-8')).hexdigest()
+    # how the plots are drawn, set by the report, a change means drawing everything again
+    self.render = None
+    self.entries = {}
+    self.f = None
+    self.load()
+
+  def load(self):
+    if not os.path.isfile(self.path):
+      return
+    with open(self.path) as f:
+      for line in f:
+        try:
+          self.entries.update(json.loads(line))
+        except ValueError:
+          # the last line of a report that crashed can be cut short
+          logger.info("Ignoring a partial line in {0}".format(self.path))
+    logger.info("Loaded {0} branches from {1}".format(len(self.entries), self.path))
+
+  def fingerprint(self, item):
+    if self.inputs is None:
+      return None
+    return hashlib.sha1('{0}|{1}|{2}'.format(self.settings, item['rootname'], item['type']).encode('utf-8')).hexdigest()
+
+  def lookup(self, item):
+    '''
+    the entry of the item if its inputs did not change since it was recorded, None otherwise
+    '''
+    fingerprint = self.fingerprint(item)
+    entry = self.entries.get(item['rootname'])
+    if fingerprint is None or entry is None or entry['fingerprint'] != fingerprint:
+      return None
+    return entry
+
+  def record(self, items):
+    '''
+    items is a list of (item, hist, fields), fields is None if the item was not drawn yet
+    '''
+    entries = {}
+    for item, hist, fields in items:
+      fingerprint = self.fingerprint(item)
+      if fingerprint is None: continue
+      entries[item['rootname']] = {'fingerprint': fingerprint, 'hist': hist, 'fields': fields, 'render': self.render}
+    if not entries:
+      return
+    self.entries.update(entries)
+    if self.f is None:
+      self.f = open(self.path, 'a')
+    self.f.write(json.dumps(entries, sort_keys=True))
+    self.f.write('\n')
+    # make sure it is on disk before we go on, in case we crash right after
+    self.f.flush()
+    os.fsync(self.f.fileno())
+
+  def close(self):
+    '''
+    rewrite the manifest with only the latest entry of every branch
+    '''
+    if self.f is None:
+      return
+    self.f.close()
+    self.f = None
+    fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+      for rootname in sorted(self.entries):
+        f.write(json.dumps({rootname: self.entries[rootname]}, sort_keys=True))
+        f.write('\n')
+    os.rename(tmpPath, self.path)
@@ -0,0 +1,88 @@
+'''
+  Keeping the resident memory of a long report in check.
+
+  A MemoryGuard samples the resident set size (RSS) after every container of the report
+  and remembers the peak. With a ceiling (--max-rss), it tells the report when to recycle
+  what it holds on to: the reader backend (the TChain, its baskets and its TTreeCache, see
+  ReaderBackend.recycle()) and the processes drawing the plots. Some memory cannot be
+  given back at all (e.g. what ROOT's interpreter compiled), so it only asks again once
+  the RSS grew well beyond what it was right after the last recycling.
+'''
+import gc
+import logging
+
+from tracing import current_rss
+
+logger = logging.getLogger("dumpSG.memory")
+
+class MemoryGuard(object):
+  # how far above the RSS after the last recycling we need to be before recycling again, as a fraction of the ceiling
+  margin = 0.05
+
+  def __init__(self, max_rss=0, name='report'):
+    '''
+    max_rss is the ceiling in bytes, 0 only samples the RSS
+    '''
+    self.max_rss = max_rss
+    self.name = name
+    self.peak = (None, 0)
+    self.samples = 0
+    self.last = 0
+    self.recycled = 0
+    self.floor = 0
+    self.warned = False
+    self.restarting = False
+
+  def sample(self, label, rss=None):
+    '''
+    sample the RSS after label (e.g. a container) is done, returns whether it is time to recycle
+      - rss is the RSS of the process looked after, if it is not this one (e.g. a worker of a pool)
+    '''
+    if rss is None:
+      rss = current_rss()
+    self.samples += 1
+    self.last = rss
+    if rss > self.peak[1]:
+      self.peak = (label, rss)
+    logger.debug("RSS after {0}: {1:.1f} MB".format(label, rss/1024.**2))
+    if self.restarting:
+      # the first sample of the fresh processes, see restarted()
+      self.restarting = False
+      logger.info("RSS of the fresh {0} after {1}: {2:.1f} MB".format(self.name, label, rss/1024.**2))
+      self.recycled_to(rss)
+    if not self.max_rss or rss <= self.max_rss:
+      return False
+    return rss > self.floor + self.margin*self.max_rss
+
+  def recycled_after(self, label):
+    '''
+    record that everything this process holds on to was recycled, and how much memory that gave back
+    '''
+    gc.collect()
+    rss = current_rss()
+    self.recycled += 1
+    logger.info("Recycled the {0} after {1}: RSS {2:.1f} MB -> {3:.1f} MB".format(self.name, label, self.last/1024.**2, rss/1024.**2))
+    self.recycled_to(rss)
+
+  def restarted(self, label):
+    '''
+    record that the processes looked after (e.g. a pool of workers) were replaced by fresh ones
+      - their RSS is only known once they sampled it, so the next sample() is taken as the floor
+    '''
+    self.recycled += 1
+    self.restarting = True
+    logger.info("Recycled the {0} after {1} at RSS {2:.1f} MB".format(self.name, label, self.last/1024.**2))
+
+  def recycled_to(self, rss):
+    # what is left after recycling cannot be given back, only ask again once the RSS grew beyond it
+    self.floor = rss
+    if self.floor > self.max_rss and not self.warned:
+      self.warned = True
+      logger.warning("The {0} is still above --max-rss ({1:.0f} MB) after recycling, the rest of its memory cannot be given back".format(self.name, self.max_rss/1024.**2))
+
+  def summary(self):
+    label, rss = self.peak
+    line = 'Peak RSS of the {0}: {1:.1f} MB (after {2}, {3} samples)'.format(self.name, rss/1024.**2, label, self.samples)
+    if self.max_rss:
+      line += ', recycled {0} times to stay under {1:.0f} MB'.format(self.recycled, self.max_rss/1024.**2)
+    return line
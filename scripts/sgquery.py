@@ -0,0 +1,329 @@
+'''
+  Interactive queries about the StoreGate structure of a dataset, see dumpSG.py --interactive.
+
+  A QuerySession keeps the containers of a dataset in memory and answers one-line queries
+  about them, so asking "which containers have Tau1?" does not mean starting a new process,
+  loading ROOT and walking the tree again. The queries about the structure and the sizes
+  are answered right away from memory. The ones that have to read the files (the statistics
+  of a branch, the number of events) are handed to a background worker, which keeps its own
+  chain open from one query to the next, so the prompt stays responsive.
+
+  The same queries can be asked
+    - at a prompt (repl()), where the heavy ones run in the background and their results
+      are printed once they are done
+    - over a Unix socket (serve()), one query per line, each answered with a line of JSON,
+      the heavy ones only once they are done. send() is a client for it
+'''
+import os
+import json
+import time
+import socket
+import fnmatch
+import threading
+import SocketServer
+
+# query -> (arguments, what it answers), heavy queries read the files in the background
+commands = [('types', '[PATTERN]', 'the container types, with their number of containers and their size'),
+            ('containers', '[PATTERN]', 'the containers, with their type and size'),
+            ('find', 'PATTERN', 'the containers, properties and attributes with a matching name'),
+            ('show', 'CONTAINER', 'the properties and attributes of a container, with their types and sizes'),
+            ('size', 'PATTERN', 'the size of the matching containers, per event once the events are counted'),
+            ('stats', 'BRANCH', 'entries, mean and RMS of a branch (Container.name or its name in the tree), read in the background'),
+            ('entries', '', 'the number of events, counted in the background'),
+            ('jobs', '', 'the queries running in the background, and the ones that are done'),
+            ('help', '', 'this help')]
+heavy = ['stats', 'entries']
+
+class QueryError(Exception):
+  pass
+
+def matches(pattern, name):
+  '''
+  a pattern with *, ? or [ is matched with fnmatch, anything else is a substring, both ignoring case
+  '''
+  if any(c in pattern for c in '*?['):
+    return fnmatch.fnmatch(name.lower(), pattern.lower())
+  return pattern.lower() in name.lower()
+
+class QuerySession(object):
+  '''
+  answers the queries about xAOD_Objects, a dictionary of containers (see dumpSG.inspect_tree())
+    - submit(kind, argument) starts a heavy query on the background worker and returns something
+      with ready() and get(), like multiprocessing's AsyncResult, None means there is no worker
+    - entries is the number of events if it is known, otherwise it is counted in the background
+  '''
+
+  def __init__(self, xAOD_Objects, entries=None, submit=None):
+    self.xAOD_Objects = xAOD_Objects
+    self.submit = submit
+    self._entries = entries
+    self.jobs = []
+    self.lock = threading.Lock()
+    # every property and attribute, looked up by its container and name, and by its name in the tree
+    self.branches = {}
+    for container, containerVals in xAOD_Objects.iteritems():
+      for kind in ['prop', 'attr']:
+        for item in containerVals.get(kind, []):
+          self.branches['{0}.{1}'.format(container, item['name'])] = (container, kind, item)
+          self.branches[item['rootname']] = (container, kind, item)
+    if entries is None and submit is not None:
+      self.start('entries', '')
+
+  def entries(self):
+    '''
+    the number of events, None until they are counted
+    '''
+    if self._entries is None:
+      with self.lock:
+        counted = [job for job in self.jobs if job['kind'] == 'entries' and job['result'].ready()]
+      for job in counted:
+        try:
+          self._entries = job['result'].get()
+          break
+        except Exception:
+          pass
+    return self._entries
+
+  def query(self, line, wait=True):
+    '''
+    the answer to a query, as a dictionary with the query and the time it took to answer in ms
+      - heavy queries are waited for, or answered with the job that runs them if wait is False
+      - a query that cannot be answered has an error instead
+    '''
+    start = time.time()
+    words = line.split(None, 1)
+    kind, argument = (words[0].lower(), words[1].strip() if len(words) > 1 else '') if words else ('help', '')
+    try:
+      if kind not in [name for name, arguments, description in commands]:
+        raise QueryError('Unknown query `{0}`, see help'.format(kind))
+      if kind in heavy:
+        job = self.start(kind, argument)
+        reply = self.wait(job) if wait else {'job': job['id']}
+      else:
+        reply = getattr(self, 'query_' + kind)(argument)
+    except QueryError as e:
+      reply = {'error': str(e)}
+    reply.update(query=line, ms=1000.*(time.time() - start))
+    return reply
+
+  def start(self, kind, argument):
+    if self.submit is None:
+      raise QueryError('`{0}` reads the input files, which this session cannot do'.format(kind))
+    if kind == 'stats':
+      argument = self.branch(argument)[2]
+    with self.lock:
+      job = {'id': len(self.jobs) + 1, 'kind': kind, 'argument': argument, 'started': time.time(), 'result': self.submit(kind, argument)}
+      self.jobs.append(job)
+    return job
+
+  def wait(self, job):
+    try:
+      result = job['result'].get()
+    except Exception as e:
+      return {'job': job['id'], 'error': '{0}: {1}'.format(type(e).__name__, e)}
+    if job['kind'] == 'entries':
+      self._entries = result
+      return {'job': job['id'], 'entries': result}
+    if result is None:
+      return {'job': job['id'], 'error': '{0} could not be read'.format(job['argument']['rootname'])}
+    return dict(result, job=job['id'], rootname=job['argument']['rootname'])
+
+  def branch(self, name):
+    if name not in self.branches:
+      raise QueryError('No branch `{0}`, see find'.format(name))
+    return self.branches[name]
+
+  def container(self, name):
+    if name not in self.xAOD_Objects:
+      candidates = [container for container in self.xAOD_Objects if container.lower() == name.lower()]
+      if not candidates:
+        raise QueryError('No container `{0}`, see containers'.format(name))
+      name = candidates[0]
+    return name, self.xAOD_Objects[name]
+
+  def query_help(self, argument):
+    return {'commands': [{'query': name, 'arguments': arguments, 'description': description} for name, arguments, description in commands]}
+
+  def query_types(self, pattern):
+    types = {}
+    for container, containerVals in self.xAOD_Objects.iteritems():
+      if pattern and not matches(pattern, containerVals['type']): continue
+      summary = types.setdefault(containerVals['type'], {'type': containerVals['type'], 'containers': 0, 'filebytes': 0, 'totbytes': 0})
+      summary['containers'] += 1
+      summary['filebytes'] += containerVals['filebytes']
+      summary['totbytes'] += containerVals['totbytes']
+    return {'types': sorted(types.itervalues(), key=lambda summary: summary['type'].lower())}
+
+  def query_containers(self, pattern):
+    return {'containers': [{'container': container, 'type': containerVals['type'], 'filebytes': containerVals['filebytes'], 'totbytes': containerVals['totbytes']}
+                           for container, containerVals in sorted(self.xAOD_Objects.iteritems(), key=lambda (container, containerVals): container.lower())
+                           if not pattern or matches(pattern, container)]}
+
+  def query_find(self, pattern):
+    if not pattern:
+      raise QueryError('find needs a pattern')
+    found = []
+    for container in sorted(self.xAOD_Objects, key=lambda container: container.lower()):
+      containerVals = self.xAOD_Objects[container]
+      if matches(pattern, container):
+        found.append({'container': container, 'kind': 'container', 'name': container, 'type': containerVals['type']})
+      for kind in ['prop', 'attr']:
+        found.extend({'container': container, 'kind': kind, 'name': item['name'], 'type': item['type'], 'rootname': item['rootname']}
+                     for item in containerVals.get(kind, []) if matches(pattern, item['name']))
+    return {'matches': found}
+
+  def query_show(self, name):
+    container, containerVals = self.container(name)
+    reply = {'container': container, 'type': containerVals['type'], 'filebytes': containerVals['filebytes'], 'totbytes': containerVals['totbytes']}
+    for kind in ['prop', 'attr']:
+      reply[kind] = [{'name': item['name'], 'type': item['type'], 'rootname': item['rootname'], 'filebytes': item['filebytes'], 'totbytes': item['totbytes']}
+                     for item in sorted(containerVals.get(kind, []), key=lambda item: item['name'].lower())]
+    return reply
+
+  def query_size(self, pattern):
+    if not pattern:
+      raise QueryError('size needs a pattern')
+    entries = self.entries()
+    sizes = []
+    for container, containerVals in sorted(self.xAOD_Objects.iteritems(), key=lambda (container, containerVals): -containerVals['filebytes']):
+      if container != pattern and not matches(pattern, container): continue
+      size = {'container': container, 'type': containerVals['type'], 'filebytes': containerVals['filebytes'], 'totbytes': containerVals['totbytes']}
+      if entries:
+        size['filebytes_per_event'] = float(containerVals['filebytes'])/entries
+        size['totbytes_per_event'] = float(containerVals['totbytes'])/entries
+      sizes.append(size)
+    return {'sizes': sizes, 'entries': entries}
+
+  def query_jobs(self, argument):
+    with self.lock:
+      jobs = list(self.jobs)
+    return {'jobs': [{'id': job['id'], 'query': '{0} {1}'.format(job['kind'], job['argument']['rootname'] if job['kind'] == 'stats' else '').strip(),
+                      'done': job['result'].ready(), 'seconds': time.time() - job['started']} for job in jobs]}
+
+def format_reply(reply, sizeof_fmt=str):
+  '''
+  the answer to a query as text, for the prompt
+  '''
+  if 'error' in reply:
+    return 'error: {0}'.format(reply['error'])
+  lines = []
+  if 'commands' in reply:
+    lines.extend('  {0:<12}{1:<12}{2}'.format(command['query'], command['arguments'], command['description']) for command in reply['commands'])
+  elif 'types' in reply:
+    lines.extend('  {0:<50}{1:>6} containers{2:>12}'.format(summary['type'], summary['containers'], sizeof_fmt(summary['filebytes'])) for summary in reply['types'])
+  elif 'containers' in reply:
+    lines.extend('  {0:<50}{1:<40}{2:>12}'.format(size['container'], size['type'], sizeof_fmt(size['filebytes'])) for size in reply['containers'])
+  elif 'matches' in reply:
+    lines.extend('  {0:<10}{1:<50}{2}'.format(match['kind'], match['name'] if match['kind'] == 'container' else '{0}.{1}'.format(match['container'], match['name']), match['type'])
+                 for match in reply['matches'])
+  elif 'prop' in reply:
+    lines.append('{0} ({1}): {2} on disk, {3} in memory'.format(reply['container'], reply['type'], sizeof_fmt(reply['filebytes']), sizeof_fmt(reply['totbytes'])))
+    for kind in ['prop', 'attr']:
+      lines.extend('  {0:<6}{1:<40}{2:<30}{3:>12}'.format(kind, item['name'], item['type'], sizeof_fmt(item['filebytes'])) for item in reply[kind])
+  elif 'sizes' in reply:
+    for size in reply['sizes']:
+      line = '  {0:<50}{1:>12} on disk{2:>12} in memory'.format(size['container'], sizeof_fmt(size['filebytes']), sizeof_fmt(size['totbytes']))
+      if 'filebytes_per_event' in size:
+        line += ', {0}/{1} per event'.format(sizeof_fmt(size['filebytes_per_event']), sizeof_fmt(size['totbytes_per_event']))
+      lines.append(line)
+    if reply['entries'] is None:
+      lines.append('  (the sizes per event are given once the events are counted, see jobs)')
+  elif 'jobs' in reply:
+    lines.extend('  [{0}] {1:<60}{2}'.format(job['id'], job['query'], 'done' if job['done'] else 'running for {0:.1f}s'.format(job['seconds'])) for job in reply['jobs'])
+  elif 'mean' in reply:
+    lines.append('[{0}] {1}: entries {2}, mean {3:.6g}, rms {4:.6g}, range [{5:.6g}, {6:.6g}]'.format(
+                 reply['job'], reply['rootname'], reply['entries'], reply['mean'], reply['rms'], reply['xmin'], reply['xmax']))
+  elif 'entries' in reply and 'job' in reply:
+    lines.append('[{0}] {1} events'.format(reply['job'], reply['entries']))
+  elif 'job' in reply:
+    lines.append('[{0}] started in the background, see jobs'.format(reply['job']))
+  elif 'shutdown' in reply:
+    lines.append('  the session is shutting down')
+  return '\n'.join(lines) if lines else '  (nothing)'
+
+def repl(session, sizeof_fmt=str, prompt='dumpSG> ', stdin=None, stdout=None):
+  '''
+  answer the queries typed at a prompt until quit (or the end of the input)
+    - heavy queries run in the background, their result is printed as soon as it is done
+    - the prompt and the replies are only written to stdout: once ROOT redirected the output of
+      the process (see load_root() in dumpSG.py), sys.stdout and raw_input() write into a file
+  '''
+  import sys
+  stdin, stdout = stdin or sys.stdin, stdout or sys.stdout
+  interactive = stdin.isatty()
+
+  def report(job):
+    # called from a thread of its own, so the prompt is written again afterwards
+    stdout.write('\n{0}\n{1}'.format(format_reply(session.wait(job), sizeof_fmt), prompt if interactive else ''))
+    stdout.flush()
+
+  while True:
+    try:
+      if interactive:
+        stdout.write(prompt)
+        stdout.flush()
+      line = stdin.readline()
+    except KeyboardInterrupt:
+      break
+    if not line:
+      if interactive: stdout.write('\n')
+      break
+    line = line.strip()
+    if not line: continue
+    if line in ['quit', 'exit']: break
+    reply = session.query(line, wait=not interactive)
+    stdout.write(format_reply(reply, sizeof_fmt) + '\n')
+    stdout.flush()
+    if 'job' in reply and 'error' not in reply and interactive:
+      waiter = threading.Thread(target=report, args=(session.jobs[reply['job'] - 1],))
+      waiter.daemon = True
+      waiter.start()
+
+class QueryHandler(SocketServer.StreamRequestHandler):
+  def handle(self):
+    for line in iter(self.rfile.readline, ''):
+      line = line.strip()
+      if not line: continue
+      if line == 'shutdown':
+        self.wfile.write(json.dumps({'query': line, 'shutdown': True}) + '\n')
+        # shutdown() waits for serve_forever() to return, so it cannot be called from its own thread
+        threading.Thread(target=self.server.shutdown).start()
+        return
+      self.wfile.write(json.dumps(self.server.session.query(line), sort_keys=True) + '\n')
+      self.wfile.flush()
+
+class QueryServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+  # every connection gets a thread of its own, so a heavy query only holds up its own connection
+  daemon_threads = True
+
+def serve(session, path):
+  '''
+  a server answering the queries sent to the Unix socket at path, call serve_forever() on it
+    - each line sent is a query, answered with a line of JSON (see QuerySession.query())
+    - `shutdown` stops the server
+  '''
+  if os.path.exists(path):
+    # the socket of a session that is gone can be reused, but not the one of a running session
+    try:
+      send(path, [])
+      raise QueryError('{0} is already being served'.format(path))
+    except socket.error:
+      os.remove(path)
+  server = QueryServer(path, QueryHandler)
+  server.session = session
+  return server
+
+def send(path, queries):
+  '''
+  the replies of the server at path to each of the queries
+  '''
+  client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  client.connect(path)
+  f = client.makefile('rw')
+  replies = []
+  for query in queries:
+    f.write(query + '\n')
+    f.flush()
+    replies.append(json.loads(f.readline()))
+  client.close()
+  return replies
@@ -0,0 +1,110 @@
+'''
+  Lightweight outputs of the report, which do not need ROOT.
+
+  A plot is a dictionary with the container, name, rootname, type and title of a branch,
+  its histogram (see sghist.py), its entries, mean and rms, whether it is drawn with a log
+  scale, and a flag for what looks wrong with it (no_entries, no_rms, no_mean or None),
+  see dumpSG.plot_page(). All of the plots of a report can be written as
+
+    - a JSON bundle, with everything needed to draw them again
+    - a single self-contained HTML page, which draws them in the browser as they are scrolled
+      to, and can be searched by name, so thousands of branches stay quick to open
+'''
+import json
+from xml.sax.saxutils import escape
+
+def bundle(plots, sample=None):
+  '''
+  the plots, by container and in the order they were given
+  '''
+  containers = {}
+  for plot in plots:
+    containers.setdefault(plot['container'], []).append(dict((k, v) for k, v in plot.iteritems() if k != 'container'))
+  return {'containers': containers, 'sample': sample}
+
+def write_json_bundle(plots, f, sample=None):
+  json.dump(bundle(plots, sample=sample), f, sort_keys=True)
+
+html_template = u'''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; font-size: 12px; margin: 1em; }}
+h2 {{ font-size: 14px; margin: 1.5em 0 0.5em; }}
+.plot {{ display: inline-block; width: 320px; margin: 4px; vertical-align: top; border: 1px solid #ddd; }}
+.plot .name {{ font-weight: bold; overflow: hidden; text-overflow: ellipsis; white-space: nowrap; padding: 2px 4px; }}
+.plot .stats {{ color: #555; padding: 0 4px 2px; }}
+.plot svg {{ display: block; }}
+.no_entries {{ background: #fdd; }} .no_rms {{ background: #ffd; }} .no_mean {{ background: #fed; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p>{subtitle} <input id="search" type="search" placeholder="filter by name" size="40"></p>
+<div id="report"></div>
+<script type="application/json" id="data">{data}</script>
+<script>
+var data = JSON.parse(document.getElementById('data').textContent);
+var width = 320, height = 160;
+function draw(div, plot) {{
+  var h = plot.hist, counts = h.contents.slice(1, h.nbins + 1);
+  var max = Math.max.apply(null, counts.concat([0]));
+  var min = Math.min.apply(null, counts.filter(function (c) {{ return c > 0; }}).concat([max || 1]));
+  var y = function (c) {{
+    if (c <= 0 || max <= 0) return 0;
+    return plot.logy ? Math.log(c / min * 10) / Math.log(max / min * 10) : c / max;
+  }};
+  var bw = width / h.nbins, bars = [];
+  counts.forEach(function (c, i) {{
+    var bh = y(c) * (height - 4);
+    if (bh > 0) bars.push('<rect x="' + (i * bw).toFixed(1) + '" y="' + (height - bh).toFixed(1) + '" width="' + Math.max(bw - 0.5, 0.5).toFixed(1) + '" height="' + bh.toFixed(1) + '" fill="#4e79a7"/>');
+  }});
+  div.innerHTML += '<svg width="' + width + '" height="' + height + '">' + bars.join('') + '</svg>' +
+    '<div class="stats">[' + h.xmin.toPrecision(4) + ', ' + h.xmax.toPrecision(4) + ']' + (plot.logy ? ' log' : '') + '</div>';
+}}
+var report = document.getElementById('report'), divs = [];
+Object.keys(data.containers).sort().forEach(function (container) {{
+  var section = document.createElement('div'), heading = document.createElement('h2');
+  heading.textContent = container;
+  section.appendChild(heading);
+  data.containers[container].forEach(function (plot) {{
+    var div = document.createElement('div');
+    div.className = 'plot' + (plot.flag ? ' ' + plot.flag : '');
+    div.title = plot.rootname + ' (' + plot.type + ')';
+    div.innerHTML = '<div class="name"></div><div class="stats"></div>';
+    div.firstChild.textContent = plot.title;
+    div.lastChild.textContent = 'entries ' + plot.entries + ', mean ' + plot.mean.toPrecision(4) + ', rms ' + plot.rms.toPrecision(4);
+    div.plot = plot;
+    section.appendChild(div);
+    divs.push(div);
+  }});
+  report.appendChild(section);
+}});
+// only draw what is scrolled to
+var observer = new IntersectionObserver(function (seen) {{
+  seen.forEach(function (entry) {{
+    if (entry.isIntersecting && !entry.target.drawn) {{ entry.target.drawn = true; draw(entry.target, entry.target.plot); }}
+  }});
+}});
+divs.forEach(function (div) {{ observer.observe(div); }});
+document.getElementById('search').addEventListener('input', function (e) {{
+  var text = e.target.value.toLowerCase();
+  divs.forEach(function (div) {{ div.style.display = div.title.toLowerCase().indexOf(text) >= 0 ? '' : 'none'; }});
+}});
+</script>
+</body>
+</html>
+'''
+
+def write_html_bundle(plots, f, title='xAODDumper Report', sample=None):
+  '''
+  a single HTML page with all of the plots, the histograms are embedded as JSON
+  '''
+  subtitle = '{0} plots.'.format(len(plots))
+  if sample:
+    subtitle += ' Sampled: {0} of {1} events.'.format(sample['events'], sample['total'])
+  # nothing in the data may close the script tag it is embedded in
+  data = json.dumps(bundle(plots, sample=sample), sort_keys=True).replace('</', '<\\/')
+  f.write(html_template.format(title=escape(title), subtitle=escape(subtitle), data=data).encode('utf-8'))
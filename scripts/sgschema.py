@@ -0,0 +1,155 @@
+'''
+  Compact records for the structure of a StoreGate tree.
+
+  inspect_tree() used to build a dictionary per branch and per container. For very wide
+  trees, most of that memory goes into the dictionaries themselves, so these records use
+  __slots__ instead and share their type names (normalize_type() in dumpSG.py hands out
+  the same string for every leaf of a given type). They still behave like the
+  dictionaries they replace (item['name'], item.get('totbytes', 0), item['entries'] = ...)
+  so that everything else in dumpSG.py works unchanged, and anything added on top of
+  the fixed fields (report statistics, ...) goes into a small dictionary of extras.
+  They are only turned into plain dictionaries at the output boundary, see as_dict().
+'''
+
+class Record(object):
+  __slots__ = ('extra',)
+  fields = ()
+
+  def __getitem__(self, key):
+    if key in self.fields:
+      return getattr(self, key)
+    if self.extra is None:
+      raise KeyError(key)
+    return self.extra[key]
+
+  def __setitem__(self, key, value):
+    if key in self.fields:
+      setattr(self, key, value)
+    else:
+      if self.extra is None:
+        self.extra = {}
+      self.extra[key] = value
+
+  def __contains__(self, key):
+    return key in self.fields or (self.extra is not None and key in self.extra)
+
+  def get(self, key, default=None):
+    try:
+      return self[key]
+    except KeyError:
+      return default
+
+  def keys(self):
+    return list(self.fields) + (list(self.extra) if self.extra else [])
+
+  def update(self, values):
+    for key, value in values.items():
+      self[key] = value
+
+  def __getstate__(self):
+    return tuple(getattr(self, field) for field in self.fields) + (self.extra,)
+
+  def __setstate__(self, state):
+    for field, value in zip(self.fields, state):
+      setattr(self, field, value)
+    self.extra = state[-1]
+
+  def __eq__(self, other):
+    return as_dict(self) == as_dict(other)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __repr__(self):
+    return '{0}({1!r})'.format(self.__class__.__name__, as_dict(self))
+
+class Branch(Record):
+  '''
+  a property or attribute of a container
+  '''
+  __slots__ = ('name', 'type', 'rootname', 'totbytes', 'filebytes')
+  fields = __slots__
+
+  def __init__(self, name, type, rootname, totbytes, filebytes):
+    self.name = name
+    self.type = type
+    self.rootname = rootname
+    self.totbytes = totbytes
+    self.filebytes = filebytes
+    self.extra = None
+
+class Container(Record):
+  '''
+  a container, with its properties and attributes as lists of Branch
+  '''
+  __slots__ = ('type', 'has_interface', 'has_aux', 'rootname', 'totbytes', 'filebytes', 'prop', 'attr')
+  fields = __slots__
+
+  def __init__(self):
+    self.type = ''
+    self.has_interface = False
+    self.has_aux = False
+    self.rootname = ''
+    self.totbytes = 0
+    self.filebytes = 0
+    self.prop = []
+    self.attr = []
+    self.extra = None
+
+class ContainerView(object):
+  '''
+  a container as seen through the --prop/--attr filters, without copying it
+    - prop/attr are hidden unless they are listed
+    - anything set on the view (sizes including the children, report statistics, ...) is kept on
+      the view, so the underlying container is never modified
+  '''
+  __slots__ = ('container', 'hidden', 'overrides')
+
+  def __init__(self, container, hidden=()):
+    self.container = container
+    self.hidden = hidden
+    self.overrides = {}
+
+  @staticmethod
+  def hide(list_properties=True, list_attributes=True):
+    '''
+    the keys to hide, worked out once and shared by all of the views
+    '''
+    return tuple(key for key, listed in [('prop', list_properties), ('attr', list_attributes)] if not listed)
+
+  def __getitem__(self, key):
+    if key in self.hidden:
+      raise KeyError(key)
+    if key in self.overrides:
+      return self.overrides[key]
+    return self.container[key]
+
+  def __setitem__(self, key, value):
+    self.overrides[key] = value
+
+  def __contains__(self, key):
+    return key not in self.hidden and (key in self.overrides or key in self.container)
+
+  def get(self, key, default=None):
+    try:
+      return self[key]
+    except KeyError:
+      return default
+
+  def keys(self):
+    return [key for key in self.container.keys() if key not in self.hidden and key not in self.overrides] + list(self.overrides)
+
+  def __repr__(self):
+    return 'ContainerView({0!r})'.format(as_dict(self))
+
+def as_dict(value):
+  '''
+  turn records, views and anything containing them into plain dictionaries and lists
+  '''
+  if isinstance(value, (Record, ContainerView)):
+    return dict((key, as_dict(value[key])) for key in value.keys())
+  if isinstance(value, dict):
+    return dict((key, as_dict(val)) for key, val in value.items())
+  if isinstance(value, list):
+    return [as_dict(val) for val in value]
+  return value
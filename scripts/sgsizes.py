@@ -0,0 +1,173 @@
+'''
+  Size accounting: where the bytes of a dataset go, by type, container and branch.
+
+  breakdown() adds everything up in a single pass over the containers, both on disk
+  (filebytes) and in memory (totbytes), and per event if the number of events is known.
+  The result is written out as JSON, as a CSV table (one row per type, container and
+  branch, to sort however you like), as a text table sorted by the size on disk, and as
+  a squarified treemap of the types and their containers in SVG, none of which need ROOT.
+'''
+import json
+from xml.sax.saxutils import escape
+
+keys = ['filebytes', 'totbytes']
+
+def items_of(containerVals):
+  '''
+  every property and attribute of a container, also the ones a view does not list
+  '''
+  underlying = getattr(containerVals, 'container', containerVals)
+  return underlying.get('prop', [])+underlying.get('attr', [])
+
+def per_event(totals, entries):
+  if entries:
+    for key in keys:
+      totals[key + '_per_event'] = float(totals[key])/entries
+  return totals
+
+def breakdown(xAOD_Objects, entries=None):
+  '''
+  the sizes of the whole dataset, of each type, of each container and of each of its branches
+    - a container is its interface and Aux. branches plus all of its properties and attributes,
+      no matter which of them are listed with --prop/--attr
+    - everything also has its size per event if entries is given
+  '''
+  total = {'filebytes': 0, 'totbytes': 0, 'entries': entries, 'types': {}}
+  for container, containerVals in xAOD_Objects.iteritems():
+    underlying = getattr(containerVals, 'container', containerVals)
+    containerType = underlying.get('type', '')
+    # the interface and Aux. branches themselves
+    sizes = {'filebytes': underlying.get('filebytes', 0), 'totbytes': underlying.get('totbytes', 0), 'branches': {}}
+    for item in items_of(containerVals):
+      sizes['branches'][item['name']] = per_event({'filebytes': item['filebytes'], 'totbytes': item['totbytes'], 'rootname': item['rootname']}, entries)
+      sizes['filebytes'] += item['filebytes']
+      sizes['totbytes'] += item['totbytes']
+    per_event(sizes, entries)
+
+    typeSizes = total['types'].setdefault(containerType, {'filebytes': 0, 'totbytes': 0, 'containers': {}})
+    typeSizes['containers'][container] = sizes
+    for key in keys:
+      typeSizes[key] += sizes[key]
+      total[key] += sizes[key]
+
+  for typeSizes in total['types'].itervalues():
+    per_event(typeSizes, entries)
+  return per_event(total, entries)
+
+def by_size(children, key='filebytes'):
+  # largest first, then by name so that the order is stable
+  return sorted(children.iteritems(), key=lambda (name, sizes): (-sizes[key], name.lower()))
+
+def rows(sizes, key='filebytes'):
+  '''
+  yield (level, type, container, branch, sizes) for the dataset, then each type, container and branch, largest first
+  '''
+  yield ('total', '', '', '', sizes)
+  for containerType, typeSizes in by_size(sizes['types'], key):
+    yield ('type', containerType, '', '', typeSizes)
+    for container, containerSizes in by_size(typeSizes['containers'], key):
+      yield ('container', containerType, container, '', containerSizes)
+      for branch, branchSizes in by_size(containerSizes['branches'], key):
+        yield ('branch', containerType, container, branch, branchSizes)
+
+def write_json(sizes, f):
+  json.dump(sizes, f, sort_keys=True, indent=4)
+
+def write_csv(sizes, f):
+  import csv
+  writer = csv.writer(f)
+  writer.writerow(['level', 'type', 'container', 'branch', 'filebytes', 'totbytes', 'filebytes_per_event', 'totbytes_per_event', 'filebytes_fraction', 'totbytes_fraction'])
+  for level, containerType, container, branch, nodeSizes in rows(sizes):
+    writer.writerow([level, containerType, container, branch, nodeSizes['filebytes'], nodeSizes['totbytes'],
+                     nodeSizes.get('filebytes_per_event', ''), nodeSizes.get('totbytes_per_event', ''),
+                     float(nodeSizes['filebytes'])/sizes['filebytes'] if sizes['filebytes'] else 0.,
+                     float(nodeSizes['totbytes'])/sizes['totbytes'] if sizes['totbytes'] else 0.])
+
+def write_table(sizes, f, sizeof_fmt=str):
+  perEvent = sizes['entries'] is not None and sizes['entries'] > 0
+  f.write('{0:<70}{1:>14}{2:>14}{3:>14}{4:>14}{5:>8}\n'.format('type / container / branch', 'on-disk', 'per event' if perEvent else '', 'in-memory', 'per event' if perEvent else '', '% disk'))
+  indent = {'total': '', 'type': '', 'container': '  ', 'branch': '    '}
+  for level, containerType, container, branch, nodeSizes in rows(sizes):
+    name = {'total': 'Total ({0} events)'.format(sizes['entries']) if perEvent else 'Total', 'type': containerType, 'container': container, 'branch': branch}[level]
+    fraction = 100.*nodeSizes['filebytes']/sizes['filebytes'] if sizes['filebytes'] else 0.
+    f.write('{0:<70}{1:>14}{2:>14}{3:>14}{4:>14}{5:>7.2f}%\n'.format(indent[level] + name,
+                                                                     sizeof_fmt(nodeSizes['filebytes']),
+                                                                     sizeof_fmt(nodeSizes['filebytes_per_event']) if perEvent else '',
+                                                                     sizeof_fmt(nodeSizes['totbytes']),
+                                                                     sizeof_fmt(nodeSizes['totbytes_per_event']) if perEvent else '',
+                                                                     fraction))
+
+def squarify(sizes, x, y, width, height):
+  '''
+  lay out rectangles with the given sizes (largest first) in a rectangle, as close to squares as we can
+    - see Bruls, Huizing and van Wijk, "Squarified Treemaps"
+    - returns the (x, y, width, height) of each size, in the same order
+  '''
+  total = float(sum(sizes))
+  if total <= 0:
+    return [(x, y, 0., 0.) for size in sizes]
+  areas = [size*width*height/total for size in sizes]
+  rects = []
+  i = 0
+  while i < len(areas):
+    short = min(width, height)
+    # grow the row along the short side for as long as that makes its rectangles more square
+    rowSum, rowMin, rowMax = areas[i], areas[i], areas[i]
+    worst = aspect(rowSum, rowMin, rowMax, short)
+    j = i + 1
+    while j < len(areas):
+      candidate = aspect(rowSum + areas[j], min(rowMin, areas[j]), max(rowMax, areas[j]), short)
+      if candidate > worst: break
+      rowSum, rowMin, rowMax, worst = rowSum + areas[j], min(rowMin, areas[j]), max(rowMax, areas[j]), candidate
+      j += 1
+    thickness = rowSum/short if short > 0 else 0.
+    offset = 0.
+    for area in areas[i:j]:
+      length = area/thickness if thickness > 0 else 0.
+      if width >= height:
+        rects.append((x, y + offset, thickness, length))
+      else:
+        rects.append((x + offset, y, length, thickness))
+      offset += length
+    if width >= height:
+      x, width = x + thickness, width - thickness
+    else:
+      y, height = y + thickness, height - thickness
+    i = j
+  return rects
+
+def aspect(rowSum, rowMin, rowMax, short):
+  # the worst aspect ratio of a row of rectangles laid along a side of the given length
+  if rowMin <= 0 or short <= 0:
+    return float('inf')
+  return max(short*short*rowMax/(rowSum*rowSum), rowSum*rowSum/(short*short*rowMin))
+
+# colors for the types, cycled through
+palette = ['#4e79a7', '#f28e2b', '#e15759', '#76b7b2', '#59a14f', '#edc948', '#b07aa1', '#ff9da7', '#9c755f', '#bab0ac']
+
+def write_treemap(sizes, f, key='filebytes', width=1200, height=800, sizeof_fmt=str, title='On-Disk Size'):
+  '''
+  an SVG treemap of the types, each split up into its containers, hover over them for their sizes
+  '''
+  f.write('<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" font-family="sans-serif" font-size="11">\n'.format(width, height + 24))
+  f.write('<text x="4" y="16" font-size="14">{0}: {1}</text>\n'.format(escape(title), escape(sizeof_fmt(sizes[key]))))
+  types = [(containerType, typeSizes) for containerType, typeSizes in by_size(sizes['types'], key) if typeSizes[key] > 0]
+  for i, ((containerType, typeSizes), (tx, ty, tw, th)) in enumerate(zip(types, squarify([typeSizes[key] for containerType, typeSizes in types], 0., 24., width, height))):
+    color = palette[i % len(palette)]
+    f.write('<g>\n<rect x="{0:.1f}" y="{1:.1f}" width="{2:.1f}" height="{3:.1f}" fill="{4}" stroke="#fff" stroke-width="2"><title>{5}: {6}</title></rect>\n'.format(
+            tx, ty, tw, th, color, escape(containerType), escape(sizeof_fmt(typeSizes[key]))))
+    # leave room for the name of the type at the top
+    pad = 14 if th > 40 and tw > 60 else 0
+    containers = [(container, containerSizes) for container, containerSizes in by_size(typeSizes['containers'], key) if containerSizes[key] > 0]
+    for (container, containerSizes), (cx, cy, cw, ch) in zip(containers, squarify([containerSizes[key] for container, containerSizes in containers], tx + 2, ty + pad + 2, max(tw - 4, 0), max(th - pad - 4, 0))):
+      tooltip = '{0} ({1}): {2}'.format(container, containerType, sizeof_fmt(containerSizes[key]))
+      if containerSizes.get(key + '_per_event') is not None:
+        tooltip += ', {0} per event'.format(sizeof_fmt(containerSizes[key + '_per_event']))
+      f.write('<rect x="{0:.1f}" y="{1:.1f}" width="{2:.1f}" height="{3:.1f}" fill="{4}" fill-opacity="0.6" stroke="#fff"><title>{5}</title></rect>\n'.format(
+              cx, cy, cw, ch, color, escape(tooltip)))
+      if cw > 8*len(container)*0.6 and ch > 14:
+        f.write('<text x="{0:.1f}" y="{1:.1f}">{2}</text>\n'.format(cx + 3, cy + 12, escape(container)))
+    if pad:
+      f.write('<text x="{0:.1f}" y="{1:.1f}" font-weight="bold">{2}</text>\n'.format(tx + 3, ty + 12, escape(containerType)))
+    f.write('</g>\n')
+  f.write('</svg>\n')
@@ -0,0 +1,115 @@
+'''
+  Nested timing spans for dumpSG.py.
+
+  Each span records its wall time, CPU time and the resident memory at its start and
+  end. The spans can be written out in the Chrome trace event format, which can be
+  opened in chrome://tracing or https://ui.perfetto.dev, and summarized as text.
+'''
+import os
+import time
+import json
+import resource
+import logging
+from functools import reduce
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger("dumpSG.tracing")
+
+def current_rss():
+  '''
+  resident set size in bytes
+  '''
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1])*resource.getpagesize()
+  except IOError:
+    # no procfs, so the best we can do is the peak (in kB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+def cpu_time():
+  # user + system time of this process
+  return sum(os.times()[:2])
+
+def secondsToStr(t):
+  return "%d:%02d:%02d.%03d" % \
+    reduce(lambda ll,b : divmod(ll[0],b) + ll[1:],
+           [(t*1000,),1000,60,60])
+
+class Tracer(object):
+  def __init__(self):
+    self.reset()
+
+  def reset(self):
+    self.spans = []
+    self.depth = 0
+    self.start = time.time()
+    self.cpuStart = cpu_time()
+
+  @contextmanager
+  def span(self, name, category='dumpSG', **details):
+    '''
+    with tracer.span('inspect_tree'): ...
+      - details are stored on the span, e.g. the rootname of the branch being drawn
+    '''
+    span = {'name': name, 'cat': category, 'pid': os.getpid(), 'depth': self.depth, 'args': details,
+            'start': time.time(), 'cpu': cpu_time(), 'rss_start': current_rss()}
+    self.depth += 1
+    try:
+      yield span
+    finally:
+      self.depth -= 1
+      span['wall'] = time.time() - span['start']
+      span['cpu'] = cpu_time() - span['cpu']
+      span['rss_end'] = current_rss()
+      self.spans.append(span)
+
+  def extend(self, spans):
+    '''
+    add spans recorded by another process, e.g. a report worker
+    '''
+    self.spans.extend(spans)
+
+  def chrome_trace(self):
+    events = []
+    for span in sorted(self.spans, key=lambda span: span['start']):
+      args = dict(span['args'], cpu_ms=span['cpu']*1.e3, rss_start=span['rss_start'], rss_end=span['rss_end'])
+      events.append({'name': span['name'], 'cat': span['cat'], 'ph': 'X', 'pid': span['pid'], 'tid': span['pid'],
+                     'ts': (span['start'] - self.start)*1.e6, 'dur': span['wall']*1.e6, 'args': args})
+      events.append({'name': 'rss', 'ph': 'C', 'pid': span['pid'], 'ts': (span['start'] + span['wall'] - self.start)*1.e6,
+                     'args': {'rss': span['rss_end']}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+  def write(self, path):
+    with open(path, 'w+') as f:
+      json.dump(self.chrome_trace(), f)
+    logger.info("Wrote the trace to {0}".format(path))
+
+  def summary(self, categories=['draw', 'print'], n=20):
+    '''
+    text summary of the top-level spans and of the n branches with the most time in spans of the categories
+      - the spans of a branch are added up by category, e.g. working out its statistics (draw, with
+        TTree::Draw if it was not filled along with the others) and printing its plots (print)
+    '''
+    lines = ['{0:<40}{1:>14}{2:>14}{3:>14}'.format('span', 'wall', 'cpu', 'rss')]
+    for span in sorted((span for span in self.spans if span['depth'] == 0 and span['pid'] == os.getpid()), key=lambda span: span['start']):
+      lines.append('{0:<40}{1:>14}{2:>14}{3:>12.1f}MB'.format(span['name'], secondsToStr(span['wall']), secondsToStr(span['cpu']), span['rss_end']/1024.**2))
+    branches = defaultdict(lambda: dict.fromkeys(categories, 0.))
+    for span in self.spans:
+      if span['cat'] in categories and 'rootname' in span['args']:
+        branches[span['args']['rootname']][span['cat']] += span['wall']
+    slowest = sorted(branches.iteritems(), key=lambda (rootname, walls): -sum(walls.values()))[:n]
+    if slowest:
+      lines.append('')
+      lines.append('The {0} slowest branches to {1}'.format(len(slowest), ' and '.join(categories)))
+      lines.append('  {0:<48}'.format('branch') + ''.join('{0:>14}'.format(category) for category in categories + ['total']))
+      for rootname, walls in slowest:
+        lines.append('  {0:<48}'.format(rootname) + ''.join('{0:>14}'.format(secondsToStr(walls[category])) for category in categories) + '{0:>14}'.format(secondsToStr(sum(walls.values()))))
+    return '\n'.join(lines)
+
+  def elapsed(self):
+    return (time.time() - self.start, cpu_time() - self.cpuStart)
+
+# the tracer shared by everything in this process
+tracer = Tracer()
+span = tracer.span
@@ -0,0 +1,26 @@
+'''
+  The small CollectionTree the tests read through the in-memory backend, instead of a ROOT file.
+'''
+import os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import backends
+
+# (name, type, totbytes, filebytes) of each leaf
+leaves = [('ElectronCollection', 'DataVector<xAOD::Electron_v1>', 100, 50),
+          ('ElectronCollectionAux.', 'xAOD::ElectronAuxContainer_v2', 200, 80),
+          ('ElectronCollectionAux.pt', 'vector<float>', 1000, 400),
+          ('ElectronCollectionAux.charge', 'vector<float>', 600, 100),
+          ('ElectronCollectionAuxDyn.Loose', 'vector<char>', 300, 30),
+          ('AntiKt4EMTopoJetsAuxDyn.btaggingLink', 'vector<ElementLink<DataVector<xAOD::BTagging_v1> > >', 500, 200),
+          ('EventInfo', 'xAOD::EventInfo_v1', 10, 5),
+          ('EventInfoAux.', 'xAOD::EventInfoAuxInfo_v1', 20, 10),
+          ('EventInfoAux.eventNumber', 'ULong64_t', 80, 40)]
+
+# the values of the branches that can be read, for 4 events
+data = {'ElectronCollectionAux.pt': [[10., 20.], [], [30.], [40., 50., 60.]],
+        'ElectronCollectionAux.charge': [[1., -1.], [], [1.], [-1., -1., 1.]],
+        'EventInfoAux.eventNumber': [7, 8, 9, 10]}
+
+def memory_backend():
+  return backends.MemoryBackend(leaves, data=data, cluster_size=3)
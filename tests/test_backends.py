@@ -0,0 +1,322 @@
+'''
+  Tests of the reader backends and of what dumpSG.py builds on them, without any ROOT file,
+  see scripts/backends.py.
+
+  python -m unittest discover tests
+'''
+import os, sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import backends
+import dumpSG
+import sghist
+from fixtures import leaves, data, memory_backend
+
+try:
+  import numpy
+  try:
+    import uproot3 as uproot
+  except ImportError:
+    import uproot
+  import awkward0
+except ImportError:
+  uproot = None
+
+class ClassifyLeavesTest(unittest.TestCase):
+  def setUp(self):
+    self.xAOD_Objects = dumpSG.inspect_tree(memory_backend())
+
+  def test_containers(self):
+    self.assertEqual(sorted(self.xAOD_Objects), ['AntiKt4EMTopoJets', 'ElectronCollection', 'EventInfo'])
+    electrons = self.xAOD_Objects['ElectronCollection']
+    self.assertEqual(electrons['type'], 'xAOD::ElectronContainer')
+    self.assertTrue(electrons['has_aux'])
+    self.assertTrue(electrons['has_interface'])
+    self.assertFalse(self.xAOD_Objects['AntiKt4EMTopoJets']['has_interface'])
+
+  def test_properties_and_attributes(self):
+    electrons = self.xAOD_Objects['ElectronCollection']
+    self.assertEqual(sorted((item['name'], item['type'], item['rootname']) for item in electrons['prop']),
+                     [('charge', 'float', 'ElectronCollectionAux.charge'), ('pt', 'float', 'ElectronCollectionAux.pt')])
+    self.assertEqual([(item['name'], item['type'], item['totbytes'], item['filebytes']) for item in electrons['attr']], [('Loose', 'char', 300, 30)])
+
+  def test_btagging_link_is_a_property(self):
+    jets = self.xAOD_Objects['AntiKt4EMTopoJets']
+    self.assertEqual(jets['attr'], [])
+    self.assertEqual([(item['name'], item['type']) for item in jets['prop']], [('btagging', 'xAOD::BTagging *')])
+
+  def test_classify_name(self):
+    self.assertEqual(dumpSG.classify_name('AntiKt10LCTopoAux.'), ('aux', 'AntiKt10LCTopo', None))
+    self.assertEqual(dumpSG.classify_name('AntiKt10LCTopoAuxDyn.Tau1'), ('attr', 'AntiKt10LCTopo', 'Tau1'))
+    self.assertEqual(dumpSG.classify_name('xAOD::Type::ObjectType'), (None, None, None))
+
+  def test_selector(self):
+    selector = dumpSG.LeafSelector(container_name='Electron*', property_name='p*')
+    xAOD_Objects = dumpSG.inspect_tree(memory_backend(), selector=selector)
+    self.assertEqual(sorted(xAOD_Objects), ['ElectronCollection'])
+    self.assertEqual([item['name'] for item in xAOD_Objects['ElectronCollection']['prop']], ['pt'])
+
+class MemoryBackendTest(unittest.TestCase):
+  def test_entries_and_clusters(self):
+    t = memory_backend()
+    self.assertEqual(t.entries(), 4)
+    self.assertEqual(t.clusters(), [(0, 3), (3, 4)])
+
+  def test_arrays(self):
+    chunks = list(memory_backend().arrays(['ElectronCollectionAux.pt', 'missing'], chunk_size=2, ranges=[(1, 4)]))
+    self.assertEqual(chunks, [{'ElectronCollectionAux.pt': [30.]}, {'ElectronCollectionAux.pt': [40., 50., 60.]}])
+
+  def test_fill_histograms(self):
+    items = [{'rootname': 'ElectronCollectionAux.pt'}, {'rootname': 'EventInfoAux.eventNumber'}, {'rootname': 'missing'}]
+    hists = memory_backend().fill_histograms(items, nbins=10)
+    self.assertEqual(sorted(hists), ['ElectronCollectionAux.pt', 'EventInfoAux.eventNumber'])
+    entries, mean, rms, counts_min, counts_max = sghist.hist_stats(hists['ElectronCollectionAux.pt'])
+    self.assertEqual(entries, 6)
+    self.assertAlmostEqual(mean, 35.)
+
+  def test_interface(self):
+    # a backend has to list the leaves, count the entries and read the arrays, the rest has defaults
+    self.assertRaises(TypeError, backends.ReaderBackend)
+
+  def test_extrema(self):
+    items = [{'rootname': 'ElectronCollectionAux.pt'}, {'rootname': 'EventInfoAux.eventNumber'}]
+    self.assertEqual(memory_backend().extrema(items, ranges=[(1, 3)]), {'ElectronCollectionAux.pt': (30., 30.), 'EventInfoAux.eventNumber': (8., 9.)})
+
+  def test_sample_ranges(self):
+    clusters = [(0, 10), (10, 20), (20, 30), (30, 40)]
+    self.assertEqual(backends.sample_ranges(clusters, 15, mode='first'), [(0, 10), (10, 15)])
+    self.assertEqual(backends.sample_ranges(clusters, 20, mode='spread'), [(0, 10), (20, 30)])
+
+  def test_sample_ranges_uneven_clusters(self):
+    # a large cluster on either side of ten small ones
+    clusters = [(0, 100)] + [(100 + 10*i, 110 + 10*i) for i in range(10)] + [(200, 300)]
+    self.assertEqual(backends.sample_ranges(clusters, 150, mode='spread'), [(0, 100), (200, 300)])
+    self.assertEqual(backends.sample_ranges(clusters, 60, mode='spread'), [(0, 100)])
+    ranges = backends.sample_ranges(clusters[1:-1], 50, mode='spread')
+    self.assertEqual(ranges, [(100, 110), (120, 130), (140, 150), (160, 170), (180, 190)])
+
+class ReportTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    dumpSG.args = dumpSG.make_parser().parse_args(['input.root', '--prop', '--attr', '--backend', 'uproot'])
+    self.t = memory_backend()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def report(self, **kwargs):
+    xAOD_Objects = dumpSG.filter_xAOD_objects(dumpSG.inspect_tree(self.t), dumpSG.args)
+    dumpSG.update_sizes(xAOD_Objects)
+    dumpSG.make_report(self.t, xAOD_Objects, directory=self.directory, formats=['json'], **kwargs)
+    with open(os.path.join(self.directory, 'info.json')) as f:
+      info = json.load(f)
+    return dict((item['rootname'], item) for containerVals in info.values() for kind in ['prop', 'attr'] for item in containerVals[kind])
+
+  def test_stats(self):
+    items = self.report()
+    pt = items['ElectronCollectionAux.pt']
+    self.assertEqual(pt['entries'], 6)
+    self.assertAlmostEqual(pt['mean'], 35.)
+    self.assertAlmostEqual(pt['rms'], (sum((value - 35.)**2 for value in [10., 20., 30., 40., 50., 60.])/6)**0.5)
+    charge = items['ElectronCollectionAux.charge']
+    self.assertEqual(charge['entries'], 6)
+    self.assertAlmostEqual(charge['mean'], 0.)
+    eventNumber = items['EventInfoAux.eventNumber']
+    self.assertEqual((eventNumber['entries'], eventNumber['mean']), (4, 8.5))
+
+  def test_no_values(self):
+    loose = self.report()['ElectronCollectionAuxDyn.Loose']
+    self.assertEqual((loose['entries'], loose['mean'], loose['rms']), (0, 0., 0.))
+    self.assertFalse(loose['drawable'])
+
+  def test_sample(self):
+    sample = dumpSG.choose_sample(self.t, dumpSG.parse_sample('2'), mode='first')
+    pt = self.report(sample=sample)['ElectronCollectionAux.pt']
+    self.assertEqual((pt['entries'], pt['mean']), (2, 15.))
+
+class FilesBackend(backends.MemoryBackend):
+  '''
+  the events of fixtures.py in two input files that can be opened on their own, like --backend uproot
+  '''
+  name = 'files'
+  # the first three events are in a.root, the last one in b.root
+  files = {'a.root': (0, 3), 'b.root': (3, 4)}
+
+  def __init__(self, tree_name, input_filenames):
+    self.input_filenames = list(input_filenames)
+    fileData = dict((rootname, sum([values[slice(*self.files[fname])] for fname in self.input_filenames], [])) for rootname, values in data.items())
+    super(FilesBackend, self).__init__(leaves, data=fileData, cluster_size=1)
+
+  def file_ranges(self):
+    ranges = []
+    offset = 0
+    for fname in self.input_filenames:
+      start, stop = self.files[fname]
+      ranges.append((fname, offset, offset + stop - start))
+      offset += stop - start
+    return ranges
+
+class SplitReportTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    dumpSG.reader_backends['files'] = FilesBackend
+    dumpSG.args = dumpSG.make_parser().parse_args(['a.root', 'b.root', '--prop', '--attr', '--backend', 'files'])
+
+  def tearDown(self):
+    dumpSG.reader_backends.pop('files')
+    shutil.rmtree(self.directory)
+
+  def report(self, **kwargs):
+    t = FilesBackend('CollectionTree', ['a.root', 'b.root'])
+    xAOD_Objects = dumpSG.filter_xAOD_objects(dumpSG.inspect_tree(t), dumpSG.args)
+    dumpSG.update_sizes(xAOD_Objects)
+    dumpSG.make_report(t, xAOD_Objects, directory=self.directory, formats=['json'], **kwargs)
+    with open(os.path.join(self.directory, 'info.json')) as f:
+      info = json.load(f)
+    return dict((item['rootname'], item) for containerVals in info.values() for kind in ['prop', 'attr'] for item in containerVals[kind])
+
+  def stats(self, items):
+    return dict((rootname, (item['entries'], item['mean'], item['rms'])) for rootname, item in items.items())
+
+  def test_units(self):
+    # a unit per file, or per cluster (of one event) of a.root once there are more jobs than files
+    t = FilesBackend('CollectionTree', ['a.root', 'b.root'])
+    self.assertEqual(t.split_events(2), [('a.root', 0, 3, None), ('b.root', 3, 4, None)])
+    self.assertEqual(t.split_events(3), [('a.root', 0, 2, [(0, 2)]), ('a.root', 2, 3, [(2, 3)]), ('b.root', 3, 4, None)])
+
+  def test_same_as_unsplit(self):
+    unsplit = self.stats(self.report())
+    self.assertEqual(unsplit['ElectronCollectionAux.pt'][:2], (6, 35.))
+    for jobs in [2, 3]:
+      split = self.stats(self.report(jobs=jobs, split='events'))
+      self.assertEqual(sorted(split), sorted(unsplit))
+      for rootname, (entries, mean, rms) in unsplit.items():
+        self.assertEqual(split[rootname][0], entries, rootname)
+        self.assertAlmostEqual(split[rootname][1], mean, msg=rootname)
+        self.assertAlmostEqual(split[rootname][2], rms, msg=rootname)
+
+def open_memory_backend(tree_name, input_filenames):
+  # stands in for --backend root, a dataset with a broken file fails like it would there
+  for fname in input_filenames:
+    if 'broken' in fname:
+      raise IOError('Could not open {0}'.format(fname))
+  return memory_backend()
+
+class ProcessTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    dumpSG.reader_backends['memory'] = open_memory_backend
+
+  def tearDown(self):
+    dumpSG.reader_backends.pop('memory')
+    shutil.rmtree(self.directory)
+
+  def parse_args(self, argv, batch=False):
+    return dumpSG.make_parser(batch=batch).parse_args(argv + ['--backend', 'memory', '--no-cache', '--prop', '--attr', '--report', '--plot-format', 'json', '--size', '-f', 'json'])
+
+  def test_process(self):
+    # the functions of a run read their options from the module-level args, like the __main__ block sets them
+    dumpSG.args = args = self.parse_args(['input.root', '--count-entries', '-d', self.directory, '-o', os.path.join(self.directory, 'info.json')])
+    entries, xAOD_Objects = dumpSG.process(args)
+    self.assertEqual(entries, 4)
+    self.assertEqual(sorted(xAOD_Objects), ['AntiKt4EMTopoJets', 'ElectronCollection', 'EventInfo'])
+    with open(os.path.join(self.directory, 'info.json')) as f:
+      info = json.load(f)
+    items = dict((item['rootname'], item) for containerVals in info.values() for kind in ['prop', 'attr'] for item in containerVals[kind])
+    self.assertEqual((items['ElectronCollectionAux.pt']['entries'], items['ElectronCollectionAux.pt']['mean']), (6, 35.))
+    # nothing to fill these from, so they went through the backend on their own
+    self.assertFalse(items['ElectronCollectionAuxDyn.Loose']['drawable'])
+    self.assertFalse(items['AntiKt4EMTopoJetsAuxDyn.btaggingLink']['drawable'])
+    for fname in ['sizes.json', 'sizes.csv', 'plots.json']:
+      self.assertTrue(os.path.isfile(os.path.join(self.directory, fname)), fname)
+
+  def test_expand_datasets(self):
+    for name in ['mc16_a', 'mc16_b']:
+      os.makedirs(os.path.join(self.directory, name))
+      for fname in ['1.root', '2.root']:
+        open(os.path.join(self.directory, name, fname), 'w').close()
+    datasets = dumpSG.expand_datasets([os.path.join(self.directory, 'mc16_a'),
+                                       os.path.join(self.directory, 'mc16_b', '*.root'),
+                                       'data=' + os.path.join(self.directory, 'mc16_b', '1.root'),
+                                       os.path.join(self.directory, 'mc16_a', '2.root')])
+    self.assertEqual([(name, [os.path.relpath(fname, self.directory) for fname in files]) for name, files in datasets],
+                     [('mc16_a', ['mc16_a/1.root', 'mc16_a/2.root']),
+                      ('mc16_b', ['mc16_b/1.root', 'mc16_b/2.root']),
+                      ('data', ['mc16_b/1.root']),
+                      ('mc16_a_2', ['mc16_a/2.root'])])
+
+  def test_batch(self):
+    results = []
+    for name, input_filenames in [('good', ['good.root']), ('broken', ['broken.root']), ('empty', [])]:
+      args = self.parse_args([], batch=True)
+      args.output_directory = os.path.join(self.directory, name)
+      args.output_filename = os.path.join(args.output_directory, 'info.json')
+      args.render_jobs = 0
+      results.append(dumpSG._batch_worker((name, input_filenames, args)))
+
+    # one bad dataset does not stop the others
+    self.assertEqual([(result['name'], result['status']) for result in results], [('good', 'ok'), ('broken', 'failed'), ('empty', 'failed')])
+    good, broken, empty = results
+    self.assertEqual(good['error'], None)
+    self.assertTrue(os.path.isfile(os.path.join(self.directory, 'good', 'info.json')))
+    self.assertTrue(os.path.isfile(os.path.join(self.directory, 'good', 'plots.json')))
+    self.assertEqual(good['containers']['ElectronCollection'], {'type': 'xAOD::ElectronContainer', 'filebytes': 660, 'totbytes': 2200})
+    self.assertTrue('IOError: Could not open broken.root' in broken['error'])
+    with open(os.path.join(self.directory, 'broken', 'dumpSG.log')) as f:
+      self.assertTrue('Could not open broken.root' in f.read())
+    self.assertTrue('No input files were found' in empty['error'])
+
+    dumpSG.write_batch_summary(results, self.directory)
+    with open(os.path.join(self.directory, 'summary.json')) as f:
+      summary = json.load(f)
+    self.assertEqual([dataset['status'] for dataset in summary['datasets']], ['ok', 'failed', 'failed'])
+    self.assertEqual(summary['containers']['EventInfo']['datasets'], {'good': {'filebytes': 55, 'totbytes': 110}})
+    with open(os.path.join(self.directory, 'summary.csv')) as f:
+      lines = f.read().splitlines()
+    # the largest container first
+    self.assertEqual(lines[:3], ['container,type,good,broken,empty',
+                                 'ElectronCollection,xAOD::ElectronContainer,660,,',
+                                 'AntiKt4EMTopoJets,,200,,'])
+
+@unittest.skipIf(uproot is None, 'needs uproot3, numpy and awkward0')
+class UprootBackendTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.filename = os.path.join(self.directory, 'input.root')
+    with uproot.recreate(self.filename) as f:
+      f['CollectionTree'] = uproot.newtree({'EventInfoAux.eventNumber': 'i8', 'ElectronCollectionAux.pt': uproot.newbranch(numpy.dtype('>f4'), size='n')})
+      f['CollectionTree'].extend({'EventInfoAux.eventNumber': numpy.array([7, 8, 9, 10]),
+                                  'ElectronCollectionAux.pt': awkward0.JaggedArray.fromiter(data['ElectronCollectionAux.pt']),
+                                  'n': numpy.array([2, 0, 1, 3], dtype='>i4')})
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_leaves(self):
+    t = backends.UprootBackend('CollectionTree', [self.filename])
+    types = dict((name, elType) for name, elType, totbytes, filebytes in t.leaves())
+    self.assertEqual(types['ElectronCollectionAux.pt'], 'Float_t')
+    self.assertEqual(types['EventInfoAux.eventNumber'], 'Long64_t')
+
+  def test_two_files(self):
+    t = backends.UprootBackend('CollectionTree', [self.filename, self.filename])
+    self.assertEqual(t.entries(), 8)
+    self.assertEqual(t.file_ranges(), [(self.filename, 0, 4), (self.filename, 4, 8)])
+    values = [value for chunk in t.arrays(['ElectronCollectionAux.pt'], ranges=[(2, 6)]) for value in chunk['ElectronCollectionAux.pt']]
+    self.assertEqual(values, [30., 40., 50., 60., 10., 20.])
+    hists = t.fill_histograms([{'rootname': 'ElectronCollectionAux.pt'}], nbins=5)
+    self.assertEqual(sghist.hist_stats(hists['ElectronCollectionAux.pt'])[:2], (12, 35.))
+
+  def test_profile(self):
+    t = backends.UprootBackend('CollectionTree', [self.filename])
+    profile = t.profile_branch('ElectronCollectionAux.pt')
+    self.assertEqual(profile['baskets'], 1)
+    self.assertTrue(profile['bytes_read'] > 0)
+    self.assertEqual(t.profile_branch('missing'), None)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,85 @@
+'''
+  sgaccess.py against the schema of the in-memory tree: the bytes a job reads, the part of them
+  it uses, and reading the lists of branches from job logs.
+
+  python -m unittest discover tests
+'''
+import os, sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import dumpSG
+import sgaccess
+import sgschema
+from fixtures import memory_backend
+
+# what a job using the electron pt and the event number read, with a typo and a container it does not have
+used = ['ElectronCollectionAux.pt', 'EventInfoAux.eventNumber', 'Muons*']
+read = ['ElectronCollectionAux.pt', 'ElectronCollectionAux.charge', 'ElectronCollectionAux.ptt']
+
+class AccessReportTest(unittest.TestCase):
+  def setUp(self):
+    # the views of a run, with the sizes including their properties and attributes, see dumpSG.process()
+    self.xAOD_Objects = dict((k, sgschema.ContainerView(v)) for k, v in dumpSG.inspect_tree(memory_backend()).items())
+    dumpSG.update_sizes(self.xAOD_Objects)
+
+  def unread(self, report):
+    return sorted(rootname for node in report['containers'].values() for rootname, branch in node['branches'].items() if not branch['read'])
+
+  def test_read_and_used(self):
+    report = sgaccess.access_report(self.xAOD_Objects, used, read=read, read_time=10.)
+    # the interface and Aux. branches of the electrons (50+80) and the event info (5+10) are used with their branches
+    self.assertEqual(report['filebytes'], 915)
+    self.assertEqual(report['read'], 130+400+100 + 15+40)
+    self.assertEqual(report['used'], 130+400 + 15+40)
+    self.assertEqual(report['unused'], 100)
+    self.assertEqual(report['slimmed'], report['used'])
+    self.assertAlmostEqual(report['projected_read_time'], 10.*585/685)
+    self.assertEqual(self.unread(report), ['AntiKt4EMTopoJetsAuxDyn.btaggingLink', 'ElectronCollectionAuxDyn.Loose'])
+    self.assertEqual(report['used_not_read'], ['EventInfoAux.eventNumber'])
+    self.assertEqual(report['unmatched'], {'used': ['Muons*'], 'read': ['ElectronCollectionAux.ptt']})
+
+  def test_containers(self):
+    containers = sgaccess.access_report(self.xAOD_Objects, used, read=read)['containers']
+    electrons = containers['ElectronCollection']
+    self.assertEqual([electrons[key] for key in ['filebytes', 'read', 'used', 'unused']], [660, 630, 530, 100])
+    self.assertEqual(electrons['branches']['ElectronCollectionAux.charge'], {'filebytes': 100, 'read': True, 'used': False, 'wall': None})
+    jets = containers['AntiKt4EMTopoJets']
+    self.assertEqual([jets[key] for key in ['filebytes', 'read', 'used', 'unused']], [200, 0, 0, 0])
+    self.assertEqual(jets['interface'], {'filebytes': 0, 'read': False, 'used': False})
+
+  def test_everything_read(self):
+    # without records of what was read, the job read every branch
+    report = sgaccess.access_report(self.xAOD_Objects, used)
+    self.assertEqual((report['read'], report['used'], report['unused']), (915, 585, 330))
+    self.assertEqual(self.unread(report), [])
+    self.assertEqual(report['used_not_read'], [])
+    self.assertEqual(sgaccess.by_unused(report['containers'])[0][0], 'AntiKt4EMTopoJets')
+
+class LoadRecordsTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def load(self, content):
+    path = os.path.join(self.directory, 'records')
+    with open(path, 'w') as f:
+      f.write(content)
+    return sgaccess.load_records(path)
+
+  def test_json(self):
+    self.assertEqual(self.load('["ElectronCollectionAux.pt", "EventInfoAux.eventNumber"]'), ['ElectronCollectionAux.pt', 'EventInfoAux.eventNumber'])
+    self.assertEqual(self.load('{"ElectronCollectionAux.pt": 12}'), ['ElectronCollectionAux.pt'])
+
+  def test_log(self):
+    names = self.load('# the branches of the cache\nBranch: ElectronCollectionAux.pt, (entries=4)\nEventInfoAux.eventNumber.\n')
+    matched, unmatched = sgaccess.match(names, ['ElectronCollectionAux.pt', 'EventInfoAux.eventNumber'])
+    self.assertEqual(matched, set(['ElectronCollectionAux.pt', 'EventInfoAux.eventNumber']))
+    self.assertEqual(unmatched, [])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,75 @@
+'''
+  Tests of reading back the dumps that dumpSG.py diff compares, and of comparing them, see scripts/sgdiff.py.
+
+  python -m unittest discover tests
+'''
+import os, sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import sgdiff
+
+electrons = {'type': 'xAOD::ElectronContainer', 'rootname': 'ElectronCollection', 'prop': [{'name': 'pt', 'type': 'float'}], 'attr': []}
+jets = {'type': 'xAOD::JetContainer', 'rootname': 'AntiKt4EMTopoJets', 'prop': [], 'attr': []}
+
+class LoadDumpTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def write(self, name, lines):
+    path = os.path.join(self.directory, name)
+    with open(path, 'w') as f:
+      f.write('\n'.join(lines) + '\n')
+    return path
+
+  def jsonl_line(self, name, containerVals):
+    return json.dumps(dict(containerVals, container=name))
+
+  def test_json(self):
+    path = self.write('info.json', [json.dumps({'ElectronCollection': electrons, 'AntiKt4EMTopoJets': jets})])
+    self.assertEqual(sorted(sgdiff.load_dump(path)), ['AntiKt4EMTopoJets', 'ElectronCollection'])
+
+  def test_jsonl(self):
+    path = self.write('info.jsonl', [self.jsonl_line('ElectronCollection', electrons), self.jsonl_line('AntiKt4EMTopoJets', jets)])
+    self.assertEqual(sgdiff.load_dump(path), {'ElectronCollection': electrons, 'AntiKt4EMTopoJets': jets})
+
+  def test_jsonl_one_container(self):
+    # e.g. a dump filtered with -c, which is a single json object as well
+    path = self.write('info.jsonl', [self.jsonl_line('ElectronCollection', electrons)])
+    self.assertEqual(sgdiff.load_dump(path), {'ElectronCollection': electrons})
+
+  def test_json_with_a_container_named_container(self):
+    path = self.write('info.json', [json.dumps({'container': jets})])
+    self.assertEqual(sgdiff.load_dump(path), {'container': jets})
+
+class DiffTest(unittest.TestCase):
+  def test_branches(self):
+    electronsB = dict(electrons, prop=[{'name': 'pt', 'type': 'double'}, {'name': 'eta', 'type': 'float'}], attr=[{'name': 'Loose', 'type': 'char'}])
+    diff = sgdiff.diff_xAOD_objects({'ElectronCollection': electrons, 'AntiKt4EMTopoJets': jets}, {'ElectronCollection': electronsB})
+    self.assertEqual(diff['removed'], {'AntiKt4EMTopoJets': 'xAOD::JetContainer'})
+    self.assertEqual(diff['changed']['ElectronCollection'], {'added': [{'kind': 'attr', 'name': 'Loose', 'type': 'char'}, {'kind': 'prop', 'name': 'eta', 'type': 'float'}],
+                                                             'removed': [],
+                                                             'retyped': [{'kind': 'prop', 'name': 'pt', 'from': 'float', 'to': 'double'}]})
+    self.assertEqual(diff['not_compared'], [])
+
+  def test_listed_on_one_side(self):
+    # a dump written with --prop only, against a ROOT file, which lists every property and attribute
+    dump = dict((k, v) for k, v in electrons.items() if k != 'attr')
+    rootFile = dict(electrons, prop=[{'name': 'pt', 'type': 'float'}, {'name': 'eta', 'type': 'float'}], attr=[{'name': 'Loose', 'type': 'char'}])
+    diff = sgdiff.diff_xAOD_objects({'ElectronCollection': dump}, {'ElectronCollection': rootFile})
+    self.assertEqual(diff['changed']['ElectronCollection']['added'], [{'kind': 'prop', 'name': 'eta', 'type': 'float'}])
+    self.assertEqual(diff['not_compared'], ['attr'])
+    # neither is listed in a dump written without --prop/--attr
+    bare = dict((k, v) for k, v in electrons.items() if k not in ['prop', 'attr'])
+    diff = sgdiff.diff_xAOD_objects({'ElectronCollection': rootFile}, {'ElectronCollection': bare})
+    self.assertEqual(diff['changed'], {})
+    self.assertEqual(diff['not_compared'], ['attr', 'prop'])
+
+if __name__ == '__main__':
+  unittest.main()
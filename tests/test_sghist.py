@@ -0,0 +1,97 @@
+'''
+  Tests of the ROOT-free histograms, see scripts/sghist.py.
+
+  python -m unittest discover tests
+'''
+import os, sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import sghist
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+class HistogramTest(unittest.TestCase):
+  def test_range_from_first_chunk(self):
+    hist = sghist.Histogram(nbins=4)
+    hist.fill([0., 1., 2., 4.])
+    hist.fill([-1., 5.])
+    h = hist.to_dict()
+    self.assertEqual((h['xmin'], h['xmax']), (0., 4.))
+    # the upper edge belongs to the last bin, later values outside of the range go to underflow/overflow
+    self.assertEqual(h['contents'], [1., 1., 1., 1., 1., 1.])
+    self.assertEqual(h['entries'], 6)
+
+  def test_single_value(self):
+    hist = sghist.Histogram(nbins=2)
+    hist.fill([3., 3.])
+    h = hist.to_dict()
+    self.assertEqual((h['xmin'], h['xmax']), (2., 4.))
+    self.assertEqual(h['contents'], [0., 0., 2., 0.])
+
+  def test_limits(self):
+    hist = sghist.Histogram(nbins=2, limits=(0., 10.))
+    hist.fill([1., 2.])
+    hist.fill([6., 11.])
+    self.assertEqual(hist.to_dict()['contents'], [0., 2., 1., 1.])
+
+  def test_stats(self):
+    values = [1., 2., 3., 4., 10.]
+    hist = sghist.Histogram()
+    hist.fill(values)
+    entries, mean, rms, counts_min, counts_max = sghist.hist_stats(hist.to_dict())
+    self.assertEqual(entries, 5)
+    self.assertAlmostEqual(mean, 4.)
+    self.assertAlmostEqual(rms, (sum((value - 4.)**2 for value in values)/5)**0.5)
+    self.assertEqual((counts_min, counts_max), (1., 1.))
+
+  def test_empty_stats(self):
+    self.assertEqual(sghist.hist_stats(sghist.Histogram().to_dict()), (0, 0., 0., sghist.FLT_MAX, 0.))
+
+  @unittest.skipIf(numpy is None, 'needs numpy')
+  def test_numpy_like_lists(self):
+    values = [0.5, 1., 7.25, 3., 3., -2., 9.]
+    fromList, fromArray = sghist.Histogram(nbins=7), sghist.Histogram(nbins=7)
+    fromList.fill(values[:4])
+    fromList.fill(values[4:])
+    fromArray.fill(numpy.array(values[:4]))
+    fromArray.fill(numpy.array(values[4:]))
+    self.assertEqual(fromList.to_dict(), fromArray.to_dict())
+
+  def test_flatten(self):
+    self.assertEqual(sghist.flatten([[1, 2], [], [3, [4]], 5]), [1, 2, 3, 4, 5])
+
+class MergeTest(unittest.TestCase):
+  def test_merge_is_one_pass(self):
+    chunks = [[1., 2., 2.5], [], [9., 0.], [4.]]
+    limits = sghist.common_range(0., 9., nbins=10)
+    whole = sghist.Histogram(nbins=10, limits=limits)
+    partials = []
+    for chunk in chunks:
+      whole.fill(chunk)
+      partial = sghist.Histogram(nbins=10, limits=limits)
+      partial.fill(chunk)
+      partials.append(partial.to_dict())
+    self.assertEqual(sghist.merge([None] + partials), whole.to_dict())
+
+  def test_largest_value_in_last_bin(self):
+    xmin, xmax = sghist.common_range(0., 9., nbins=10)
+    self.assertTrue(xmax > 9.)
+    hist = sghist.Histogram(nbins=10, limits=(xmin, xmax))
+    hist.fill([9.])
+    self.assertEqual(hist.to_dict()['contents'][10], 1.)
+
+  def test_different_bins(self):
+    a, b = sghist.Histogram(nbins=2), sghist.Histogram(nbins=2)
+    a.fill([0., 1.])
+    b.fill([5., 9.])
+    self.assertRaises(ValueError, sghist.merge, [a.to_dict(), b.to_dict()])
+
+  def test_nothing(self):
+    self.assertEqual(sghist.merge([None, None]), None)
+
+if __name__ == '__main__':
+  unittest.main()
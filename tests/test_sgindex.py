@@ -0,0 +1,97 @@
+'''
+  The SQLite index of sgindex.BranchIndex, filled with two releases of the tree of fixtures.py:
+  adding and removing datasets, and finding which of them have a container or a branch.
+
+  python -m unittest discover tests
+'''
+import os, sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import backends
+import dumpSG
+import sgindex
+import sgschema
+from fixtures import leaves
+
+# a later release of the same sample, with an isolation variable and taus
+release = leaves + [('ElectronCollectionAuxDyn.ptvarcone20', 'vector<float>', 400, 100),
+                    ('TauJets', 'DataVector<xAOD::TauJet_v3>', 60, 30),
+                    ('TauJetsAux.', 'xAOD::TauJetAuxContainer_v3', 40, 20),
+                    ('TauJetsAuxDyn.Tau1', 'vector<float>', 700, 300)]
+
+def schema(datasetLeaves):
+  # the containers of a dataset, the way dumpSG.py batch --index adds them
+  views = dict((k, sgschema.ContainerView(v)) for k, v in dumpSG.inspect_tree(backends.MemoryBackend(datasetLeaves)).items())
+  dumpSG.update_sizes(views)
+  return sgschema.as_dict(views)
+
+class BranchIndexTest(unittest.TestCase):
+  def setUp(self):
+    self.index = sgindex.BranchIndex(':memory:')
+    # added out of the order of their names
+    self.index.add('mc16_13TeV.r10201', schema(release), entries=4, files=2, source='/data/r10201/*.root')
+    self.index.add('Data18.r9999', schema(leaves), entries=2, files=1)
+
+  def tearDown(self):
+    self.index.close()
+
+  def find(self, pattern, **kwargs):
+    return [(match['dataset'], match['kind'], match['container'], match['name']) for match in self.index.find(pattern, **kwargs)]
+
+  def test_datasets(self):
+    datasets = self.index.datasets()
+    self.assertEqual([(dataset['name'], dataset['containers'], dataset['files'], dataset['entries']) for dataset in datasets],
+                     [('Data18.r9999', 3, 1, 2), ('mc16_13TeV.r10201', 4, 2, 4)])
+    self.assertEqual([dataset['name'] for dataset in self.index.datasets('mc16*')], ['mc16_13TeV.r10201'])
+
+  def test_substring(self):
+    # ignoring case, the datasets of each match in the order of their names
+    self.assertEqual(self.find('PT'), [('Data18.r9999', 'prop', 'ElectronCollection', 'pt'),
+                                       ('mc16_13TeV.r10201', 'prop', 'ElectronCollection', 'pt'),
+                                       ('mc16_13TeV.r10201', 'attr', 'ElectronCollection', 'ptvarcone20')])
+    self.assertEqual(self.find('tau'), [('mc16_13TeV.r10201', 'attr', 'TauJets', 'Tau1'),
+                                        ('mc16_13TeV.r10201', 'container', 'TauJets', 'TauJets')])
+
+  def test_glob(self):
+    self.assertEqual(self.find('p?'), [('Data18.r9999', 'prop', 'ElectronCollection', 'pt'),
+                                       ('mc16_13TeV.r10201', 'prop', 'ElectronCollection', 'pt')])
+    self.assertEqual(self.find('*cone[0-9]0'), [('mc16_13TeV.r10201', 'attr', 'ElectronCollection', 'ptvarcone20')])
+    self.assertEqual(self.find('[!e]vent*'), [])
+    self.assertEqual(self.find('electron*', kinds=['container']), [('Data18.r9999', 'container', 'ElectronCollection', 'ElectronCollection'),
+                                                                  ('mc16_13TeV.r10201', 'container', 'ElectronCollection', 'ElectronCollection')])
+
+  def test_filters(self):
+    self.assertEqual(self.find('pt', kinds=['attr']), [('mc16_13TeV.r10201', 'attr', 'ElectronCollection', 'ptvarcone20')])
+    self.assertEqual(self.find('pt', dataset='data*'), [('Data18.r9999', 'prop', 'ElectronCollection', 'pt')])
+    self.assertEqual(self.find('*', container='EventInfo', kinds=['prop', 'attr']), [('Data18.r9999', 'prop', 'EventInfo', 'eventNumber'),
+                                                                                     ('mc16_13TeV.r10201', 'prop', 'EventInfo', 'eventNumber')])
+    self.assertEqual(len(self.find('*', limit=3)), 3)
+    self.assertRaises(sgindex.BranchIndexError, self.index.find, '')
+    self.assertRaises(sgindex.BranchIndexError, self.index.find, 'pt', kinds=[])
+
+  def test_sizes(self):
+    match = self.index.find('ptvarcone20')[0]
+    self.assertEqual((match['type'], match['rootname'], match['filebytes'], match['totbytes'], match['entries']),
+                     ('float', 'ElectronCollectionAuxDyn.ptvarcone20', 100, 400, 4))
+    # the sizes of a container include its properties and attributes
+    taus = self.index.find('TauJets', kinds=['container'])[0]
+    self.assertEqual((taus['type'], taus['filebytes'], taus['totbytes']), ('xAOD::TauJetContainer', 350, 800))
+
+  def test_replace_and_remove(self):
+    self.index.add('Data18.r9999', schema(release))
+    self.assertEqual([match['dataset'] for match in self.index.find('Tau1')], ['Data18.r9999', 'mc16_13TeV.r10201'])
+    self.assertTrue(self.index.remove('mc16_13TeV.r10201'))
+    self.assertFalse(self.index.remove('mc16_13TeV.r10201'))
+    self.assertEqual([dataset['name'] for dataset in self.index.datasets()], ['Data18.r9999'])
+    self.assertEqual(self.find('ptvarcone20'), [('Data18.r9999', 'attr', 'ElectronCollection', 'ptvarcone20')])
+
+  def test_format_matches(self):
+    text = sgindex.format_matches(self.index.find('p?'))
+    self.assertEqual([line.split()[:3] for line in text.splitlines()],
+                     [['prop', 'ElectronCollection.pt', 'float'], ['Data18.r9999', '400', 'on'], ['mc16_13TeV.r10201', '400', 'on']])
+    self.assertTrue('in 2 datasets' in text.splitlines()[0])
+    self.assertEqual(sgindex.format_matches([]), '  (nothing)')
+
+if __name__ == '__main__':
+  unittest.main()
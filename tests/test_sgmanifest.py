@@ -0,0 +1,115 @@
+'''
+  A report cut short and run again: what the manifest in the report directory lets it skip,
+  and when it has to start over because the input files changed.
+
+  python -m unittest discover tests
+'''
+import os, sys
+import argparse
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import backends
+import dumpSG
+import sgcache
+import sgmanifest
+from fixtures import leaves, data
+
+# the branches the report reads, some have nothing to fill their histograms with
+branches = ['AntiKt4EMTopoJetsAuxDyn.btaggingLink', 'ElectronCollectionAux.charge', 'ElectronCollectionAux.pt', 'ElectronCollectionAuxDyn.Loose', 'EventInfoAux.eventNumber']
+# what a report that crashed in the middle of the event info got to record
+finished = ['AntiKt4EMTopoJetsAuxDyn.btaggingLink', 'ElectronCollectionAux.charge', 'ElectronCollectionAux.pt', 'ElectronCollectionAuxDyn.Loose']
+
+class CountingBackend(backends.MemoryBackend):
+  '''
+  the memory backend, keeping track of the branches it is asked to fill
+  '''
+  def __init__(self):
+    super(CountingBackend, self).__init__(leaves, data=data, cluster_size=3)
+    self.filled = []
+
+  def fill_histograms(self, items, nbins=100, ranges=None, binning=None):
+    self.filled.extend(item['rootname'] for item in items)
+    return super(CountingBackend, self).fill_histograms(items, nbins=nbins, ranges=ranges, binning=binning)
+
+class ResumeTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.report_directory = os.path.join(self.directory, 'report')
+    self.input_filename = os.path.join(self.directory, 'input.root')
+    with open(self.input_filename, 'w') as f:
+      f.write('a stand-in for the input file')
+    # the colours of the plots, which the manifest keeps to know if they would come out differently
+    dumpSG.args = argparse.Namespace(no_entries='kRed', no_rms='kYellow', no_mean='kOrange')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def manifest(self):
+    return sgmanifest.ReportManifest(self.report_directory, inputs=sgcache.cache_key('CollectionTree', [self.input_filename], mode='report:memory'), settings={'nbins': 100, 'ranges': None})
+
+  def report(self):
+    '''
+    run the report, returns the backend it read with and the statistics of every branch in info.json
+    '''
+    t = CountingBackend()
+    xAOD_Objects = dumpSG.inspect_tree(t)
+    dumpSG.make_report(t, xAOD_Objects, directory=self.report_directory, manifest=self.manifest(), formats=['json'])
+    with open(os.path.join(self.report_directory, 'info.json')) as f:
+      info = json.load(f)
+    return (t, dict((item['rootname'], item) for containerVals in info.values() for kind in ['prop', 'attr'] for item in containerVals[kind]))
+
+  def crash_after(self, rootnames):
+    # a report that crashed only got to record some of the branches, the manifest is not compacted
+    path = os.path.join(self.report_directory, sgmanifest.ReportManifest.filename)
+    with open(path) as f:
+      lines = [line for line in f if list(json.loads(line))[0] in rootnames]
+    with open(path, 'w') as f:
+      f.writelines(lines)
+      # the last line can be cut short
+      f.write('{"EventInfoAux.eventNumber": {"fingerp')
+
+  def test_resume_after_crash(self):
+    t, first = self.report()
+    self.assertEqual(sorted(t.filled), branches)
+
+    self.crash_after(finished)
+    t, resumed = self.report()
+    # the electrons and jets were done, so only the event info is filled again
+    self.assertEqual(t.filled, ['EventInfoAux.eventNumber'])
+    for rootname in ['ElectronCollectionAux.pt', 'ElectronCollectionAux.charge', 'EventInfoAux.eventNumber']:
+      self.assertEqual([resumed[rootname][k] for k in ['entries', 'mean', 'rms', 'drawable']], [first[rootname][k] for k in ['entries', 'mean', 'rms', 'drawable']])
+
+  def test_done_containers(self):
+    self.report()
+    self.crash_after(finished)
+    t = CountingBackend()
+    xAOD_Objects = dumpSG.inspect_tree(t)
+    manifest = self.manifest()
+    manifest.render = [False, dumpSG.root_available(), dumpSG.args.no_entries, dumpSG.args.no_rms, dumpSG.args.no_mean]
+    done, hists = dumpSG.resume_report(xAOD_Objects, manifest, directory=self.report_directory, formats=['json'])
+    self.assertEqual(done, set(['AntiKt4EMTopoJets', 'ElectronCollection']))
+    # plots.json still needs the plots of the containers that are done
+    self.assertEqual(sorted(hists), ['ElectronCollectionAux.charge', 'ElectronCollectionAux.pt'])
+    self.assertEqual(xAOD_Objects['ElectronCollection']['drawn'], 2)
+
+  def test_changed_input(self):
+    self.report()
+    with open(self.input_filename, 'a') as f:
+      f.write(', with more events')
+    t, items = self.report()
+    self.assertEqual(sorted(t.filled), branches)
+
+  def test_no_inputs(self):
+    # e.g. remote files, which cannot be fingerprinted
+    manifest = sgmanifest.ReportManifest(self.report_directory, inputs=None)
+    item = {'rootname': 'ElectronCollectionAux.pt', 'type': 'float'}
+    manifest.record([(item, None, None)])
+    self.assertEqual(manifest.lookup(item), None)
+    self.assertFalse(os.path.exists(manifest.path))
+
+if __name__ == '__main__':
+  unittest.main()
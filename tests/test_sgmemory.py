@@ -0,0 +1,115 @@
+'''
+  The RSS ceiling of --max-rss: when sgmemory.MemoryGuard asks for a recycle, and where the
+  report samples the RSS, with current_rss() replaced by a given series of values.
+
+  python -m unittest discover tests -p test_sgmemory.py
+'''
+import os, sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import backends
+import dumpSG
+import sgmemory
+from fixtures import leaves, data
+
+MB = 1024**2
+
+class MemoryGuardTest(unittest.TestCase):
+  def test_no_ceiling(self):
+    guard = sgmemory.MemoryGuard()
+    for label, rss in [('ElectronCollection', 300*MB), ('EventInfo', 500*MB), ('TauJets', 400*MB)]:
+      self.assertFalse(guard.sample(label, rss=rss))
+    self.assertEqual((guard.peak, guard.samples, guard.last), (('EventInfo', 500*MB), 3, 400*MB))
+    self.assertEqual(guard.summary(), 'Peak RSS of the report: 500.0 MB (after EventInfo, 3 samples)')
+
+  def test_ceiling(self):
+    guard = sgmemory.MemoryGuard(max_rss=200*MB)
+    self.assertFalse(guard.sample('ElectronCollection', rss=150*MB))
+    self.assertTrue(guard.sample('EventInfo', rss=250*MB))
+    # what is left after recycling cannot be given back, so it takes a margin above it to ask again
+    guard.recycled += 1
+    guard.recycled_to(220*MB)
+    self.assertTrue(guard.warned)
+    self.assertFalse(guard.sample('TauJets', rss=225*MB))
+    self.assertTrue(guard.sample('Muons', rss=220*MB + guard.margin*200*MB + 1))
+    self.assertEqual(guard.summary(), 'Peak RSS of the report: 250.0 MB (after EventInfo, 4 samples), recycled 1 times to stay under 200 MB')
+
+  def test_restarted(self):
+    guard = sgmemory.MemoryGuard(max_rss=200*MB, name='plot renderer')
+    self.assertTrue(guard.sample('report/ElectronCollection/pt.pdf', rss=300*MB))
+    guard.restarted('report/ElectronCollection/pt.pdf')
+    # the first sample of the fresh workers is the new floor
+    self.assertFalse(guard.sample('report/EventInfo/eventNumber.pdf', rss=120*MB))
+    self.assertEqual((guard.floor, guard.recycled, guard.restarting), (120*MB, 1, False))
+
+class RecordingGuard(sgmemory.MemoryGuard):
+  # every guard of the report, with the labels it sampled
+  guards = []
+
+  def __init__(self, *args, **kwargs):
+    super(RecordingGuard, self).__init__(*args, **kwargs)
+    self.labels = []
+    RecordingGuard.guards.append(self)
+
+  def sample(self, label, rss=None):
+    self.labels.append(label)
+    return super(RecordingGuard, self).sample(label, rss=rss)
+
+class RecyclingBackend(backends.MemoryBackend):
+  def __init__(self):
+    super(RecyclingBackend, self).__init__(leaves, data=data, cluster_size=3)
+    self.recycles = 0
+
+  def recycle(self):
+    self.recycles += 1
+
+class ReportMemoryTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    dumpSG.args = dumpSG.make_parser().parse_args(['input.root', '--prop', '--attr'])
+    RecordingGuard.guards = []
+    self.MemoryGuard, self.current_rss = sgmemory.MemoryGuard, sgmemory.current_rss
+    sgmemory.MemoryGuard = RecordingGuard
+
+  def tearDown(self):
+    sgmemory.MemoryGuard, sgmemory.current_rss = self.MemoryGuard, self.current_rss
+    shutil.rmtree(self.directory)
+
+  def report(self, rss, max_rss=0):
+    '''
+    run the report with the RSS going through the given values in MB, returns the backend and info.json
+    '''
+    values = iter(rss)
+    sgmemory.current_rss = lambda: next(values)*MB
+    t = RecyclingBackend()
+    xAOD_Objects = dumpSG.filter_xAOD_objects(dumpSG.inspect_tree(t), dumpSG.args)
+    dumpSG.update_sizes(xAOD_Objects)
+    dumpSG.make_report(t, xAOD_Objects, directory=self.directory, formats=['json'], max_rss=max_rss*MB)
+    with open(os.path.join(self.directory, 'info.json')) as f:
+      return (t, json.load(f))
+
+  def test_sampled_per_container(self):
+    t, info = self.report([100, 120, 180, 150])
+    guard, = [guard for guard in RecordingGuard.guards if guard.name == 'report']
+    # once the histograms are filled, then after each container in turn
+    self.assertEqual(guard.labels, ['fill_histograms', 'AntiKt4EMTopoJets', 'ElectronCollection', 'EventInfo'])
+    self.assertEqual(guard.peak, ('ElectronCollection', 180*MB))
+    self.assertEqual(t.recycles, 0)
+
+  def test_recycled_over_ceiling(self):
+    # the RSS after each sample, and after each recycling
+    t, info = self.report([100, 200, 80, 120, 160, 90], max_rss=150)
+    guard, = [guard for guard in RecordingGuard.guards if guard.name == 'report']
+    self.assertEqual(t.recycles, 2)
+    self.assertEqual((guard.recycled, guard.floor, guard.warned), (2, 90*MB, False))
+    # recycling the backend does not change what the report finds
+    items = dict((item['rootname'], item) for containerVals in info.values() for item in containerVals['prop'])
+    self.assertEqual((items['ElectronCollectionAux.pt']['entries'], items['ElectronCollectionAux.pt']['mean']), (6, 35.))
+    self.assertEqual(items['EventInfoAux.eventNumber']['mean'], 8.5)
+
+if __name__ == '__main__':
+  unittest.main()
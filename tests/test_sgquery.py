@@ -0,0 +1,109 @@
+'''
+  A QuerySession over the in-memory tree, with the heavy queries answered in the same process,
+  and the same session served on a Unix socket in a thread.
+
+  python -m unittest discover tests
+'''
+import os, sys
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import dumpSG
+import sgquery
+import sgschema
+from fixtures import memory_backend
+
+class Result(object):
+  '''
+  a heavy query answered right away, like multiprocessing's AsyncResult once it is done
+  '''
+  def __init__(self, fn, *args):
+    try:
+      self.value, self.error = fn(*args), None
+    except Exception as e:
+      self.value, self.error = None, e
+
+  def ready(self):
+    return True
+
+  def get(self):
+    if self.error is not None:
+      raise self.error
+    return self.value
+
+def session(submit=True, entries=None):
+  # the containers of an interactive session, with every property and attribute, see dumpSG.interactive()
+  t = memory_backend()
+  views = dict((k, sgschema.ContainerView(v)) for k, v in dumpSG.inspect_tree(t).items())
+  dumpSG.update_sizes(views)
+  def run(kind, item):
+    # the chain the worker keeps open, see dumpSG._init_report_worker()
+    dumpSG.t = t
+    return dumpSG._query_worker(kind, item)
+  return sgquery.QuerySession(views, entries=entries, submit=(lambda kind, argument: Result(run, kind, argument)) if submit else None)
+
+class QuerySessionTest(unittest.TestCase):
+  def test_find(self):
+    reply = session().query('find P*')
+    self.assertEqual([(match['kind'], match['container'], match['name']) for match in reply['matches']], [('prop', 'ElectronCollection', 'pt')])
+    reply = session().query('find electron')
+    self.assertEqual([(match['kind'], match['name']) for match in reply['matches']], [('container', 'ElectronCollection')])
+
+  def test_show_and_size(self):
+    reply = session(entries=4).query('show electroncollection')
+    self.assertEqual((reply['container'], reply['filebytes'], reply['totbytes']), ('ElectronCollection', 660, 2200))
+    self.assertEqual([item['name'] for item in reply['prop']], ['charge', 'pt'])
+    reply = session(entries=4).query('size Electron')
+    self.assertEqual(reply['sizes'][0]['filebytes_per_event'], 165.)
+
+  def test_heavy(self):
+    s = session()
+    # the events are counted as soon as the session starts
+    self.assertEqual(s.entries(), 4)
+    reply = s.query('stats ElectronCollection.pt')
+    self.assertEqual((reply['rootname'], reply['entries'], reply['mean']), ('ElectronCollectionAux.pt', 6, 35.))
+    self.assertEqual(s.query('stats ElectronCollectionAuxDyn.Loose')['error'], 'ElectronCollectionAuxDyn.Loose could not be read')
+    self.assertEqual([job['query'] for job in s.query('jobs')['jobs']], ['entries', 'stats ElectronCollectionAux.pt', 'stats ElectronCollectionAuxDyn.Loose'])
+
+  def test_errors(self):
+    self.assertTrue('Unknown query' in session().query('frobnicate')['error'])
+    self.assertTrue('No branch' in session().query('stats Electron.eta')['error'])
+    self.assertTrue('cannot do' in session(submit=False).query('entries')['error'])
+    self.assertTrue('find needs a pattern' in session().query('find')['error'])
+
+class QueryServerTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'dumpSG.sock')
+    self.server = sgquery.serve(session(), self.path)
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.daemon = True
+    self.thread.start()
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    shutil.rmtree(self.directory)
+
+  def test_queries(self):
+    # a line of JSON for each query, on the same connection
+    replies = sgquery.send(self.path, ['containers', 'find Loose', 'stats EventInfoAux.eventNumber'])
+    self.assertEqual([reply['query'] for reply in replies], ['containers', 'find Loose', 'stats EventInfoAux.eventNumber'])
+    self.assertEqual([container['container'] for container in replies[0]['containers']], ['AntiKt4EMTopoJets', 'ElectronCollection', 'EventInfo'])
+    self.assertEqual([match['rootname'] for match in replies[1]['matches']], ['ElectronCollectionAuxDyn.Loose'])
+    self.assertEqual((replies[2]['entries'], replies[2]['mean']), (4, 8.5))
+    self.assertTrue(all('ms' in reply for reply in replies))
+
+  def test_already_served(self):
+    self.assertRaises(sgquery.QueryError, sgquery.serve, session(), self.path)
+
+  def test_shutdown(self):
+    self.assertEqual(sgquery.send(self.path, ['shutdown']), [{'query': 'shutdown', 'shutdown': True}])
+    self.thread.join(5)
+    self.assertFalse(self.thread.is_alive())
+
+if __name__ == '__main__':
+  unittest.main()
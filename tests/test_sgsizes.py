@@ -0,0 +1,108 @@
+'''
+  What sgsizes.breakdown() adds up for the tree of fixtures.py, by type, container and branch,
+  and the CSV table and treemaps the size report writes from it.
+
+  python -m unittest discover tests -p test_sgsizes.py
+'''
+import os, sys
+import csv
+import json
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ElementTree
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import dumpSG
+import sgschema
+import sgsizes
+from fixtures import memory_backend
+
+class BreakdownTest(unittest.TestCase):
+  def setUp(self):
+    self.xAOD_Objects = dumpSG.inspect_tree(memory_backend())
+    self.sizes = sgsizes.breakdown(self.xAOD_Objects, entries=4)
+
+  def container(self, containerType, container):
+    return self.sizes['types'][containerType]['containers'][container]
+
+  def test_containers(self):
+    # the interface and Aux. branches plus every property and attribute
+    electrons = self.container('xAOD::ElectronContainer', 'ElectronCollection')
+    self.assertEqual((electrons['filebytes'], electrons['totbytes']), (50+80+400+100+30, 100+200+1000+600+300))
+    self.assertEqual(sorted(electrons['branches']), ['Loose', 'charge', 'pt'])
+    self.assertEqual(electrons['branches']['pt'], {'filebytes': 400, 'totbytes': 1000, 'filebytes_per_event': 100., 'totbytes_per_event': 250., 'rootname': 'ElectronCollectionAux.pt'})
+    eventInfo = self.container('xAOD::EventInfo', 'EventInfo')
+    self.assertEqual((eventInfo['filebytes'], eventInfo['totbytes']), (5+10+40, 10+20+80))
+    self.assertEqual(eventInfo['filebytes_per_event'], 55/4.)
+    # the jets only have an attribute, so no interface to take the type from
+    jets = self.container('', 'AntiKt4EMTopoJets')
+    self.assertEqual((jets['filebytes'], jets['totbytes']), (200, 500))
+
+  def test_types(self):
+    self.assertEqual(sorted(self.sizes['types']), ['', 'xAOD::ElectronContainer', 'xAOD::EventInfo'])
+    self.assertEqual(dict((containerType, (typeSizes['filebytes'], typeSizes['totbytes'])) for containerType, typeSizes in self.sizes['types'].items()),
+                     {'': (200, 500), 'xAOD::ElectronContainer': (660, 2200), 'xAOD::EventInfo': (55, 110)})
+    self.assertEqual((self.sizes['filebytes'], self.sizes['totbytes']), (915, 2810))
+    self.assertEqual((self.sizes['filebytes_per_event'], self.sizes['totbytes_per_event']), (915/4., 2810/4.))
+
+  def test_views(self):
+    # what --prop/--attr list does not change the sizes
+    views = dict((k, sgschema.ContainerView(v, sgschema.ContainerView.hide(list_properties=False, list_attributes=False))) for k, v in self.xAOD_Objects.items())
+    sizes = sgsizes.breakdown(views)
+    self.assertEqual((sizes['filebytes'], sizes['totbytes']), (915, 2810))
+    self.assertFalse('filebytes_per_event' in sizes)
+
+  def test_csv(self):
+    f = StringIO()
+    sgsizes.write_csv(self.sizes, f)
+    rows = list(csv.DictReader(StringIO(f.getvalue())))
+    # largest first on disk, each type followed by its containers and their branches
+    self.assertEqual([(row['level'], row['type'], row['container'], row['branch']) for row in rows],
+                     [('total', '', '', ''),
+                      ('type', 'xAOD::ElectronContainer', '', ''),
+                      ('container', 'xAOD::ElectronContainer', 'ElectronCollection', ''),
+                      ('branch', 'xAOD::ElectronContainer', 'ElectronCollection', 'pt'),
+                      ('branch', 'xAOD::ElectronContainer', 'ElectronCollection', 'charge'),
+                      ('branch', 'xAOD::ElectronContainer', 'ElectronCollection', 'Loose'),
+                      ('type', '', '', ''),
+                      ('container', '', 'AntiKt4EMTopoJets', ''),
+                      ('branch', '', 'AntiKt4EMTopoJets', 'btagging'),
+                      ('type', 'xAOD::EventInfo', '', ''),
+                      ('container', 'xAOD::EventInfo', 'EventInfo', ''),
+                      ('branch', 'xAOD::EventInfo', 'EventInfo', 'eventNumber')])
+    pt = rows[3]
+    self.assertEqual((int(pt['filebytes']), int(pt['totbytes']), float(pt['filebytes_per_event'])), (400, 1000, 100.))
+    self.assertAlmostEqual(float(pt['filebytes_fraction']), 400./915)
+    self.assertAlmostEqual(float(rows[0]['totbytes_fraction']), 1.)
+
+  def test_treemap(self):
+    f = StringIO()
+    sgsizes.write_treemap(self.sizes, f, key='filebytes', width=1200, height=800)
+    svg = ElementTree.fromstring(f.getvalue())
+    groups = svg.findall('{http://www.w3.org/2000/svg}g')
+    self.assertEqual([group.find('{http://www.w3.org/2000/svg}rect/{http://www.w3.org/2000/svg}title').text for group in groups],
+                     ['xAOD::ElectronContainer: 660', ': 200', 'xAOD::EventInfo: 55'])
+    # the areas of the types are in proportion to their sizes, and fill the whole map
+    areas = [float(rect.get('width'))*float(rect.get('height')) for rect in (group.find('{http://www.w3.org/2000/svg}rect') for group in groups)]
+    self.assertAlmostEqual(sum(areas), 1200*800, delta=1e3)
+    for area, size in zip(areas, [660, 200, 55]):
+      self.assertAlmostEqual(area/(1200*800), size/915., places=2)
+
+class SizeReportTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_outputs(self):
+    sizes = dumpSG.make_size_report(dumpSG.inspect_tree(memory_backend()), directory=self.directory, entries=4)
+    for fname in ['sizes.json', 'sizes.csv', 'sizes.txt', 'sizes_ondisk.svg', 'sizes_inmemory.svg']:
+      self.assertTrue(os.path.isfile(os.path.join(self.directory, fname)), fname)
+    with open(os.path.join(self.directory, 'sizes.json')) as f:
+      self.assertEqual(json.load(f), json.loads(json.dumps(sizes)))
+
+if __name__ == '__main__':
+  unittest.main()